@@ -1,24 +1,34 @@
-from typing import Type
+import re
+from typing import Type, Iterator, TYPE_CHECKING
 
-from rply import ParserGenerator, LexerGenerator, Token, ParsingError
+from rply import ParserGenerator, LexerGenerator, Token, ParsingError, LexingError
 from rply.lexer import LexerStream, Lexer as _Lexer
+from rply.token import SourcePosition
 
 from exceptions import ParsingException
-from terminal import all_terminals
-from terminal.base import Terminal
+from lr_cache import LRTableCache, NO_CACHE
 from tokens import TokenKind
 
+if TYPE_CHECKING:
+    from terminal.base import Terminal
 
-class Lexer(_Lexer):
+
+IGNORED_PATTERNS = [
+    r"\/\/[^\x00\n]*",
+    r"\/\*[^\x00]*\*\/",
+    r"\s",
+]
+
+
+class RplyLexer(_Lexer):
     def __init__(self):
         gen = LexerGenerator()
         for token in TokenKind:
             for pattern in token.value:
                 gen.add(token.name, pattern)
 
-        gen.ignore(r"\/\/[^\x00\n]*")
-        gen.ignore(r"\/\*[^\x00]*\*\/")
-        gen.ignore(r"\s")
+        for pattern in IGNORED_PATTERNS:
+            gen.ignore(pattern)
 
         self._lexer = gen.build()
 
@@ -26,8 +36,101 @@ class Lexer(_Lexer):
         return self._lexer.lex(s)
 
 
-class Parser:
+class TokenStream:
+    def __init__(self, s: str, tokens: Iterator[Token]):
+        self.s = s
+        self._tokens = tokens
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Token:
+        return next(self._tokens)
+
+
+class Lexer:
     def __init__(self):
+        self.keywords: dict[str, str] = {}
+        self.group_kinds: dict[str, str | None] = {}
+        alternatives = []
+
+        for i, pattern in enumerate(IGNORED_PATTERNS):
+            self.group_kinds[f"_ignore{i}"] = None
+            alternatives.append(f"(?P<_ignore{i}>{pattern})")
+
+        for token in TokenKind:
+            for i, pattern in enumerate(token.value):
+                # Plain words are looked up after IDENTIFIER matched the whole word, so "iffy" stays one identifier
+                if re.fullmatch(r"\w+", pattern):
+                    self.keywords.setdefault(pattern, token.name)
+                    continue
+
+                self.group_kinds[f"{token.name}_{i}"] = token.name
+                alternatives.append(f"(?P<{token.name}_{i}>{pattern})")
+
+        alternatives.append(r"(?P<_error>(?s:.))")
+        self._master = re.compile("|".join(alternatives))
+
+    def lex(self, s: str, pos: int = 0, endpos: int = None) -> TokenStream:
+        return TokenStream(s, self._tokenize(s, pos, len(s) if endpos is None else endpos))
+
+    def _tokenize(self, s: str, pos: int, endpos: int) -> Iterator[Token]:
+        group_kinds = self.group_kinds
+        keywords = self.keywords
+        identifier = TokenKind.IDENTIFIER.name
+        lineno = s.count("\n", 0, pos) + 1
+        last_nl = s.rfind("\n", 0, pos)
+
+        for match in self._master.finditer(s, pos, endpos):
+            group = match.lastgroup
+            start = match.start()
+            kind = group_kinds.get(group)
+
+            if group == "_error":
+                raise LexingError(None, SourcePosition(start, lineno, start - last_nl))
+
+            if kind is not None:
+                value = match.group()
+                if kind == identifier:
+                    kind = keywords.get(value, identifier)
+
+                yield Token(kind, value, SourcePosition(start, lineno, start - last_nl))
+
+            end = match.end()
+            newlines = s.count("\n", start, end)
+            if newlines:
+                lineno += newlines
+                last_nl = s.rfind("\n", start, end)
+
+
+class FlatLRTable:
+    # rply's tables flattened once. Every grammar symbol gets an int, and actions and gotos share one list
+    # indexed by state * width + symbol: a shift stores the next state, a reduction -production, accepting 0
+    # and an error None. Gotos sit in the nonterminal columns.
+    def __init__(self, lr_table):
+        grammar = lr_table.grammar
+        symbols = list(dict.fromkeys(["$end", *grammar.terminals, *grammar.nonterminals,
+                                      *(production.name for production in grammar.productions)]))
+        self.symbol_ids = {symbol: i for i, symbol in enumerate(symbols)}
+        self.width = len(symbols)
+
+        self.actions: list[int | None] = [None] * (len(lr_table.lr_action) * self.width)
+        for state, (actions, gotos) in enumerate(zip(lr_table.lr_action, lr_table.lr_goto)):
+            row = state * self.width
+            for symbol, action in actions.items():
+                self.actions[row + self.symbol_ids[symbol]] = action
+            for symbol, target in gotos.items():
+                self.actions[row + self.symbol_ids[symbol]] = target
+
+        # Production indexes, 0 is the augmented start production which never reduces
+        self.default_reductions = [-production for production in lr_table.default_reductions]
+        self.lengths = [production.getlength() for production in grammar.productions]
+        self.left_sides = [self.symbol_ids[production.name] for production in grammar.productions]
+        self.callbacks = [production.func for production in grammar.productions]
+
+
+class Parser:
+    def __init__(self, cache: LRTableCache = None, start: str = None):
         gen = ParserGenerator(
             [i.name for i in TokenKind],
             precedence=[
@@ -37,18 +140,76 @@ class Parser:
             ]
         )
 
+        # Terminals pull in the code generator, lexing alone does not need them
+        from terminal import all_terminals
+
         self.terminals = all_terminals
         self._gen_productions(gen, self.terminals)
-        self._parser = gen.build()
+        if start:
+            # rply starts the grammar at the first production, stable sort keeps the rest in order
+            gen.productions.sort(key=lambda production: production[0] != start)
+
+        if cache is None:
+            cache = LRTableCache()
+        self._parser = gen.build() if cache is NO_CACHE else cache.build(gen)
         self._parser.error_handler = self._error_handler
+        self._table = FlatLRTable(self._parser.lr_table)
         self._last_parsing_tokens: LexerStream | None = None
 
     @staticmethod
-    def _gen_productions(gen: ParserGenerator, terminals: dict[str, Type[Terminal]]):
+    def _gen_productions(gen: ParserGenerator, terminals: dict[str, Type['Terminal']]):
         for terminal in terminals.values():
             terminal.gen_productions(terminal, gen)
 
     def parse(self, tokenizer: LexerStream, state=None):
+        self._last_parsing_tokens = tokenizer
+        table = self._table
+        actions, width, symbol_ids = table.actions, table.width, table.symbol_ids
+        default_reductions, lengths, left_sides, callbacks = \
+            table.default_reductions, table.lengths, table.left_sides, table.callbacks
+
+        end = Token("$end", "$end")
+        state_stack = [0]
+        sym_stack = [end]
+        current_state = 0
+        lookahead = None
+        symbol = None
+
+        while True:
+            production = default_reductions[current_state]
+            if not production:
+                if lookahead is None:
+                    lookahead = next(tokenizer, None) or end
+                    symbol = symbol_ids.get(lookahead.name)
+
+                action = actions[current_state * width + symbol] if symbol is not None else None
+                if action is None:
+                    self._error_handler(current_state, lookahead)
+                if action > 0:
+                    state_stack.append(action)
+                    sym_stack.append(lookahead)
+                    current_state = action
+                    lookahead = None
+                    continue
+                if not action:
+                    return sym_stack[-1]
+
+                production = -action
+
+            length = lengths[production]
+            if length:
+                targ = sym_stack[-length:]
+                del sym_stack[-length:]
+                del state_stack[-length:]
+            else:
+                targ = []
+
+            sym_stack.append(callbacks[production](targ) if state is None else callbacks[production](state, targ))
+            current_state = actions[state_stack[-1] * width + left_sides[production]]
+            state_stack.append(current_state)
+
+    def parse_rply(self, tokenizer: LexerStream, state=None):
+        # The generic driver over rply's own tables, kept as the reference that parse() is measured against
         self._last_parsing_tokens = tokenizer
         from rply.token import Token
 
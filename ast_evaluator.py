@@ -1,4 +1,10 @@
-from terminal.base import Terminal
+from typing import TYPE_CHECKING
+
+from visitor import Visitor
+
+if TYPE_CHECKING:
+    from bytecode_vm import CodeObject
+    from terminal.base import Terminal
 
 
 class ExecutionFrame:
@@ -17,9 +23,23 @@ class ExecutionFrame:
         self.locals[key] = value
 
 
+class EvaluationVisitor(Visitor):
+    # Nodes evaluate themselves in one frame, the ones with children are generators yielding them
+    def __init__(self, frame: ExecutionFrame):
+        self.frame = frame
+
+    def generic_visit(self, node, *args):
+        return node.evaluate(self.frame, *args)
+
+
 class AstEvaluator:
-    def __init__(self):
+    def __init__(self, mode: str = "tree"):
+        if mode not in ["tree", "bytecode"]:
+            raise ValueError(f"Unknown evaluation mode '{mode}', expected 'tree' or 'bytecode'.")
+
+        self.mode = mode
         self.frame_stack: list[ExecutionFrame] = [ExecutionFrame({}, {}, self)]
+        self._code_cache: dict[int, tuple['Terminal', 'CodeObject']] = {}
 
     @property
     def frame(self):
@@ -29,9 +49,25 @@ class AstEvaluator:
     def global_frame(self):
         return self.frame_stack[0]
 
-    def evaluate(self, ast: Terminal):
-        value = ast.evaluate(self.frame)
-        return value
+    def evaluate(self, ast: 'Terminal'):
+        if self.mode == "bytecode":
+            return self.evaluate_bytecode(ast)
+
+        return EvaluationVisitor(self.frame).visit(ast)
+
+    def compile(self, ast: 'Terminal') -> 'CodeObject':
+        from bytecode_vm import BytecodeCompiler
+
+        cached = self._code_cache.get(id(ast))
+        if cached is None or cached[0] is not ast:
+            cached = self._code_cache[id(ast)] = (ast, BytecodeCompiler.compile(ast))
+
+        return cached[1]
+
+    def evaluate_bytecode(self, ast: 'Terminal'):
+        from bytecode_vm import BytecodeVM
+
+        return BytecodeVM.run(self.compile(ast), self.frame)
 
     def new_frame(self):
         frame = ExecutionFrame(self.global_frame.globals, {}, self)
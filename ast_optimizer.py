@@ -0,0 +1,297 @@
+import operator
+
+from rply import Token
+
+from code_generation.simulator import ARITHMETIC_FUNCTIONS
+from terminal.assign import Assign
+from terminal.base import Terminal, NumberLiteral, Variable
+from terminal.bodies import Body
+from terminal.compounds import Condition, IfStatement, ForStatement
+from terminal.expressoin import Expression, UnaryExpr, BINARY_OPCODES
+from terminal.function import Function
+from terminal.returns import Return, Yield
+from tokens import TokenKind
+from visitor import Visitor, copy_tree, walk
+
+MAX_TRIP_COUNT = 1 << 16
+MAX_UNROLL_FACTOR = 8
+
+LOOP_COMPARISONS = {
+    TokenKind.OP_CMP_LT.name: (operator.lt, operator.gt),
+    TokenKind.OP_CMP_LE.name: (operator.le, operator.ge),
+    TokenKind.OP_CMP_GT.name: (operator.gt, operator.lt),
+    TokenKind.OP_CMP_GE.name: (operator.ge, operator.le),
+    TokenKind.OP_CMP_NE.name: (operator.ne, operator.ne),
+}
+
+
+def assigned_names(node: Terminal, names: set[str] = None) -> set[str]:
+    names = set() if names is None else names
+    for child in walk(node):
+        if isinstance(child, Assign):
+            names.add(child.a_name)
+        elif isinstance(child, UnaryExpr):
+            names.add(child.identifier)
+
+    return names
+
+
+class StatementSize(Visitor):
+    # Rough count of the instructions a statement turns into
+    def generic_visit(self, node):
+        return 0
+
+    def visit_body(self, node: Body):
+        size = 0
+        for item in node.items:
+            size += yield item
+        return size
+
+    def visit_if_statement(self, node: IfStatement):
+        size = 1 + (yield node.condition) + (yield node.body)
+        return size + ((yield node.else_statement) if node.else_statement else 0)
+
+    def visit_for_statement(self, node: ForStatement):
+        size = 2
+        for child in [node.startup, node.condition, node.increment, node.body]:
+            size += yield child
+        return size
+
+    def visit_expression(self, node: Expression):
+        return 1 + (yield node.left) + (yield node.right)
+
+    def visit_assign(self, node: Assign):
+        return max(1, (yield node.value))
+
+    def visit_condition(self, node: Condition):
+        return (yield node.expr)
+
+    def visit_return(self, node: Return):
+        return 1 + (yield node.value)
+
+    visit_yield = visit_return
+
+    def visit_unary_expr(self, node: UnaryExpr):
+        return 1
+
+
+def statement_size(node: Terminal) -> int:
+    return StatementSize().visit(node)
+
+
+def trip_values(node: ForStatement) -> list[int] | None:
+    # Values the counter takes on entering each iteration, for `for (i = a; i <op> b; i++/i--)` loops
+    startup, condition, increment = node.startup, node.condition, node.increment
+    if not isinstance(startup, Assign) or not _is_int_literal(startup.value):
+        return None
+    if not isinstance(increment, UnaryExpr) or increment.identifier != startup.a_name:
+        return None
+    if not isinstance(condition, Expression) or condition.operator.name not in LOOP_COMPARISONS:
+        return None
+
+    name = startup.a_name
+    compare, flipped = LOOP_COMPARISONS[condition.operator.name]
+    if isinstance(condition.left, Variable) and condition.left.a_name == name and _is_int_literal(condition.right):
+        bound = condition.right.value
+    elif isinstance(condition.right, Variable) and condition.right.a_name == name and _is_int_literal(condition.left):
+        bound, compare = condition.left.value, flipped
+    else:
+        return None
+
+    if name in assigned_names(node.body) or name in assigned_names(condition):
+        return None
+
+    step = 1 if increment.operator.name == TokenKind.INCREMENT.name else -1
+    values = []
+    value = startup.value.value
+    while compare(value, bound):
+        if len(values) >= MAX_TRIP_COUNT:
+            return None
+        values.append(value)
+        value += step
+
+    return values
+
+
+class FoldingReport:
+    def __init__(self):
+        self.folded = 0
+        self.propagated = 0
+
+    def __repr__(self):
+        return f"FoldingReport(folded={self.folded}, propagated={self.propagated})"
+
+
+class ConstantFolder:
+    def __init__(self):
+        self.report = FoldingReport()
+
+    def run(self, function: Function) -> FoldingReport:
+        self._body(function.body, {})
+        return self.report
+
+    def _body(self, body: Body, constants: dict[str, int]):
+        for item in body.items:
+            self._statement(item, constants)
+
+    def _statement(self, node: Terminal, constants: dict[str, int]):
+        if isinstance(node, Assign):
+            node.value = self._expression(node.value, constants)
+            if _is_int_literal(node.value):
+                constants[node.a_name] = node.value.value
+            else:
+                constants.pop(node.a_name, None)
+
+        elif isinstance(node, (Return, Yield)):
+            node.value = self._expression(node.value, constants)
+
+        elif isinstance(node, IfStatement):
+            self._if_statement(node, constants)
+
+        elif isinstance(node, ForStatement):
+            self._statement(node.startup, constants)
+            # Anything the loop writes differs between iterations, so it is unknown everywhere inside and after it
+            for name in assigned_names(node):
+                constants.pop(name, None)
+
+            node.condition = self._condition_operands(node.condition, constants)
+            self._body(node.body, dict(constants))
+            node.increment = self._expression(node.increment, dict(constants))
+
+        else:
+            self._expression(node, constants)
+
+    def _if_statement(self, node: IfStatement, constants: dict[str, int]):
+        written = assigned_names(node)
+        while True:
+            node.condition.expr = self._condition_operands(node.condition.expr, constants)
+            self._body(node.body, dict(constants))
+            if not isinstance(node.else_statement, IfStatement):
+                break
+            node = node.else_statement
+
+        if node.else_statement:
+            self._body(node.else_statement, dict(constants))
+
+        for name in written:
+            constants.pop(name, None)
+
+    def _condition_operands(self, expr: Terminal, constants: dict[str, int]) -> Terminal:
+        # Conditions are lowered into compare-and-branch instructions, so only their operands are folded
+        if isinstance(expr, Expression) and expr.operator.name not in BINARY_OPCODES:
+            for name in assigned_names(expr):
+                constants.pop(name, None)
+            expr.left = self._expression(expr.left, constants)
+            expr.right = self._expression(expr.right, constants)
+            return expr
+
+        return self._expression(expr, constants)
+
+    def _expression(self, expr: Terminal, constants: dict[str, int]) -> Terminal:
+        for name in assigned_names(expr):
+            constants.pop(name, None)
+
+        return self._fold(expr, constants)
+
+    def _fold(self, expr: Terminal, constants: dict[str, int]) -> Terminal:
+        return _Folder(self.report, constants).visit(expr)
+
+
+class _Folder(Visitor):
+    # Replaces known variables by their values and computes arithmetic on literals, bottom up
+    def __init__(self, report: FoldingReport, constants: dict[str, int]):
+        self.report = report
+        self.constants = constants
+
+    def generic_visit(self, node):
+        return node
+
+    def visit_variable(self, node: Variable):
+        if node.a_name not in self.constants:
+            return node
+
+        self.report.propagated += 1
+        return NumberLiteral(self.constants[node.a_name])
+
+    def visit_expression(self, node: Expression):
+        node.left = yield node.left
+        node.right = yield node.right
+        opcode_kind = BINARY_OPCODES.get(node.operator.name)
+        if opcode_kind and _is_int_literal(node.left) and _is_int_literal(node.right):
+            self.report.folded += 1
+            return NumberLiteral(ARITHMETIC_FUNCTIONS[opcode_kind](node.left.value, node.right.value))
+
+        return node
+
+
+def _is_int_literal(node: Terminal) -> bool:
+    return isinstance(node, NumberLiteral) and isinstance(node.value, int)
+
+
+class UnrollReport:
+    def __init__(self):
+        self.full = 0
+        self.partial = 0
+
+    def __repr__(self):
+        return f"UnrollReport(full={self.full}, partial={self.partial})"
+
+
+class LoopUnroller:
+    # Loops with a known trip count are replaced by copies of their body when that fits in the budget,
+    # otherwise the body is repeated a few times inside the loop so fewer iterations are needed
+    def __init__(self, budget: int = 64, max_factor: int = MAX_UNROLL_FACTOR):
+        self.budget = budget
+        self.max_factor = max_factor
+        self.report = UnrollReport()
+
+    def run(self, function: Function) -> UnrollReport:
+        self._body(function.body)
+        return self.report
+
+    def _body(self, body: Body):
+        items = []
+        for item in body.items:
+            if isinstance(item, IfStatement):
+                branch = item
+                while isinstance(branch, IfStatement):
+                    self._body(branch.body)
+                    branch = branch.else_statement
+                if branch:
+                    self._body(branch)
+
+            if isinstance(item, ForStatement):
+                self._body(item.body)
+                items.extend(self._unroll(item))
+            else:
+                items.append(item)
+
+        body.items[:] = items
+
+    def _unroll(self, node: ForStatement) -> list[Terminal]:
+        values = trip_values(node)
+        if values is None:
+            return [node]
+
+        size = statement_size(node.body) + 1
+        name_token = Token(TokenKind.IDENTIFIER.name, node.startup.a_name)
+        if len(values) * size <= self.budget:
+            self.report.full += 1
+            items = [node.startup]
+            step = 1 if node.increment.operator.name == TokenKind.INCREMENT.name else -1
+            for value in values:
+                items.extend(copy_tree(node.body).items)
+                items.append(Assign(name_token, NumberLiteral(value + step)))
+            return items
+
+        for factor in range(self.max_factor, 1, -1):
+            if len(values) % factor == 0 and factor * size <= self.budget:
+                self.report.partial += 1
+                items = list(node.body.items)
+                for _ in range(factor - 1):
+                    items.append(copy_tree(node.increment))
+                    items.extend(copy_tree(node.body).items)
+                node.body.items[:] = items
+                break
+
+        return [node]
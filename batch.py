@@ -0,0 +1,131 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from analyzers import Lexer, Parser, TokenStream
+from code_generation.code_generator import CodeGenerator
+from code_generation.source_map import SourceMap, SOURCE_MAP_SUFFIX
+from settings import CompilerSettings
+
+SOURCE_SUFFIX = ".fcpu"
+OUTPUT_SUFFIX = ".fasm"
+WRITE_BUFFER_SIZE = 1 << 16
+
+_lexer: Lexer | None = None
+_parser: Parser | None = None
+_settings: CompilerSettings | None = None
+
+
+class BatchResult:
+    def __init__(self, source: str, output: str | None, tokens: int = 0, seconds: float = 0., error: str = None):
+        self.source = source
+        self.output = output
+        self.tokens = tokens
+        self.seconds = seconds
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class BatchReport:
+    def __init__(self, results: list[BatchResult], seconds: float):
+        self.results = results
+        self.seconds = seconds
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def tokens(self):
+        return sum(result.tokens for result in self.results)
+
+    def summary(self):
+        seconds = max(self.seconds, 1e-9)
+        return (
+            f"Compiled {len(self.results) - len(self.failed)}/{len(self.results)} files "
+            f"in {self.seconds:.3f}s: "
+            f"{len(self.results) / seconds:.1f} files/s, {self.tokens / seconds:,.0f} tokens/s"
+        )
+
+
+def collect_sources(paths: list[str]) -> list[tuple[str, str]]:
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, filenames in os.walk(path):
+                for filename in sorted(filenames):
+                    if filename.endswith(SOURCE_SUFFIX):
+                        full_path = os.path.join(root, filename)
+                        sources.append((full_path, os.path.relpath(full_path, path)))
+        else:
+            sources.append((path, os.path.basename(path)))
+
+    return sources
+
+
+def output_path(out_dir: str, relative_path: str) -> str:
+    return os.path.join(out_dir, os.path.splitext(relative_path)[0] + OUTPUT_SUFFIX)
+
+
+def _init_worker(settings: CompilerSettings = None):
+    global _lexer, _parser, _settings
+    _lexer = Lexer()
+    _parser = Parser()
+    _settings = settings
+
+
+def _compile_one(source: str, output: str) -> BatchResult:
+    start = time.perf_counter()
+    try:
+        with open(source) as f:
+            code = f.read()
+
+        tokens = list(_lexer.lex(code))
+        program = _parser.parse(TokenStream(code, iter(tokens)))
+        opcodes = CodeGenerator.generate_code(program, settings=_settings)
+
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w", buffering=WRITE_BUFFER_SIZE) as f:
+            for opcode in opcodes:
+                f.write(opcode.to_string())
+                f.write("\n")
+        SourceMap.from_opcodes(source, opcodes).write(output + SOURCE_MAP_SUFFIX)
+
+    except Exception as e:
+        return BatchResult(source, None, error=f"{e.__class__.__name__}: {e}", seconds=time.perf_counter() - start)
+
+    return BatchResult(source, output, len(tokens), time.perf_counter() - start)
+
+
+def compile_batch(paths: list[str], out_dir: str, jobs: int | None = None,
+                  settings: CompilerSettings = None) -> BatchReport:
+    start = time.perf_counter()
+    outputs: dict[str, list[str]] = {}
+    for source, relative_path in collect_sources(paths):
+        sources = outputs.setdefault(os.path.normpath(output_path(out_dir, relative_path)), [])
+        if os.path.realpath(source) not in map(os.path.realpath, sources):
+            sources.append(source)
+
+    # Sources that would overwrite each other's listing are not compiled at all, whichever ran last would win
+    results = [
+        BatchResult(source, None, error=f"{output} would also be written by "
+                                        f"{', '.join(other for other in sources if other != source)}")
+        for output, sources in outputs.items() if len(sources) > 1 for source in sources
+    ]
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(settings,)) as executor:
+        futures = {
+            executor.submit(_compile_one, sources[0], output): sources[0]
+            for output, sources in outputs.items() if len(sources) == 1
+        }
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(BatchResult(futures[future], None, error=f"{e.__class__.__name__}: {e}"))
+
+    results.sort(key=lambda result: result.source)
+    return BatchReport(results, time.perf_counter() - start)
@@ -0,0 +1,71 @@
+import argparse
+import gc
+import time
+import tracemalloc
+
+from analyzers import Lexer, Parser
+from terminal.base import Terminal
+
+FUNCTION = """
+func {name}(a: red, b: green) {{
+    x = a * 3 + b / 2 - {i};
+    y = (x - a) * (x + b) % 7;
+    for (i = 0; i < 10; i++) {{
+        x += i * 2 - a;
+        y -= x / 3;
+    }}
+    if (x > y) {{
+        return x + y * 2;
+    }} else if (x == y) {{
+        return x - 1;
+    }}
+    return y;
+}}
+"""
+
+
+def make_source(functions: int) -> str:
+    return FUNCTION.format(name="Main", i=0) + "".join(FUNCTION.format(name=f"Func{i}", i=i) for i in range(functions))
+
+
+def count_nodes(term: Terminal) -> int:
+    count, stack = 0, [term]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, Terminal):
+            count += 1
+            names = [name for cls in type(node).__mro__ for name in getattr(cls, "__slots__", ())]
+            names += list(getattr(node, "__dict__", {}))
+            stack.extend(getattr(node, name) for name in names if not name.startswith("n_"))
+
+    return count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure the memory held by a parsed AST.")
+    arg_parser.add_argument("--functions", type=int, default=1000)
+    args = arg_parser.parse_args()
+
+    source = make_source(args.functions)
+    lexer, parser = Lexer(), Parser()
+    # The first parse builds the parser tables, they should not count towards the AST
+    parser.parse(lexer.lex(make_source(1)))
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    program = parser.parse(lexer.lex(source))
+    seconds = time.perf_counter() - start
+    gc.collect()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    nodes = count_nodes(program)
+    print(f"{len(source.splitlines())} lines, {nodes} nodes parsed in {seconds * 1000:.2f}ms")
+    print(f"AST: {size / 2 ** 20:.2f}MiB ({size / nodes:.1f} bytes per node), peak {peak / 2 ** 20:.2f}MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import time
+
+from analyzers import Lexer, Parser
+from ast_evaluator import AstEvaluator
+
+PROGRAM = """
+func Main(a: red, b: green) {{
+    x = 0;
+    y = 1;
+    for (i = 0; i < {iterations}; i++) {{
+        x += i * 2 - a;
+        if (x > 1000) {{
+            x -= 1000;
+            y++;
+        }} else if (x == 7) {{
+            y = y + b / 2;
+        }}
+    }}
+    return x + y;
+}}
+"""
+
+
+def measure(program, mode: str, repeat: int) -> tuple[float, object, dict]:
+    best = float("inf")
+    result = frame_locals = None
+    for _ in range(repeat):
+        evaluator = AstEvaluator(mode)
+        if mode == "bytecode":
+            evaluator.compile(program)
+
+        start = time.perf_counter()
+        result = evaluator.evaluate(program)
+        best = min(best, time.perf_counter() - start)
+        frame_locals = evaluator.global_frame.locals
+
+    return best, result, frame_locals
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare the tree-walking and bytecode evaluators.")
+    arg_parser.add_argument("--iterations", type=int, default=20000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    program = Parser().parse(Lexer().lex(PROGRAM.format(iterations=args.iterations)))
+    tree_time, tree_result, tree_locals = measure(program, "tree", args.repeat)
+    vm_time, vm_result, vm_locals = measure(program, "bytecode", args.repeat)
+
+    if (tree_result, tree_locals) != (vm_result, vm_locals):
+        raise AssertionError(f"Evaluators disagree: {tree_result} {tree_locals} != {vm_result} {vm_locals}")
+
+    print(f"result {tree_result} after {args.iterations} iterations")
+    print(f"    tree: {tree_time * 1000:.2f}ms")
+    print(f"bytecode: {vm_time * 1000:.2f}ms ({tree_time / vm_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import time
+
+from analyzers import Lexer, Parser
+from code_generation.code_generator import CodeGenerator
+from exceptions import IdentifierError
+from incremental import CompilationSession
+
+MAIN = """func Main(a: red) {
+    x = a + 1;
+    return x;
+}
+"""
+
+HELPER = """
+// helper {i}
+func Helper{i}(a: red, b: green) {{
+    x = a * {i} + b;
+    y = x / 2 - 1;
+    for (i = 0; i < {i}; i++) {{
+        x += i;
+    }}
+    if (x == y) {{
+        return x;
+    }}
+    return y;
+}}
+"""
+
+
+def make_helpers(functions: int) -> list[str]:
+    return [HELPER.format(i=i) for i in range(functions)]
+
+
+def positions(tokens):
+    return [(t.name, t.value, t.source_pos.idx, t.source_pos.lineno, t.source_pos.colno) for t in tokens]
+
+
+def listing(opcodes):
+    return [(op.to_string(), op.source_pos) for op in opcodes]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare full rebuilds with incremental session updates.")
+    arg_parser.add_argument("--functions", type=int, default=400)
+    arg_parser.add_argument("--edits", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    lexer, parser = Lexer(), Parser()
+    session = CompilationSession(lexer)
+    helpers = make_helpers(args.functions)
+    source = MAIN + "".join(helpers)
+    session.update(source)
+    print(f"{source.count(chr(10))} lines, {args.functions + 1} functions")
+
+    full_time = incremental_time = 0.
+    for edit in range(args.edits):
+        edited = (edit * 37) % args.functions
+        helpers[edited] = helpers[edited].replace("x += i;", f"x -= i * {edit};")
+        source = MAIN + "".join(helpers)
+
+        start = time.perf_counter()
+        expected = CodeGenerator.generate_code(parser.parse(lexer.lex(source)))
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        opcodes = session.update(source)
+        incremental_time += time.perf_counter() - start
+
+        if listing(opcodes) != listing(expected):
+            raise AssertionError("Incremental opcodes differ from a full rebuild.")
+
+    # A rejected edit that moves the blocks after it must leave the session on the previous source
+    duplicate = "\n\n" + helpers[0].replace("func Helper0(", "func Helper1(")
+    try:
+        session.update(MAIN + duplicate + "".join(helpers[1:]))
+    except IdentifierError:
+        pass
+    else:
+        raise AssertionError("A duplicate function was accepted.")
+
+    helpers[0] = helpers[0].replace("y = x / 2 - 1;", "y = x / 2 - 2;")
+    source = MAIN + "".join(helpers)
+    expected = CodeGenerator.generate_code(parser.parse(lexer.lex(source)))
+    if listing(session.update(source)) != listing(expected):
+        raise AssertionError("Incremental opcodes differ from a full rebuild after a rejected edit.")
+
+    spliced = [token for block in session.blocks for token in block.tokens]
+    if positions(spliced) != positions(lexer.lex(source)):
+        raise AssertionError("Incremental token positions differ from a full re-lex.")
+
+    # Compiled functions below an edit that adds lines keep their opcodes, with positions moved along
+    last = f"Helper{args.functions - 1}"
+    session.function_opcodes(last)
+    helpers[0] = helpers[0].replace("    return y;", "    y += 1;\n    return y;")
+    source = MAIN + "".join(helpers)
+    session.update(source)
+    program = parser.parse(lexer.lex(source))
+    expected = CodeGenerator.generate_function_code(next(f for f in program.functions if f.a_name == last))
+    if listing(session.function_opcodes(last)) != listing(expected):
+        raise AssertionError("Incremental source positions differ from a full rebuild after lines moved.")
+
+    print(f"       full: {full_time / args.edits * 1000:.2f}ms per edit")
+    print(f"incremental: {incremental_time / args.edits * 1000:.2f}ms per edit "
+          f"({session.reparsed_blocks} blocks parsed in total)")
+
+
+if __name__ == '__main__':
+    main()
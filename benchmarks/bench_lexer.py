@@ -0,0 +1,61 @@
+import argparse
+import time
+
+from analyzers import Lexer, RplyLexer
+
+SNIPPET = """
+// generated block {i}
+func Func{i}(a: red, b: [virtual-signal=signal-A], c: green) {{
+    x{i} = 2 * 8 + a / 3 - 1e3;
+    y{i} = x{i} ** 2 % 7;
+    for (i = 0; i < 10; i++) {{
+        x{i} += 1.5;
+        // loop body
+    }}
+    if (x{i} == 3) {{
+        yield [item=iron-plate];
+    }} else {{
+        return x{i} + y{i};
+    }}
+}}
+"""
+
+
+def make_source(blocks: int) -> str:
+    return "/* generated */" + "".join(SNIPPET.format(i=i) for i in range(blocks))
+
+
+def token_signature(tokens):
+    return [(t.name, t.value, t.source_pos.idx, t.source_pos.lineno, t.source_pos.colno) for t in tokens]
+
+
+def measure(lexer, source: str, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in lexer.lex(source))
+        best = min(best, time.perf_counter() - start)
+
+    return best, count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare the master-regex lexer with the rply lexer.")
+    arg_parser.add_argument("--blocks", type=int, default=500)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    source = make_source(args.blocks)
+    regex_lexer, rply_lexer = Lexer(), RplyLexer()
+    if token_signature(regex_lexer.lex(source)) != token_signature(rply_lexer.lex(source)):
+        raise AssertionError("Lexers produced different token streams.")
+
+    print(f"{len(source)} chars")
+    for name, lexer in [("rply", rply_lexer), ("regex", regex_lexer)]:
+        seconds, count = measure(lexer, source, args.repeat)
+        print(f"{name:>6}: {count} tokens in {seconds * 1000:.2f}ms ({count / seconds:,.0f} tokens/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import gc
+import sys
+import time
+
+from analyzers import Lexer, Parser, TokenStream
+from benchmarks.bench_suite import fit_power_law
+
+FUNCTION = "func F{i}(a: red, b: green, c) {{\n    x = a + b;\n    return x;\n}}\n"
+# Main comes last, the entry point is only looked for once every function is known
+MAIN = "func Main(a: red) {{\n{statements}    return a;\n}}\n"
+STATEMENT = "    x{i} = a + {i};\n"
+
+
+def functions_source(count: int) -> str:
+    return "".join(FUNCTION.format(i=i) for i in range(count - 1)) + MAIN.format(statements="")
+
+
+def statements_source(count: int) -> str:
+    return MAIN.format(statements="".join(STATEMENT.format(i=i) for i in range(count)))
+
+
+SHAPES = {
+    "functions": (functions_source, lambda program: len(program.functions), 10_000),
+    # Every body ends with its return statement
+    "statements": (statements_source, lambda program: len(program.entry_point.body.items) - 1, 100_000),
+}
+
+
+def measure(parser: Parser, source: str, tokens: list, repeat: int) -> tuple[float, object]:
+    best, program = float("inf"), None
+    for _ in range(repeat):
+        program = None
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            program = parser.parse(TokenStream(source, iter(tokens)))
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    return best, program
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Check that parsing scales linearly with list lengths.")
+    arg_parser.add_argument("--shapes", nargs="+", choices=list(SHAPES), default=list(SHAPES))
+    arg_parser.add_argument("--steps", type=int, default=4, help="sizes halve from the largest this many times")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--max-exponent", type=float, default=1.3,
+                            help="fail if parse time grows faster than n to this power")
+    args = arg_parser.parse_args()
+
+    lexer, parser = Lexer(), Parser()
+    failed = False
+    for shape in args.shapes:
+        make_source, count_items, largest = SHAPES[shape]
+        sizes = [largest >> step for step in reversed(range(args.steps))]
+        seconds = []
+        for size in sizes:
+            source = make_source(size)
+            tokens = list(lexer.lex(source))
+            best, program = measure(parser, source, tokens, args.repeat)
+            if count_items(program) != size:
+                raise AssertionError(f"Parsed {count_items(program)} {shape} instead of {size}.")
+
+            seconds.append(best)
+            print(f"{shape:>10} {size:>7}: {best * 1000:9.2f}ms, {best / size * 1e6:6.2f}us per item")
+
+        exponent = fit_power_law(sizes, seconds)[1]
+        print(f"{shape:>10} scale as n^{exponent:.2f}")
+        failed |= exponent > args.max_exponent
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import argparse
+import time
+import tracemalloc
+
+from code_generation.opcodes import Instruction, Label, OpcodeKind
+from code_generation.stacks import RegisterStack, Const
+
+
+def build(count: int, validate: bool) -> list[Instruction]:
+    # A long straight-line program in the shape codegen emits: arithmetic, moves and a branch per block
+    r1, r2, r3 = RegisterStack(3).available
+    opcodes = []
+    for i in range(count // 4):
+        label = Label(f"block_{i}")
+        opcodes.append(label)
+        opcodes.append(Instruction(OpcodeKind.add, [r1, r2, Const(i % 64)], validate))
+        opcodes.append(Instruction(OpcodeKind.mov, [r3, r1], validate))
+        opcodes.append(Instruction(OpcodeKind.blt, [r3, Const(100), label], validate))
+
+    return opcodes
+
+
+def measure(count: int, validate: bool, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build(count, validate)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    opcodes = build(count, validate)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del opcodes
+    return best, size
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure instruction construction time and memory.")
+    arg_parser.add_argument("--count", type=int, default=200_000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    for validate in [True, False]:
+        seconds, size = measure(args.count, validate, args.repeat)
+        print(f"validate={validate!s:>5}: {args.count} instructions in {seconds * 1000:.2f}ms, "
+              f"{size / 2 ** 20:.2f}MiB ({size / args.count:.1f} bytes per instruction)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import time
+
+from analyzers import Lexer, Parser, TokenStream
+from benchmarks.generator import SHAPES, generate
+from utils import TerminalUtil
+
+
+def measure(parse, source: str, tokens: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        stream = TokenStream(source, iter(tokens))
+        start = time.perf_counter()
+        parse(stream)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare the flat-table parse driver with the rply-table loop.")
+    arg_parser.add_argument("--shape", choices=list(SHAPES), default="statements")
+    arg_parser.add_argument("--scale", type=int, default=2000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    source = generate(args.shape, args.scale)
+    tokens = list(Lexer().lex(source))
+    parser = Parser()
+
+    flat = TerminalUtil.get_pretty(parser.parse(TokenStream(source, iter(tokens))))
+    reference = TerminalUtil.get_pretty(parser.parse_rply(TokenStream(source, iter(tokens))))
+    if flat != reference:
+        raise AssertionError("The drivers built different trees.")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        Parser()
+    print(f"Parser(): {(time.perf_counter() - start) * 10:.2f}ms with cached LR tables")
+
+    results = {
+        "rply tables": measure(parser.parse_rply, source, tokens, args.repeat),
+        "flat tables": measure(parser.parse, source, tokens, args.repeat),
+    }
+    for name, seconds in results.items():
+        print(f"{name}: {seconds * 1000:.2f}ms, {len(tokens) / seconds / 1000:.0f}k tokens/s")
+    print(f"speedup: {results['rply tables'] / results['flat tables']:.2f}x over {len(tokens)} tokens")
+
+
+if __name__ == '__main__':
+    main()
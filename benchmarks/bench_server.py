@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from server import CompileServer, CompileClient
+
+PROGRAM = """
+func Main(a: red, b: green) {{
+    x = a * {i} + b;
+    for (i = 0; i < 8; i++) {{
+        x += i * 2 - a;
+    }}
+    if (x > 100) {{
+        return x - 100;
+    }}
+    return x;
+}}
+"""
+
+
+def start_server(path: str) -> threading.Thread:
+    ready = threading.Event()
+
+    def run():
+        async def serve():
+            server = CompileServer(path)
+            await server.start()
+            ready.set()
+            await server.serve_forever()
+
+        asyncio.run(serve())
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    ready.wait()
+    return thread
+
+
+def round_trips(client: CompileClient, sources: list[str]) -> list[float]:
+    times = []
+    for source in sources:
+        start = time.perf_counter()
+        response = client.compile(source)
+        times.append(time.perf_counter() - start)
+        if not response["ok"]:
+            raise AssertionError(response["error"])
+
+    return times
+
+
+def cold_process(source_path: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-W", "ignore", "main.py", source_path], capture_output=True, check=True,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure compile server round trips against fresh processes.")
+    arg_parser.add_argument("--requests", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "server.sock")
+        start_server(path)
+        sources = [PROGRAM.format(i=i) for i in range(args.requests)]
+        with CompileClient(path) as client:
+            fresh = round_trips(client, sources)
+            repeated = round_trips(client, sources)
+
+        source_path = os.path.join(directory, "program.fcpu")
+        with open(source_path, "w") as f:
+            f.write(sources[0])
+        process = min(cold_process(source_path) for _ in range(3))
+
+    for name, times in [("new source", fresh), ("unchanged source", repeated)]:
+        times = sorted(times)
+        print(f"{name:>16}: median {times[len(times) // 2] * 1000:.2f}ms, "
+              f"p95 {times[int(len(times) * 0.95)] * 1000:.2f}ms over {len(times)} requests")
+    print(f"{'new process':>16}: {process * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import time
+
+from code_generation.opcodes import Instruction, Label, OpcodeKind
+from code_generation.simulator import FcpuSimulator
+from code_generation.stacks import RegisterStack, OutputStack, SignalStack, TypeSignalKind, Const
+
+
+def make_program(iterations: int) -> list[Instruction]:
+    registers = RegisterStack()
+    r1, r2, r3, r4 = (registers.pop() for _ in range(4))
+    signals = SignalStack({TypeSignalKind.virtual_signal: TypeSignalKind.virtual_signal.value})
+    loop, skip = Label("loop"), Label("skip")
+    return [
+        Instruction(OpcodeKind.clr, []),
+        Instruction(OpcodeKind.fir, [r4, signals.pop()]),
+        Instruction(OpcodeKind.mov, [r1, Const(0)]),
+        Instruction(OpcodeKind.mov, [r2, Const(iterations)]),
+        loop,
+        Instruction(OpcodeKind.add, [r1, r1, r4]),
+        Instruction(OpcodeKind.mul, [r3, r1, Const(3)]),
+        Instruction(OpcodeKind.mod, [r1, r3, Const(1000)]),
+        Instruction(OpcodeKind.blt, [r1, Const(500), skip]),
+        Instruction(OpcodeKind.sub, [r1, r1, Const(7)]),
+        skip,
+        Instruction(OpcodeKind.dec, [r2]),
+        Instruction(OpcodeKind.bgt, [r2, Const(0), loop]),
+        Instruction(OpcodeKind.mov, [OutputStack().pop(), r1]),
+    ]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure simulated fCPU ticks per second.")
+    arg_parser.add_argument("--iterations", type=int, default=200000)
+    args = arg_parser.parse_args()
+
+    simulator = FcpuSimulator(make_program(args.iterations))
+    start = time.perf_counter()
+    result = simulator.run({"[virtual-signal=signal-A]": 13}, max_ticks=10 ** 9)
+    seconds = time.perf_counter() - start
+
+    print(f"outputs {result.output_values()}, blocks {result.block_ticks}")
+    print(f"{result.ticks} ticks in {seconds * 1000:.2f}ms ({result.ticks / seconds:,.0f} ticks/s)")
+
+
+if __name__ == '__main__':
+    main()
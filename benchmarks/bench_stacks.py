@@ -0,0 +1,63 @@
+import argparse
+import time
+
+from code_generation.stacks import SignalStack, OutputStack, RegisterStack, TypeSignalKind
+
+
+def signal_stack() -> SignalStack:
+    return SignalStack({kind: kind.value for kind in TypeSignalKind})
+
+
+def churn_outputs(rounds: int):
+    # Every return statement releases all cells and reserves a few again
+    stack = OutputStack()
+    for i in range(rounds):
+        stack.dispose_all()
+        for _ in range(i % 16 + 1):
+            stack.pop()
+        stack.reserved
+
+
+def churn_signals(rounds: int):
+    # Function arguments ask for named signals, the rest is taken in order
+    names = [str(sig) for sig in signal_stack().available]
+    for i in range(rounds):
+        stack = signal_stack()
+        for name in names[i % len(names)::3]:
+            stack.pop_named(name)
+        while stack.available_count:
+            stack.pop().reserved
+
+
+def churn_registers(rounds: int):
+    stack = RegisterStack(256)
+    for i in range(rounds):
+        taken = [stack.pop() for _ in range(i % 200 + 1)]
+        for register in taken:
+            register.dispose()
+
+
+def measure(fn, rounds: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(rounds)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure pop/dispose throughput of the codegen resource pools.")
+    arg_parser.add_argument("--rounds", type=int, default=2000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    for name, fn in [("outputs", churn_outputs), ("signals", churn_signals), ("registers", churn_registers)]:
+        for rounds in [args.rounds // 4, args.rounds]:
+            seconds = measure(fn, rounds, args.repeat)
+            print(f"{name:>9}: {rounds} rounds in {seconds * 1000:.2f}ms ({seconds / rounds * 1e6:.2f}us per round)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each stage runs in a fresh interpreter, reporting perf_counter() deltas from before its first import
+STAGES = {
+    "first_token": "from analyzers import Lexer\nnext(iter(Lexer().lex('x = 1;')))",
+    "parser_ready": "from analyzers import Lexer, Parser\nParser().parse(Lexer().lex('func Main() { return 1; }'))",
+    "help": "import main",
+}
+PROBE = "import time\n_start = time.perf_counter()\n{code}\nprint((time.perf_counter() - _start) * 1000)"
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run_stage(code: str) -> tuple[float, list[tuple[int, int, int, str]]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(code=code)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            imports.append((int(own), int(cumulative), len(indent) // 2, module))
+
+    return float(result.stdout.strip().splitlines()[-1]), imports
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure compiler startup with an -X importtime breakdown.")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--top", type=int, default=12, help="slowest top-level imports to list per stage")
+    args = arg_parser.parse_args()
+
+    for name, code in STAGES.items():
+        runs = [run_stage(code) for _ in range(args.repeat)]
+        best_ms, imports = min(runs, key=lambda run: run[0])
+        print(f"{name}: {best_ms:.2f}ms best of {args.repeat}, {len(imports)} modules imported")
+
+        # Only modules imported directly by the probe, their cumulative time includes everything below them
+        top_level = sorted((entry for entry in imports if entry[2] == 0), key=lambda entry: -entry[1])
+        for own, cumulative, _, module in top_level[:args.top]:
+            print(f"    {cumulative / 1000:8.2f}ms cumulative {own / 1000:8.2f}ms self  {module}")
+
+
+if __name__ == '__main__':
+    main()
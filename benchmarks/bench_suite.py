@@ -0,0 +1,198 @@
+import argparse
+import gc
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+
+from analyzers import Lexer, Parser, TokenStream
+from ast_evaluator import AstEvaluator
+from benchmarks.generator import SHAPES, generate
+from code_generation.code_generator import CodeGenerator
+
+PHASES = ["lex", "parse", "codegen", "evaluate"]
+# Phases faster than this at the largest scale are mostly timer noise, neither their times nor their exponents
+# are compared
+MIN_COMPARED_SECONDS = 0.005
+# Scales per shape, picked so the largest program of each takes on the order of a second end to end
+DEFAULT_SCALES = {
+    "functions": [8, 16, 32, 64, 128],
+    "statements": [50, 100, 200, 400, 800],
+    "expressions": [8, 16, 32, 64, 128],
+    "nesting": [4, 8, 16, 32, 64],
+}
+
+
+def measure_phases(lexer: Lexer, parser: Parser, source: str) -> tuple[int, dict[str, float]]:
+    # Like timeit, the collector is off while timing
+    seconds = {}
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        tokens = list(lexer.lex(source))
+        seconds["lex"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        program = parser.parse(TokenStream(source, iter(tokens)))
+        seconds["parse"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        AstEvaluator().evaluate(program)
+        seconds["evaluate"] = time.perf_counter() - start
+
+        # generate_code only compiles the entry point, every function is compiled to scale with their count
+        start = time.perf_counter()
+        for function in program.functions:
+            CodeGenerator.generate_function_code(function)
+        seconds["codegen"] = time.perf_counter() - start
+    finally:
+        gc.enable()
+
+    return len(tokens), seconds
+
+
+def calibrate() -> float:
+    # A fixed pure Python workload, comparisons divide it out so a slower or busier host is not a regression
+    start = time.perf_counter()
+    table = {}
+    for i in range(200_000):
+        table[i % 1024] = table.get(i % 1024, 0) + i
+    return time.perf_counter() - start
+
+
+def fit_power_law(sizes: list[int], seconds: list[float]) -> tuple[float, float]:
+    # Least squares on log t = log c + k log n, returns (c, k) of t = c * n ** k
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(value, 1e-9)) for value in seconds]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if not variance:
+        return math.exp(mean_y), 0.
+
+    exponent = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+    return math.exp(mean_y - exponent * mean_x), exponent
+
+
+def run_suite(shapes: list[str], repeat: int, seed: int, scale_factor: float) -> dict:
+    lexer, parser = Lexer(), Parser()
+    calibration = [calibrate()]
+    scales = {shape: [max(1, int(scale * scale_factor)) for scale in DEFAULT_SCALES[shape]] for shape in shapes}
+    programs = {shape: [generate(shape, scale, seed) for scale in scales[shape]] for shape in shapes}
+
+    # Rounds go over every program before repeating any, so a burst of load on the host spoils one sample
+    # of many programs instead of every sample of one. The median of the rounds is kept, a single best-of
+    # sample swings by tens of percent between runs on a shared host. The calibration runs every round too,
+    # so it sees the same host as the phases.
+    sizes = {shape: [0] * len(sources) for shape, sources in programs.items()}
+    samples = {shape: [{phase: [] for phase in PHASES} for _ in sources] for shape, sources in programs.items()}
+    for _ in range(repeat):
+        calibration.append(calibrate())
+        for shape, sources in programs.items():
+            for index, source in enumerate(sources):
+                sizes[shape][index], seconds = measure_phases(lexer, parser, source)
+                for phase in PHASES:
+                    samples[shape][index][phase].append(seconds[phase])
+
+    results = {}
+    for shape in programs:
+        medians = [{phase: statistics.median(times) for phase, times in program.items()} for program in samples[shape]]
+        for scale, size, phases in zip(scales[shape], sizes[shape], medians):
+            print(f"{shape:>12} scale {scale:>5}, {size:>7} tokens: "
+                  + ", ".join(f"{phase} {phases[phase] * 1000:8.2f}ms" for phase in PHASES), file=sys.stderr)
+
+        seconds = {phase: [phases[phase] for phases in medians] for phase in PHASES}
+        results[shape] = {"scales": scales[shape], "tokens": sizes[shape], "phases": {}}
+        for phase in PHASES:
+            coefficient, exponent = fit_power_law(sizes[shape], seconds[phase])
+            results[shape]["phases"][phase] = {
+                "seconds": seconds[phase],
+                "exponent": exponent,
+                "coefficient": coefficient,
+                "ns_per_token": seconds[phase][-1] / sizes[shape][-1] * 1e9,
+            }
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "seed": seed,
+        "calibration": statistics.median(calibration),
+        "shapes": results,
+    }
+
+
+def print_table(report: dict):
+    print(f"{'shape':>12} {'phase':>9} {'exponent':>9} {'ns/token':>10} {'largest':>10}")
+    for shape, result in report["shapes"].items():
+        for phase, data in result["phases"].items():
+            print(f"{shape:>12} {phase:>9} {data['exponent']:9.2f} {data['ns_per_token']:10.1f} "
+                  f"{data['seconds'][-1] * 1000:8.2f}ms")
+
+
+def compare(baseline: dict, report: dict, threshold: float, exponent_threshold: float) -> list[str]:
+    # A phase regresses when its total time over the shared scales grows by more than threshold, or when its
+    # scaling exponent grows by more than exponent_threshold, e.g. a linear pass turning quadratic
+    regressions = []
+    host = report["calibration"] / baseline["calibration"]
+    print(f"host speed x{1 / host:.2f} of the baseline's, times are scaled by it", file=sys.stderr)
+    for shape, result in report["shapes"].items():
+        base = baseline["shapes"].get(shape)
+        if base is None or base["scales"] != result["scales"]:
+            print(f"{shape}: no baseline with the same scales, skipped", file=sys.stderr)
+            continue
+
+        for phase, data in result["phases"].items():
+            base_data = base["phases"][phase]
+            ratio = sum(data["seconds"]) / sum(base_data["seconds"]) / host
+            growth = data["exponent"] - base_data["exponent"]
+            print(f"{shape:>12} {phase:>9}: time x{ratio:.2f}, exponent {base_data['exponent']:.2f} -> "
+                  f"{data['exponent']:.2f}")
+            if base_data["seconds"][-1] < MIN_COMPARED_SECONDS:
+                continue
+            if ratio > 1 + threshold:
+                regressions.append(f"{shape}/{phase} is {(ratio - 1) * 100:.0f}% slower")
+            if growth > exponent_threshold:
+                regressions.append(f"{shape}/{phase} scales as n^{data['exponent']:.2f}, "
+                                   f"was n^{base_data['exponent']:.2f}")
+
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Measure lexer, parser, code generator and evaluator throughput over generated programs."
+    )
+    arg_parser.add_argument("--shapes", nargs="+", choices=list(SHAPES), default=list(SHAPES))
+    arg_parser.add_argument("--repeat", type=int, default=9)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--scale-factor", type=float, default=1., help="multiplies every default scale")
+    arg_parser.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    arg_parser.add_argument("--compare", metavar="PATH", help="fail if a phase regressed against this baseline")
+    arg_parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 is 25%%")
+    arg_parser.add_argument("--exponent-threshold", type=float, default=0.3,
+                            help="allowed growth of a phase's scaling exponent")
+    args = arg_parser.parse_args()
+
+    report = run_suite(args.shapes, args.repeat, args.seed, args.scale_factor)
+    print_table(report)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold, args.exponent_threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import argparse
+import sys
+import time
+
+from analyzers import Lexer, Parser
+from ast_evaluator import AstEvaluator
+from code_generation.code_generator import CodeGenerator
+from utils import TerminalUtil
+
+# Left-associative chains parse into a tree as deep as the number of terms
+CHAIN = "func Main(a: red) {{\n    x = a{terms};\n    return x;\n}}\n"
+ELSE_IF = "func Main(a: red) {{\n    x = 0;\n    {branches} else {{\n        x = 1;\n    }}\n    return x;\n}}\n"
+
+
+def chain_source(depth: int) -> str:
+    return CHAIN.format(terms=" + a" * depth)
+
+
+def else_if_source(depth: int) -> str:
+    # The evaluator runs with a = 0, so every condition is tested before the else branch
+    branches = " else ".join(f"if (a == {i}) {{\n        x = {i};\n    }}" for i in range(1, depth + 1))
+    return ELSE_IF.format(branches=branches)
+
+
+def measure(program, run, repeat: int) -> float | None:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            run(program)
+        except RecursionError:
+            return None
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+PASSES = {
+    "evaluate": lambda program: AstEvaluator().evaluate(program),
+    "codegen": lambda program: CodeGenerator.generate_code(program),
+    "pretty": lambda program: TerminalUtil.get_pretty(program),
+}
+# Every line of the tree view is indented by its depth, so its text grows with the square of the depth
+PRETTY_MAX_DEPTH = 5000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure AST passes over very deep trees.")
+    arg_parser.add_argument("--depths", type=int, nargs="+", default=[200, 2000, 20000])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    lexer, parser = Lexer(), Parser()
+    print(f"recursion limit {sys.getrecursionlimit()}")
+    for shape, make_source in [("a + a + ...", chain_source), ("else if chain", else_if_source)]:
+        for depth in args.depths:
+            source = make_source(depth)
+            program = parser.parse(lexer.lex(source))
+            text = []
+            for name, run in PASSES.items():
+                if name == "pretty" and depth > PRETTY_MAX_DEPTH:
+                    continue
+                seconds = measure(program, run, args.repeat)
+                text.append(f"{name} {'RecursionError' if seconds is None else f'{seconds * 1000:.2f}ms'}")
+            print(f"{shape:>14} depth {depth:>6}: {', '.join(text)}")
+
+
+if __name__ == '__main__':
+    main()
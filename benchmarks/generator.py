@@ -0,0 +1,132 @@
+import argparse
+import random
+
+ARITHMETIC_OPERATORS = ["+", "-", "*"]
+COMPARISON_OPERATORS = ["==", "!=", "<", ">", "<=", ">="]
+
+
+class ProgramGenerator:
+    # Expands the language's productions top-down with seeded choices. Every generated program parses,
+    # evaluates and compiles: variables are read only after they are assigned in an enclosing scope, loops
+    # have small constant trip counts, divisors are non-zero constants and conditions are comparisons.
+    def __init__(self, seed: int = 0, expression_depth: int = 3, loop_trips: int = 3, leaf_chance: float = 0.2):
+        self.random = random.Random(seed)
+        self.expression_depth = expression_depth
+        self.leaf_chance = leaf_chance
+        self.loop_trips = loop_trips
+        self._names = 0
+
+    def program(self, functions: int, statements: int, nesting: int) -> str:
+        parts = [self.function("Main", statements, nesting)]
+        parts += [self.function(f"Func{i}", statements, nesting) for i in range(functions - 1)]
+        # Program finds the entry point by name once every function is known, so it goes to a seeded position
+        parts.insert(self.random.randint(0, functions - 1), parts.pop(0))
+        return "\n".join(parts)
+
+    def function(self, name: str, statements: int, nesting: int) -> str:
+        scope = ["a", "b"]
+        lines = [f"func {name}(a: red, b: green) {{"]
+        lines += self.body(scope, statements, nesting, "    ")
+        lines.append(f"    return {self.expression(scope, self.expression_depth)};")
+        lines.append("}")
+        return "\n".join(lines)
+
+    def body(self, scope: list[str], statements: int, nesting: int, indent: str) -> list[str]:
+        lines = []
+        for _ in range(statements):
+            choice = self.random.random()
+            if nesting and choice < 0.25:
+                lines += self.for_statement(scope, nesting, indent)
+            elif nesting and choice < 0.5:
+                lines += self.if_statement(scope, nesting, indent)
+            else:
+                lines.append(indent + self.assign(scope))
+
+        return lines
+
+    def assign(self, scope: list[str]) -> str:
+        value = self.expression(scope, self.expression_depth)
+        writable = [name for name in scope if not name.startswith("i")]
+        if writable and self.random.random() < 0.3:
+            return f"{self.random.choice(writable)} += {value};"
+
+        name = self.new_name("v")
+        scope.append(name)
+        return f"{name} = {value};"
+
+    def for_statement(self, scope: list[str], nesting: int, indent: str) -> list[str]:
+        counter = self.new_name("i")
+        inner = scope + [counter]
+        lines = [f"{indent}for ({counter} = 0; {counter} < {self.random.randint(1, self.loop_trips)}; {counter}++) {{"]
+        lines += self.body(inner, 2, nesting - 1, indent + "    ")
+        lines.append(indent + "}")
+        return lines
+
+    def if_statement(self, scope: list[str], nesting: int, indent: str) -> list[str]:
+        lines = [f"{indent}if ({self.condition(scope)}) {{"]
+        lines += self.body(list(scope), 2, nesting - 1, indent + "    ")
+        while self.random.random() < 0.4:
+            lines.append(f"{indent}}} else if ({self.condition(scope)}) {{")
+            lines += self.body(list(scope), 1, nesting - 1, indent + "    ")
+        if self.random.random() < 0.5:
+            lines.append(f"{indent}}} else {{")
+            lines += self.body(list(scope), 1, nesting - 1, indent + "    ")
+        lines.append(indent + "}")
+        return lines
+
+    def condition(self, scope: list[str]) -> str:
+        operator = self.random.choice(COMPARISON_OPERATORS)
+        return f"{self.random.choice(scope)} {operator} {self.random.randint(0, 9)}"
+
+    def expression(self, scope: list[str], depth: int) -> str:
+        if depth <= 0 or self.random.random() < self.leaf_chance:
+            return self.operand(scope)
+
+        if self.random.random() < 0.1:
+            return f"{self.expression(scope, depth - 1)} / {self.random.randint(1, 9)}"
+
+        operator = self.random.choice(ARITHMETIC_OPERATORS)
+        left, right = self.expression(scope, depth - 1), self.operand(scope)
+        if self.random.random() < 0.5:
+            left, right = right, left
+        return f"({left} {operator} {right})"
+
+    def operand(self, scope: list[str]) -> str:
+        return self.random.choice(scope) if self.random.random() < 0.6 else str(self.random.randint(0, 99))
+
+    def new_name(self, prefix: str) -> str:
+        self._names += 1
+        return f"{prefix}{self._names}"
+
+
+# Shapes grow one dimension of a program with the scale, the rest stays small
+SHAPES = {
+    "functions": lambda scale, seed: ProgramGenerator(seed).program(scale, 4, 1),
+    "statements": lambda scale, seed: ProgramGenerator(seed).program(1, scale, 0),
+    "expressions": lambda scale, seed: ProgramGenerator(seed, expression_depth=scale, leaf_chance=0).program(1, 8, 0),
+    "nesting": lambda scale, seed: ProgramGenerator(seed, loop_trips=2).program(1, scale, 3),
+}
+
+
+def generate(shape: str, scale: int, seed: int = 0) -> str:
+    return SHAPES[shape](scale, seed)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Generate a synthetic .fcpu program.")
+    arg_parser.add_argument("--shape", choices=list(SHAPES), default="statements")
+    arg_parser.add_argument("--scale", type=int, default=100)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("-o", "--output", help="write here instead of stdout")
+    args = arg_parser.parse_args()
+
+    source = generate(args.shape, args.scale, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(source)
+    else:
+        print(source)
+
+
+if __name__ == '__main__':
+    main()
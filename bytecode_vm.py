@@ -0,0 +1,240 @@
+import operator
+from typing import TYPE_CHECKING
+
+from terminal.assign import Assign
+from terminal.base import NumberLiteral, Variable
+from terminal.bodies import Body
+from terminal.compounds import IfStatement, ForStatement
+from terminal.returns import Return, Yield
+from tokens import TokenKind
+from visitor import Visitor
+
+if TYPE_CHECKING:
+    from ast_evaluator import ExecutionFrame
+    from terminal.base import Terminal
+
+(
+    PUSH_CONST, LOAD, STORE, BINARY, BINARY_VAR_CONST, BINARY_VAR_VAR, POP, JUMP, JUMP_IF_FALSE,
+    UNARY, NEW_FRAME, CLOSE_FRAME, RETURN, RAISE
+) = range(14)
+
+OPCODE_NAMES = [
+    "PUSH_CONST", "LOAD", "STORE", "BINARY", "BINARY_VAR_CONST", "BINARY_VAR_VAR", "POP", "JUMP", "JUMP_IF_FALSE",
+    "UNARY", "NEW_FRAME", "CLOSE_FRAME", "RETURN", "RAISE"
+]
+
+BINARY_OPERATORS = {
+    TokenKind.OP_SUM.name: operator.add,
+    TokenKind.OP_SUB.name: operator.sub,
+    TokenKind.OP_MUL.name: operator.mul,
+    TokenKind.OP_DIV.name: operator.truediv,
+    TokenKind.OP_CMP_EQ.name: operator.eq,
+    TokenKind.OP_CMP_NE.name: operator.ne,
+    TokenKind.OP_CMP_GE.name: operator.ge,
+    TokenKind.OP_CMP_LE.name: operator.le,
+    TokenKind.OP_CMP_GT.name: operator.gt,
+    TokenKind.OP_CMP_LT.name: operator.lt,
+}
+
+_UNSET = object()
+
+
+class CodeObject:
+    def __init__(self, code: list[tuple[int, object]], slot_names: list[str]):
+        self.code = code
+        self.slot_names = slot_names
+
+    def disassemble(self):
+        return "\n".join(
+            f"{i:>4} {OPCODE_NAMES[op]:<14} {'' if arg is None else arg}"
+            for i, (op, arg) in enumerate(self.code)
+        )
+
+
+class BytecodeCompiler(Visitor):
+    # Children are compiled by yielding them, see Visitor, so deeply nested code does not recurse
+    def __init__(self):
+        self.code: list[list] = []
+        self.slots: dict[str, int] = {}
+
+    @staticmethod
+    def compile(ast: 'Terminal') -> CodeObject:
+        compiler = BytecodeCompiler()
+        compiler.visit(ast)
+        compiler._emit(RETURN)
+        return CodeObject([tuple(instr) for instr in compiler.code], list(compiler.slots))
+
+    def _emit(self, op: int, arg=None) -> int:
+        self.code.append([op, arg])
+        return len(self.code) - 1
+
+    def _patch(self, index: int, target: int = None):
+        self.code[index][1] = len(self.code) if target is None else target
+
+    def _slot(self, name: str) -> int:
+        return self.slots.setdefault(name, len(self.slots))
+
+    def visit_program(self, node):
+        yield node.entry_point
+
+    def visit_function(self, node):
+        self._emit(NEW_FRAME)
+        for arg in node.args.items:
+            self._emit(PUSH_CONST, 0)
+            self._emit(STORE, self._slot(arg.arg_name.value))
+
+        yield node.body, True
+
+    def visit_body(self, node: Body, is_function_body=False):
+        exits = []
+        for item in node.items:
+            if item.name in [Yield.name, Return.name]:
+                yield item.value
+                self._emit(CLOSE_FRAME)
+                if is_function_body:
+                    self._emit(RETURN)
+                else:
+                    # A nested body hands its output to if/for statements, which discard it
+                    self._emit(POP)
+                    exits.append(self._emit(JUMP))
+                break
+
+            yield item
+            if item.name not in [Assign.name, IfStatement.name, ForStatement.name]:
+                self._emit(POP)
+
+        if is_function_body:
+            self._emit(PUSH_CONST, None)
+
+        for index in exits:
+            self._patch(index)
+
+    def visit_assign(self, node):
+        yield node.value
+        self._emit(STORE, self._slot(node.a_name))
+
+    def visit_number_literal(self, node):
+        self._emit(PUSH_CONST, node.value)
+
+    def visit_variable(self, node):
+        self._emit(LOAD, self._slot(node.a_name))
+
+    def visit_unary_expr(self, node):
+        delta = 1 if node.operator.name == TokenKind.INCREMENT.name else -1
+        self._emit(UNARY, (self._slot(node.identifier), delta, node.mode))
+
+    def visit_expression(self, node):
+        binary = BINARY_OPERATORS.get(node.operator.name)
+        if not binary:
+            self._emit(RAISE, ValueError(f"Evaluating invalid operator token: '{node.operator}'"))
+            return
+
+        # Operands that are plain variables or literals are fused into one instruction
+        if isinstance(node.left, Variable) and isinstance(node.right, NumberLiteral):
+            self._emit(BINARY_VAR_CONST, (binary, self._slot(node.left.a_name), node.right.value))
+        elif isinstance(node.left, Variable) and isinstance(node.right, Variable):
+            self._emit(BINARY_VAR_VAR, (binary, self._slot(node.left.a_name), self._slot(node.right.a_name)))
+        else:
+            yield node.left
+            yield node.right
+            self._emit(BINARY, binary)
+
+    def visit_condition(self, node):
+        yield node.expr
+
+    def visit_if_statement(self, node):
+        yield node.condition
+        to_else = self._emit(JUMP_IF_FALSE)
+        yield node.body
+
+        if node.else_statement:
+            to_end = self._emit(JUMP)
+            self._patch(to_else)
+            yield node.else_statement
+            self._patch(to_end)
+        else:
+            self._patch(to_else)
+
+    def visit_for_statement(self, node):
+        yield node.startup
+        loop = len(self.code)
+        yield node.condition
+        to_end = self._emit(JUMP_IF_FALSE)
+        yield node.body
+        yield node.increment
+        self._emit(POP)
+        self._emit(JUMP, loop)
+        self._patch(to_end)
+
+
+class BytecodeVM:
+    @staticmethod
+    def run(code_object: CodeObject, frame: 'ExecutionFrame'):
+        names = code_object.slot_names
+        slots = [frame.locals.get(name, _UNSET) for name in names]
+        try:
+            return BytecodeVM._dispatch(code_object.code, slots, names, frame)
+        finally:
+            for name, value in zip(names, slots):
+                if value is not _UNSET:
+                    frame.locals[name] = value
+
+    @staticmethod
+    def _dispatch(code, slots, names, frame, _load=LOAD, _push_const=PUSH_CONST, _binary=BINARY, _store=STORE,
+                  _binary_var_const=BINARY_VAR_CONST, _binary_var_var=BINARY_VAR_VAR, _jump_if_false=JUMP_IF_FALSE,
+                  _jump=JUMP, _pop=POP, _unary=UNARY, _return=RETURN):
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+
+        while True:
+            op, arg = code[pc]
+            pc += 1
+
+            if op == _binary_var_const:
+                binary, slot, const = arg
+                value = slots[slot]
+                if value is _UNSET:
+                    raise KeyError(names[slot])
+                push(binary(value, const))
+            elif op == _load:
+                value = slots[arg]
+                if value is _UNSET:
+                    raise KeyError(names[arg])
+                push(value)
+            elif op == _push_const:
+                push(arg)
+            elif op == _binary:
+                right = pop()
+                stack[-1] = arg(stack[-1], right)
+            elif op == _binary_var_var:
+                binary, left_slot, right_slot = arg
+                left, right = slots[left_slot], slots[right_slot]
+                if left is _UNSET or right is _UNSET:
+                    raise KeyError(names[left_slot if left is _UNSET else right_slot])
+                push(binary(left, right))
+            elif op == _store:
+                slots[arg] = pop()
+            elif op == _jump_if_false:
+                if not pop():
+                    pc = arg
+            elif op == _jump:
+                pc = arg
+            elif op == _pop:
+                pop()
+            elif op == _unary:
+                slot, delta, mode = arg
+                old = slots[slot]
+                if old is _UNSET:
+                    raise KeyError(names[slot])
+                slots[slot] = old + delta
+                push(old if mode and old else old + delta)
+            elif op == NEW_FRAME:
+                frame.new_frame()
+            elif op == CLOSE_FRAME:
+                frame.close_frame()
+            elif op == _return:
+                return pop()
+            elif op == RAISE:
+                raise arg
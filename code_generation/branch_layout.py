@@ -0,0 +1,28 @@
+from collections import Counter, defaultdict
+
+# Share of executions given to the branch predicted as likely in a two-way if/else
+LIKELY_PROBABILITY = 0.8
+
+
+class BranchLayoutReport:
+    # Paths are (ticks, probability) pairs of one if/else chain, before and after a layout change
+    def __init__(self):
+        self.chains = 0
+        self.changes: Counter[str] = Counter()
+        self.worst_case: Counter[str] = Counter()
+        self.average: dict[str, float] = defaultdict(float)
+
+    def record(self, change: str, before: list[tuple[int, float]], after: list[tuple[int, float]]):
+        if before == after:
+            return
+
+        self.changes[change] += 1
+        self.worst_case[change] += max(ticks for ticks, _ in before) - max(ticks for ticks, _ in after)
+        self.average[change] += sum(ticks * p for ticks, p in before) - sum(ticks * p for ticks, p in after)
+
+    def __repr__(self):
+        changes = ", ".join(
+            f"{change}: {count}x, worst -{self.worst_case[change]}, average -{self.average[change]:.2f}"
+            for change, count in self.changes.items()
+        )
+        return f"BranchLayoutReport({self.chains} chains, {changes or 'no changes'})"
@@ -1,11 +1,20 @@
 from typing import TYPE_CHECKING
 
-from code_generation.opcodes import Instruction
-from code_generation.stacks import RegisterStack, SignalStack, TypeSignalKind, OutputStack, Register
+from code_generation.costs import TARGET_COSTS
+from code_generation.dead_code import DeadCodeEliminator
+from code_generation.loop_invariants import LoopInvariantHoisting
+from code_generation.opcodes import Instruction, Label
+from code_generation.peephole import PeepholeOptimizer
+from code_generation.register_allocator import RegisterAllocator
+from code_generation.strength_reduction import StrengthReduction
+from code_generation.stacks import VirtualRegisterStack, SignalStack, TypeSignalKind, OutputStack
 from settings import CompilerSettings, CompilationTarget
+from tracing import current_tracer
+from visitor import Visitor, copy_tree
 
 if TYPE_CHECKING:
-    from terminal import Program, Variable
+    from terminal import Program
+    from terminal.function import Function
 
 
 class CodeGenFrame:
@@ -14,19 +23,20 @@ class CodeGenFrame:
         self.return_storage = None
 
     def push_opcode(self, opcode: Instruction):
+        if not opcode.source_pos:
+            opcode.source_pos = self.data.source_pos
         self.data.opcodes.append(opcode)
 
+    def mark_source(self, node) -> int:
+        # Instructions pushed from now on belong to the node's source position, returns the previous position
+        previous = self.data.source_pos
+        self.data.source_pos = getattr(node, "n_source_pos", 0) or previous
+        return previous
+
     @property
     def reg_stack(self):
         return self.data.reg_stack
 
-    def try_pop_reg(self, index: int):
-        if len(self.reg_stack.available) == 0:
-            reg_vars = filter(lambda a: isinstance(a.n_storage_, Register), self.data.locals.values())
-            var: Variable = list(reg_vars)[0]
-
-        return self.reg_stack.pop(index)
-
     @property
     def sig_stack(self):
         return self.data.sig_stack
@@ -52,9 +62,23 @@ class CodeGenFrame:
         return self.data.get_local_or_global(name)
 
 
+class OpcodeVisitor(Visitor):
+    # Every node generates its own opcodes into one shared frame. A leaf sets frame.return_storage, a node with
+    # children is a generator that yields them, gets their storage back and returns its own.
+    def __init__(self, frame: CodeGenFrame):
+        self.frame = frame
+
+    def generic_visit(self, node, *args):
+        frame = self.frame
+        frame.return_storage = None
+        routine = node.generate_opcodes(frame, *args)
+        return frame.return_storage if routine is None else routine
+
+
 class CodeGenData:
-    def __init__(self):
-        self.reg_stack = RegisterStack()
+    def __init__(self, settings: CompilerSettings = None):
+        # Code is generated for unlimited registers, allocate_registers() maps them onto the fCPU ones
+        self.reg_stack = VirtualRegisterStack()
         self.sig_stack = SignalStack({
             TypeSignalKind.virtual_signal: TypeSignalKind.virtual_signal.value,
             TypeSignalKind.item: TypeSignalKind.item.value
@@ -63,7 +87,10 @@ class CodeGenData:
         self.opcodes = []
         self.globals = {}
         self.locals = {}
-        self.settings: CompilerSettings = CompilerSettings(CompilationTarget.raw_fcpu)
+        self.settings: CompilerSettings = settings or CompilerSettings(CompilationTarget.raw_fcpu)
+        self.reports: dict[str, object] = {}
+        self.return_label: Label | None = None
+        self.source_pos = 0
         self._frame_archive: list[CodeGenFrame] = []
         self._frame_stack: list[CodeGenFrame] = [CodeGenFrame(self)]
         self.label_counter: dict[str, int] = {
@@ -103,7 +130,91 @@ class CodeGenData:
 
 class CodeGenerator:
     @staticmethod
-    def generate_code(ast: 'Program', entry_point_name="Main"):
-        env = CodeGenData()
-        ast.entry_point.generate_opcodes(env.current_frame)
-        return env.opcodes
+    def generate_code(ast: 'Program', entry_point_name="Main", settings: CompilerSettings = None):
+        return CodeGenerator.generate_function_code(ast.entry_point, settings)
+
+    @staticmethod
+    def generate_function_code(function: 'Function', settings: CompilerSettings = None):
+        return CodeGenerator.generate_function_data(function, settings).opcodes
+
+    @staticmethod
+    def generate_function_data(function: 'Function', settings: CompilerSettings = None) -> CodeGenData:
+        env = CodeGenData(settings)
+        tracer = current_tracer()
+        # Folding, unrolling and opcode generation rewrite the tree they work on, the caller's stays as parsed
+        with tracer.span("copy_ast"):
+            function = copy_tree(function)
+        with tracer.span("optimize_ast"):
+            CodeGenerator.optimize_ast(env, function)
+        with tracer.span("generate_opcodes"):
+            OpcodeVisitor(env.current_frame).visit(function)
+        with tracer.span("strength_reduction"):
+            CodeGenerator.reduce_strength(env)
+        with tracer.span("dead_code"):
+            CodeGenerator.eliminate_dead_code(env, function)
+        with tracer.span("loop_invariants"):
+            CodeGenerator.hoist_loop_invariants(env)
+        with tracer.span("registers"):
+            CodeGenerator.allocate_registers(env)
+        with tracer.span("peephole"):
+            CodeGenerator.optimize(env)
+        return env
+
+    @staticmethod
+    def reduce_strength(env: CodeGenData):
+        settings = env.settings
+        if not settings.optimize or not settings.strength_reduction:
+            return
+
+        reduction = StrengthReduction(TARGET_COSTS[settings.compilation_target], env.reg_stack.pop)
+        env.opcodes, env.reports["strength_reduction"] = reduction.reduce(env.opcodes)
+
+    @staticmethod
+    def eliminate_dead_code(env: CodeGenData, function: 'Function'):
+        settings = env.settings
+        if not settings.optimize or not settings.dead_code_elimination:
+            return
+
+        eliminator = DeadCodeEliminator(TARGET_COSTS[settings.compilation_target])
+        env.opcodes, env.reports["dead_code"] = eliminator.eliminate(env.opcodes, function.a_name)
+
+    @staticmethod
+    def hoist_loop_invariants(env: CodeGenData):
+        settings = env.settings
+        if not settings.optimize or not settings.loop_optimization:
+            return
+
+        hoisting = LoopInvariantHoisting(TARGET_COSTS[settings.compilation_target], settings.hoist_input_reads)
+        env.opcodes, env.reports["loop_invariants"] = hoisting.hoist(env.opcodes)
+
+    @staticmethod
+    def allocate_registers(env: CodeGenData):
+        allocator = RegisterAllocator(rematerialize=env.settings.optimize)
+        env.opcodes, env.reports["registers"] = allocator.allocate(env.opcodes)
+
+    @staticmethod
+    def optimize_ast(env: CodeGenData, function: 'Function'):
+        settings = env.settings
+        if not settings.optimize:
+            return
+
+        from ast_optimizer import ConstantFolder, LoopUnroller
+
+        folder = ConstantFolder()
+        if settings.constant_folding:
+            env.reports["constant_folding"] = folder.run(function)
+
+        if settings.loop_optimization:
+            unrolling = env.reports["unrolling"] = LoopUnroller(settings.unroll_budget).run(function)
+            # Unrolled copies see the loop counter as a constant
+            if settings.constant_folding and unrolling.full + unrolling.partial:
+                folder.run(function)
+
+    @staticmethod
+    def optimize(env: CodeGenData):
+        settings = env.settings
+        if not settings.optimize:
+            return
+
+        if settings.peephole_rules is None or settings.peephole_rules:
+            env.opcodes, env.reports["peephole"] = PeepholeOptimizer(settings.peephole_rules).optimize(env.opcodes)
@@ -0,0 +1,28 @@
+from code_generation.opcodes import OpcodeKind, OPCODE_KINDS
+from settings import CompilationTarget
+
+
+class CostTable:
+    def __init__(self, costs: dict[OpcodeKind, int], default: int = 1):
+        self.costs = costs
+        self.default = default
+        self._by_id = [costs.get(kind, default) for kind in OPCODE_KINDS]
+
+    def cost(self, kind: OpcodeKind) -> int:
+        return self._by_id[kind.value.id]
+
+    def total(self, opcodes) -> int:
+        by_id = self._by_id
+        return sum(by_id[opcode.kind.value.id] for opcode in opcodes)
+
+
+# Every fCPU instruction takes one game tick, labels and comments are not executed
+FCPU_COSTS = CostTable({
+    OpcodeKind.n_label: 0,
+    OpcodeKind.n_comment: 0,
+})
+
+TARGET_COSTS: dict[CompilationTarget, CostTable] = {
+    CompilationTarget.raw_fcpu: FCPU_COSTS,
+    CompilationTarget.fcpu_batch: FCPU_COSTS,
+}
@@ -0,0 +1,90 @@
+from collections import Counter
+
+from code_generation.costs import CostTable, FCPU_COSTS
+from code_generation.liveness import ControlFlowGraph, Liveness
+from code_generation.opcodes import Instruction, Label, OpcodeKind
+from code_generation.stacks import Register
+
+
+class DeadCodeReport:
+    def __init__(self, function: str):
+        self.function = function
+        self.removed: Counter[str] = Counter()
+        self.ticks = 0
+        self.passes = 0
+
+    @property
+    def instructions(self):
+        return sum(self.removed.values())
+
+    def __repr__(self):
+        reasons = ", ".join(f"{reason}: -{count}" for reason, count in self.removed.items())
+        return (
+            f"DeadCodeReport({self.function}: -{self.instructions} instructions ({reasons or 'none'}), "
+            f"-{self.ticks} ticks, passes={self.passes})"
+        )
+
+
+class DeadCodeEliminator:
+    # Removing an instruction can make the values it read dead too, so passes repeat until nothing changes
+    def __init__(self, cost_table: CostTable = FCPU_COSTS, max_passes: int = 16):
+        self.cost_table = cost_table
+        self.max_passes = max_passes
+
+    def eliminate(self, opcodes: list[Instruction], function: str = "") -> tuple[list[Instruction], DeadCodeReport]:
+        report = DeadCodeReport(function)
+        while report.passes < self.max_passes:
+            report.passes += 1
+            opcodes, changed = self._pass(opcodes, report)
+            if not changed:
+                break
+
+        return opcodes, report
+
+    def _pass(self, opcodes: list[Instruction], report: DeadCodeReport) -> tuple[list[Instruction], bool]:
+        cfg = ControlFlowGraph(opcodes)
+        reachable = cfg.reachable()
+        liveness = Liveness(cfg)
+        output = []
+        changed = False
+
+        for block in cfg.blocks:
+            if block.index not in reachable:
+                for opcode in opcodes[block.start:block.end]:
+                    changed = True
+                    self._remove(opcode, "unreachable", report)
+                continue
+
+            for offset, live in enumerate(liveness.live_after(block)):
+                opcode = opcodes[block.start + offset]
+                kept = self._without_dead_stores(opcode, liveness.defs[block.start + offset], live)
+                if kept is not opcode:
+                    changed = True
+                    if kept is None:
+                        self._remove(opcode, "dead_store", report)
+                        continue
+                output.append(kept)
+
+        return output, changed
+
+    def _remove(self, opcode: Instruction, reason: str, report: DeadCodeReport):
+        if isinstance(opcode, Label) or opcode.kind == OpcodeKind.n_comment:
+            return
+        report.removed[reason] += 1
+        report.ticks += self.cost_table.cost(opcode.kind)
+
+    @staticmethod
+    def _without_dead_stores(opcode: Instruction, defs: list[Register], live: set[Register]) -> Instruction | None:
+        # Only register writes are dead stores, outputs and memory cells stay observable
+        if not defs:
+            return opcode
+
+        if opcode.kind != OpcodeKind.mov:
+            return opcode if any(register in live for register in defs) else None
+
+        destinations = [arg for arg in opcode.args[:-1] if not isinstance(arg, Register) or arg in live]
+        if len(destinations) == len(opcode.args) - 1:
+            return opcode
+
+        return Instruction(OpcodeKind.mov, destinations + opcode.args[-1:], False, opcode.source_pos) \
+            if destinations else None
@@ -0,0 +1,196 @@
+from code_generation.opcodes import Instruction, Label, OpcodeKind
+from code_generation.stacks import Register, Const
+
+BRANCH_KINDS = {OpcodeKind.beq, OpcodeKind.bne, OpcodeKind.blt, OpcodeKind.ble, OpcodeKind.bgt, OpcodeKind.bge}
+TEST_KINDS = {OpcodeKind.teq, OpcodeKind.tne, OpcodeKind.tlt, OpcodeKind.tle, OpcodeKind.tgt, OpcodeKind.tge}
+READ_MODIFY_WRITE_KINDS = {OpcodeKind.inc, OpcodeKind.dec}
+
+
+def defs_and_uses(opcode: Instruction) -> tuple[list[Register], list[Register]]:
+    if isinstance(opcode, Label) or not opcode.args:
+        return [], []
+
+    defs, uses = [], []
+    rule = opcode.kind.value
+    for index, arg in enumerate(opcode.args):
+        if not isinstance(arg, Register):
+            continue
+
+        if rule.arg_at(index, len(opcode.args)).name == "dst":
+            defs.append(arg)
+            if opcode.kind in READ_MODIFY_WRITE_KINDS:
+                uses.append(arg)
+        else:
+            uses.append(arg)
+
+    return defs, uses
+
+
+class BasicBlock:
+    def __init__(self, index: int, start: int, end: int):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.successors: list[int] = []
+        self.predecessors: list[int] = []
+        # Ends in a jump to a register address, which may land on any block
+        self.computed_jump = False
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.index}: {self.start}..{self.end} -> {self.successors})"
+
+
+class ControlFlowGraph:
+    # Blocks are half-open ranges of positions in opcodes, labels included
+    def __init__(self, opcodes: list[Instruction]):
+        self.opcodes = opcodes
+        self.blocks: list[BasicBlock] = []
+        self.block_of: list[int] = [0] * len(opcodes)
+        self.label_positions: dict[str, int] = {}
+
+        leaders = {0}
+        label_positions = self.label_positions
+        instruction_positions: list[int] = []
+        for position, opcode in enumerate(opcodes):
+            if isinstance(opcode, Label):
+                label_positions[opcode.name] = position
+                leaders.add(position)
+                continue
+            if opcode.kind == OpcodeKind.n_comment:
+                continue
+
+            instruction_positions.append(position)
+            if opcode.kind == OpcodeKind.jmp or opcode.kind in BRANCH_KINDS or opcode.kind in TEST_KINDS:
+                leaders.add(position + 1)
+
+        for number, position in enumerate(instruction_positions):
+            if opcodes[position].kind in TEST_KINDS and number + 2 < len(instruction_positions):
+                leaders.add(instruction_positions[number + 2])
+
+        leaders = sorted(leader for leader in leaders if leader < len(opcodes))
+        for index, start in enumerate(leaders):
+            end = leaders[index + 1] if index + 1 < len(leaders) else len(opcodes)
+            self.blocks.append(BasicBlock(index, start, end))
+            self.block_of[start:end] = [index] * (end - start)
+
+        instruction_numbers = {position: number for number, position in enumerate(instruction_positions)}
+        for block in self.blocks:
+            block.successors = self._successors(
+                block, label_positions, instruction_positions, instruction_numbers
+            )
+            for successor in block.successors:
+                self.blocks[successor].predecessors.append(block.index)
+
+    def _successors(self, block: BasicBlock, label_positions: dict[str, int],
+                    instruction_positions: list[int], instruction_numbers: dict[int, int]) -> list[int]:
+        falls_through = block.end < len(self.opcodes)
+        last = self.opcodes[block.end - 1]
+        if isinstance(last, Label) or last.kind not in BRANCH_KINDS | TEST_KINDS | {OpcodeKind.jmp}:
+            return [block.index + 1] if falls_through else []
+
+        if last.kind in TEST_KINDS:
+            number = instruction_numbers[block.end - 1]
+            successors = [block.index + 1] if falls_through else []
+            if number + 2 < len(instruction_positions):
+                successors.append(self.block_of[instruction_positions[number + 2]])
+            return successors
+
+        address = last.args[-1]
+        if isinstance(address, Label):
+            targets = [self.block_of[label_positions[address.name]]] if address.name in label_positions else []
+        elif isinstance(address, (Const, int)):
+            number = instruction_numbers[block.end - 1] + address.value if isinstance(address, Const) else address - 1
+            targets = [self.block_of[instruction_positions[number]]] \
+                if 0 <= number < len(instruction_positions) else []
+        else:
+            block.computed_jump = True
+            targets = [other.index for other in self.blocks]
+
+        if last.kind != OpcodeKind.jmp and falls_through:
+            targets.append(block.index + 1)
+
+        return list(dict.fromkeys(targets))
+
+    def reachable(self) -> set[int]:
+        seen = {0} if self.blocks else set()
+        stack = list(seen)
+        while stack:
+            for successor in self.blocks[stack.pop()].successors:
+                if successor not in seen:
+                    seen.add(successor)
+                    stack.append(successor)
+
+        return seen
+
+    def loop_depths(self) -> list[int]:
+        # Every backward edge closes a loop over the positions between its target and itself
+        depths = [0] * len(self.opcodes)
+        for block in self.blocks:
+            if block.computed_jump:
+                continue
+            for successor in block.successors:
+                start = self.blocks[successor].start
+                if start <= block.start:
+                    for position in range(start, block.end):
+                        depths[position] += 1
+
+        return depths
+
+
+class Liveness:
+    def __init__(self, cfg: ControlFlowGraph):
+        self.cfg = cfg
+        self.defs: list[list[Register]] = []
+        self.uses: list[list[Register]] = []
+        for opcode in cfg.opcodes:
+            defs, uses = defs_and_uses(opcode)
+            self.defs.append(defs)
+            self.uses.append(uses)
+
+        self.live_in: list[set[Register]] = [set() for _ in cfg.blocks]
+        self.live_out: list[set[Register]] = [set() for _ in cfg.blocks]
+        self._solve()
+
+    def _block_summary(self, block: BasicBlock) -> tuple[set[Register], set[Register]]:
+        gen, kill = set(), set()
+        for position in range(block.end - 1, block.start - 1, -1):
+            kill.update(self.defs[position])
+            gen.difference_update(self.defs[position])
+            gen.update(self.uses[position])
+
+        return gen, kill
+
+    def _solve(self):
+        blocks = self.cfg.blocks
+        summaries = [self._block_summary(block) for block in blocks]
+        pending = list(range(len(blocks)))
+        queued = set(pending)
+        while pending:
+            index = pending.pop()
+            queued.discard(index)
+            block = blocks[index]
+
+            live_out = set()
+            for successor in block.successors:
+                live_out |= self.live_in[successor]
+            self.live_out[index] = live_out
+
+            gen, kill = summaries[index]
+            live_in = gen | (live_out - kill)
+            if live_in != self.live_in[index]:
+                self.live_in[index] = live_in
+                for predecessor in block.predecessors:
+                    if predecessor not in queued:
+                        queued.add(predecessor)
+                        pending.append(predecessor)
+
+    def live_after(self, block: BasicBlock) -> list[set[Register]]:
+        # Registers live right after each position of the block
+        live = set(self.live_out[block.index])
+        result = [set()] * (block.end - block.start)
+        for position in range(block.end - 1, block.start - 1, -1):
+            result[position - block.start] = set(live)
+            live.difference_update(self.defs[position])
+            live.update(self.uses[position])
+
+        return result
@@ -0,0 +1,116 @@
+from code_generation.costs import CostTable, FCPU_COSTS
+from code_generation.liveness import ControlFlowGraph, Liveness
+from code_generation.opcodes import Instruction, OpcodeKind
+from code_generation.peephole import jump_target
+from code_generation.stacks import Register, Const
+
+PURE_KINDS = {
+    OpcodeKind.add, OpcodeKind.sub, OpcodeKind.mul, OpcodeKind.div, OpcodeKind.mod, OpcodeKind.pow, OpcodeKind.mov,
+}
+INPUT_KINDS = {OpcodeKind.fir, OpcodeKind.fig}
+
+
+class HoistingReport:
+    def __init__(self):
+        self.hoisted = 0
+        self.ticks_per_iteration = 0
+
+    def __repr__(self):
+        return f"HoistingReport(hoisted={self.hoisted}, -{self.ticks_per_iteration} ticks per iteration)"
+
+
+class LoopInvariantHoisting:
+    # Loops are found from backward edges, their body is the opcode range from the target label to the edge.
+    # Invariant instructions move in front of the loop label, innermost loops first.
+    def __init__(self, cost_table: CostTable = FCPU_COSTS, hoist_input_reads: bool = False, max_passes: int = 16):
+        self.cost_table = cost_table
+        self.hoistable_kinds = PURE_KINDS | INPUT_KINDS if hoist_input_reads else PURE_KINDS
+        self.max_passes = max_passes
+
+    def hoist(self, opcodes: list[Instruction]) -> tuple[list[Instruction], HoistingReport]:
+        report = HoistingReport()
+        for _ in range(self.max_passes):
+            cfg = ControlFlowGraph(opcodes)
+            liveness = Liveness(cfg)
+            for start, end in self._loops(cfg):
+                hoisted = self._invariants(cfg, liveness, start, end)
+                if hoisted:
+                    kept = [position for position in sorted(hoisted) if hoisted[position]]
+                    report.hoisted += len(kept)
+                    report.ticks_per_iteration += sum(self.cost_table.cost(opcodes[p].kind) for p in hoisted)
+                    opcodes = opcodes[:start] + [opcodes[p] for p in kept] + \
+                        [opcode for p, opcode in enumerate(opcodes[start:], start) if p not in hoisted]
+                    break
+            else:
+                break
+
+        return opcodes, report
+
+    @staticmethod
+    def _loops(cfg: ControlFlowGraph) -> list[tuple[int, int]]:
+        loops = []
+        for block in cfg.blocks:
+            if block.computed_jump:
+                continue
+            for successor in block.successors:
+                header = cfg.blocks[successor]
+                if header.start > block.start:
+                    continue
+
+                # Only loops entered by falling into the header have a spot for hoisted code
+                outside = [p for p in header.predecessors if not header.index <= p <= block.index]
+                target = jump_target(cfg.opcodes[header.start - 1]) if header.start else None
+                if outside == [header.index - 1] and not (
+                    target and cfg.label_positions.get(target.name) == header.start
+                ):
+                    loops.append((header.start, block.end))
+
+        return sorted(loops, key=lambda loop: loop[1] - loop[0])
+
+    def _invariants(self, cfg: ControlFlowGraph, liveness: Liveness, start: int, end: int) -> list[int]:
+        opcodes = cfg.opcodes
+        definitions: dict[Register, list[int]] = {}
+        for position in range(start, end):
+            for register in liveness.defs[position]:
+                definitions.setdefault(register, []).append(position)
+
+        header = cfg.block_of[start]
+        first, last = header, cfg.block_of[end - 1]
+        exits = {
+            successor for index in range(first, last + 1) for successor in cfg.blocks[index].successors
+            if not first <= successor <= last
+        }
+        live_outside = set(liveness.live_in[header])
+        for successor in exits:
+            live_outside |= liveness.live_in[successor]
+
+        # Positions to move out, mapped to whether the instruction is kept in front of the loop or just dropped
+        hoisted: dict[int, bool] = {}
+        invariant: set[Register] = set()
+        changed = True
+        while changed:
+            changed = False
+            for register, positions in definitions.items():
+                opcode = opcodes[positions[0]]
+                if register in invariant or register in live_outside or opcode.kind not in self.hoistable_kinds:
+                    continue
+                if len(liveness.defs[positions[0]]) != 1:
+                    continue
+                # Unrolled loops repeat the same computation, every copy then writes the same value
+                if any(not _same_instruction(opcode, opcodes[position]) for position in positions[1:]):
+                    continue
+                if any(use in definitions and use not in invariant for use in liveness.uses[positions[0]]):
+                    continue
+
+                hoisted[positions[0]] = True
+                hoisted.update((position, False) for position in positions[1:])
+                invariant.add(register)
+                changed = True
+
+        return hoisted
+
+
+def _same_instruction(a: Instruction, b: Instruction) -> bool:
+    return a.kind == b.kind and len(a.args) == len(b.args) and all(
+        x is y or isinstance(x, Const) and isinstance(y, Const) and x.value == y.value for x, y in zip(a.args, b.args)
+    )
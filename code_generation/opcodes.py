@@ -6,39 +6,82 @@ from code_generation.stacks import Register, TypeSignal, Signal, MemoryCell, Inp
 
 
 class OpcodeKindRule:
+    _next_id = 0
+
     def __init__(self, string: str):
-        split = list(map(str.strip, string.split("#")))
-        self.comment = "\n".join(split[1:])
-        self.args = [OpcodeKindRuleArg(arg) for arg in split[0].split()]
+        # The rule text is parsed on first use, most opcodes are never emitted by a given program
+        self._string = string
+        self._args: list[OpcodeKindRuleArg] | None = None
+        self.id = OpcodeKindRule._next_id
+        OpcodeKindRule._next_id += 1
+
+    def _parse(self):
+        split = list(map(str.strip, self._string.split("#")))
+        self._comment = "\n".join(split[1:])
+        self._args = [OpcodeKindRuleArg(arg) for arg in split[0].split()]
+
+        # Accepted python types per argument, checked with a set lookup instead of rebuilding lists
+        self._have_multi_args = any(arg.multiple for arg in self._args)
+        self._accepted = tuple(frozenset(type_.value for type_ in arg.types) for arg in self._args)
+
+    @property
+    def args(self) -> list['OpcodeKindRuleArg']:
+        if self._args is None:
+            self._parse()
+        return self._args
+
+    @property
+    def comment(self) -> str:
+        if self._args is None:
+            self._parse()
+        return self._comment
 
     def assert_unfit_args(self, args: list):
-        have_multi_args = any(arg.multiple for arg in self.args)
-        if len(args) < len(self.args):
-            raise ValueError(
-                f"Expected {len(self.args)}{' or more' if have_multi_args else ''} {self.args}, "
-                f"got {len(args)} {tuple(arg.__class__.__name__ + '(' + str(arg) + ')' for arg in args)} args.")
-
-        if len(args) > len(self.args) and not have_multi_args:
-            raise ValueError(f"Expected {len(self.args)}, got {len(args)} args.")
-
-        for i in range(len(args)-1, -1, -1):
-            ex_idx = i - (len(args) - len(self.args))
-            ex_arg = self.args[max(0, ex_idx)]
-            arg = args[i]
-
-            if type(arg) not in [type_.value for type_ in ex_arg.types]:
-                raise ValueError(f"Wrong instruction argument '{arg.__class__.__name__}', "
+        if self._args is None:
+            self._parse()
+
+        count, expected = len(args), len(self._args)
+        if count != expected:
+            if count < expected:
+                raise ValueError(
+                    f"Expected {expected}{' or more' if self._have_multi_args else ''} {self.args}, "
+                    f"got {count} {tuple(arg.__class__.__name__ + '(' + str(arg) + ')' for arg in args)} args.")
+
+            if not self._have_multi_args:
+                raise ValueError(f"Expected {expected}, got {count} args.")
+
+        accepted = self._accepted
+        shift = count - expected
+        for i in range(count - 1, -1, -1):
+            if type(args[i]) not in accepted[max(0, i - shift)]:
+                ex_arg = self.arg_at(i, count)
+                raise ValueError(f"Wrong instruction argument '{args[i].__class__.__name__}', "
                                  f"expected {ex_arg.name}{[arg.name for arg in ex_arg.types]}.")
 
         return True
 
 
+    def arg_at(self, index: int, args_count: int) -> 'OpcodeKindRuleArg':
+        # Extra arguments belong to the leading multiple argument
+        return self.args[max(0, index - (args_count - len(self.args)))]
+
+
 class Instruction:
-    def __init__(self, kind: 'OpcodeKind', args: list[Union['Register', 'Const', 'Label']]):
+    __slots__ = ("kind", "args", "source_pos")
+
+    def __init__(self, kind: 'OpcodeKind', args: list[Union['Register', 'Const', 'Label']], validate: bool = True,
+                 source_pos: int = 0):
+        # Passes that only rearrange already checked operands pass validate=False.
+        # source_pos is the packed line and column of the statement that produced the instruction, 0 if unknown.
         self.kind = kind
         self.args = args
-        if isinstance(self.kind.value, OpcodeKindRule):
-            self.kind.value.assert_unfit_args(args)
+        self.source_pos = source_pos
+        if validate:
+            kind.value.assert_unfit_args(args)
+
+    @property
+    def op_id(self) -> int:
+        return self.kind.value.id
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self.kind.name} {' '.join(map(str, self.args))})"
@@ -48,9 +91,11 @@ class Instruction:
 
 
 class Label(Instruction):
+    __slots__ = ("name",)
+
     def __init__(self, name: str):
         self.name = name
-        super().__init__(OpcodeKind.n_label, [])
+        super().__init__(OpcodeKind.n_label, [], False)
 
     def __repr__(self):
         return f"{self.__class__.__name__}(:{self.name})"
@@ -126,6 +171,10 @@ class OpcodeKind(Enum):
     n_label = OpcodeKindRule("")
     nop = OpcodeKindRule("# No operation")
     clr = OpcodeKindRule("# Clear")
-    mov = OpcodeKindRule("dst...[R/O] val[C/T/CT/R] # Copy signal from source to destination")
+    mov = OpcodeKindRule("dst...[R/O/M] val[C/T/CT/R/M] # Copy signal from source to destination")
     fir = OpcodeKindRule("dst[R/O] type[T/R] # Find _type_ in red_input, then assign to _dst_")
     fig = OpcodeKindRule("dst[R/O] type[T/R] # Find _type_ in green_input, then assign to _dst_")
+
+
+# Opcode kinds by their integer id, for tables indexed by id instead of hashing enum members
+OPCODE_KINDS: tuple[OpcodeKind, ...] = tuple(sorted(OpcodeKind, key=lambda kind: kind.value.id))
@@ -0,0 +1,225 @@
+from collections import Counter
+
+from code_generation.opcodes import Instruction, Label, OpcodeKind
+from code_generation.stacks import Const
+
+JUMP_KINDS = {
+    OpcodeKind.jmp,
+    OpcodeKind.beq, OpcodeKind.bne, OpcodeKind.blt, OpcodeKind.ble, OpcodeKind.bgt, OpcodeKind.bge,
+}
+
+
+def jump_target(opcode: Instruction) -> Label | None:
+    if opcode.kind in JUMP_KINDS and isinstance(opcode.args[-1], Label):
+        return opcode.args[-1]
+    return None
+
+
+class PeepholeContext:
+    def __init__(self, opcodes: list[Instruction]):
+        self.label_refs: Counter[str] = Counter()
+        self.thread_targets: dict[str, Label] = {}
+        # Labels directly followed by other labels, mapped to the last label of their run
+        self.label_aliases: dict[str, Label] = {}
+        labels: dict[str, Label] = {}
+        direct_targets: dict[str, Label] = {}
+
+        pending_labels = []
+        for opcode in opcodes:
+            if isinstance(opcode, Label):
+                for name in pending_labels:
+                    self.label_aliases[name] = opcode
+                labels[opcode.name] = opcode
+                pending_labels.append(opcode.name)
+                continue
+
+            target = jump_target(opcode)
+            if target:
+                self.label_refs[target.name] += 1
+            if opcode.kind == OpcodeKind.jmp and target:
+                for name in pending_labels:
+                    direct_targets[name] = target
+            pending_labels = []
+
+        for name in direct_targets:
+            seen = {name}
+            target = direct_targets[name]
+            while target.name in direct_targets and target.name not in seen:
+                seen.add(target.name)
+                target = direct_targets[target.name]
+
+            if target.name not in seen:
+                self.thread_targets[name] = labels.get(target.name, target)
+
+        # A jump may be retargeted mid-pass, so every label it can end up on counts as referenced,
+        # otherwise the label could be dropped while a rewritten jump still points at it
+        for name, count in list(self.label_refs.items()):
+            seen = {name}
+            while True:
+                target = self.thread_targets.get(name) or self.label_aliases.get(name)
+                if target is None or target.name in seen:
+                    break
+                name = target.name
+                seen.add(name)
+                self.label_refs[name] += count
+
+
+class PeepholeRule:
+    name: str = None
+
+    def apply(self, output: list[Instruction], context: PeepholeContext) -> tuple[int, list[Instruction]] | None:
+        # Returns how many instructions at the tail of output to replace, and their replacement
+        raise NotImplementedError(f"Rule {self.__class__} has no apply().")
+
+
+class JumpToNext(PeepholeRule):
+    name = "jump_to_next"
+
+    def apply(self, output, context):
+        if not isinstance(output[-1], Label):
+            return None
+
+        index = len(output) - 1
+        while index >= 0 and isinstance(output[index], Label):
+            index -= 1
+
+        target = jump_target(output[index]) if index >= 0 else None
+        if target and any(label.name == target.name for label in output[index + 1:]):
+            return len(output) - index, output[index + 1:]
+
+        return None
+
+
+class ThreadJumps(PeepholeRule):
+    name = "thread_jumps"
+
+    def apply(self, output, context):
+        target = jump_target(output[-1])
+        if not target or target.name not in context.thread_targets:
+            return None
+
+        opcode = output[-1]
+        return 1, [Instruction(
+            opcode.kind, opcode.args[:-1] + [context.thread_targets[target.name]], False, opcode.source_pos
+        )]
+
+
+class MergeLabels(PeepholeRule):
+    name = "merge_labels"
+
+    def apply(self, output, context):
+        target = jump_target(output[-1])
+        if not target or target.name not in context.label_aliases:
+            return None
+
+        opcode = output[-1]
+        return 1, [Instruction(
+            opcode.kind, opcode.args[:-1] + [context.label_aliases[target.name]], False, opcode.source_pos
+        )]
+
+
+class UnreferencedLabels(PeepholeRule):
+    name = "unreferenced_labels"
+
+    def apply(self, output, context):
+        if isinstance(output[-1], Label) and not context.label_refs[output[-1].name]:
+            return 1, []
+
+        return None
+
+
+class SelfMoves(PeepholeRule):
+    name = "self_moves"
+
+    def apply(self, output, context):
+        opcode = output[-1]
+        if opcode.kind != OpcodeKind.mov:
+            return None
+
+        value = opcode.args[-1]
+        destinations = [arg for arg in opcode.args[:-1] if arg is not value]
+        if len(destinations) == len(opcode.args) - 1:
+            return None
+
+        return 1, [Instruction(OpcodeKind.mov, destinations + [value], False, opcode.source_pos)] if destinations else []
+
+
+class IncrementFolding(PeepholeRule):
+    name = "increment_folding"
+
+    def apply(self, output, context):
+        opcode = output[-1]
+        if opcode.kind not in [OpcodeKind.add, OpcodeKind.sub]:
+            return None
+
+        dst, src, val = opcode.args
+        if opcode.kind == OpcodeKind.add and isinstance(src, Const) and val is dst:
+            src, val = val, src
+
+        if src is not dst or not isinstance(val, Const) or val.value not in [1, -1]:
+            return None
+
+        increments = (val.value == 1) == (opcode.kind == OpcodeKind.add)
+        return 1, [Instruction(OpcodeKind.inc if increments else OpcodeKind.dec, [dst], False, opcode.source_pos)]
+
+
+PEEPHOLE_RULES: dict[str, type[PeepholeRule]] = {
+    rule.name: rule for rule in [
+        ThreadJumps, MergeLabels, JumpToNext, UnreferencedLabels, SelfMoves, IncrementFolding
+    ]
+}
+
+
+class PeepholeReport:
+    def __init__(self):
+        self.removed: Counter[str] = Counter()
+        self.applied: Counter[str] = Counter()
+        self.passes = 0
+
+    def __repr__(self):
+        rules = ", ".join(f"{name}: -{self.removed[name]} ({self.applied[name]}x)" for name in self.applied)
+        return f"PeepholeReport({rules or 'no rewrites'}, passes={self.passes})"
+
+
+class PeepholeOptimizer:
+    def __init__(self, rules: list[str] = None, max_passes: int = 16):
+        unknown = set(rules or []) - PEEPHOLE_RULES.keys()
+        if unknown:
+            raise ValueError(f"Unknown peephole rules {sorted(unknown)}, expected some of {list(PEEPHOLE_RULES)}.")
+
+        self.rules = [PEEPHOLE_RULES[name]() for name in (PEEPHOLE_RULES if rules is None else rules)]
+        self.max_passes = max_passes
+
+    def optimize(self, opcodes: list[Instruction]) -> tuple[list[Instruction], PeepholeReport]:
+        report = PeepholeReport()
+        while report.passes < self.max_passes:
+            report.passes += 1
+            opcodes, changed = self._pass(opcodes, report)
+            if not changed:
+                break
+
+        return opcodes, report
+
+    def _pass(self, opcodes: list[Instruction], report: PeepholeReport) -> tuple[list[Instruction], bool]:
+        context = PeepholeContext(opcodes)
+        output = []
+        changed = False
+
+        for opcode in opcodes:
+            output.append(opcode)
+            rewritten = True
+            while rewritten and output:
+                rewritten = False
+                for rule in self.rules:
+                    rewrite = rule.apply(output, context)
+                    if rewrite is None:
+                        continue
+
+                    count, replacement = rewrite
+                    output[len(output) - count:] = replacement
+                    report.applied[rule.name] += 1
+                    report.removed[rule.name] += count - len(replacement)
+                    changed = rewritten = True
+                    break
+
+        return output, changed
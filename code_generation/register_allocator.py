@@ -0,0 +1,301 @@
+from code_generation.liveness import BRANCH_KINDS, TEST_KINDS, ControlFlowGraph, Liveness
+from code_generation.opcodes import Instruction, Label, OpcodeKind, OpcodeArgType
+from code_generation.stacks import Register, RegisterStack, MemoryStack, MemoryCell, Const
+
+REGISTER_COUNT = 8
+SCRATCH_REGISTERS = 2
+
+
+class LiveInterval:
+    def __init__(self, register: Register, start: int):
+        self.register = register
+        self.start = start
+        self.end = start
+        self.weight = 0
+        self.assigned: Register | None = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.register}: {self.start}..{self.end} -> {self.assigned})"
+
+
+class AllocationReport:
+    def __init__(self):
+        self.virtual = 0
+        self.physical = 0
+        self.rematerialized = 0
+        self.spilled = 0
+        self.loads = 0
+        self.stores = 0
+
+    def __repr__(self):
+        return (
+            f"AllocationReport({self.virtual} values in {self.physical} registers, "
+            f"rematerialized={self.rematerialized}, spilled={self.spilled}, "
+            f"loads={self.loads}, stores={self.stores})"
+        )
+
+
+class SpillCache:
+    # Spilled values held by the scratch registers within one block. A held value is read from its register
+    # instead of being loaded again, and a value written to a register reaches its memory cell only once the
+    # register is taken for another value or the block ends, and only if it is still live then.
+    def __init__(self, scratch: list[Register], cells: dict[Register, MemoryCell], output: list[Instruction],
+                 report: AllocationReport):
+        self.scratch = scratch
+        self.cells = cells
+        self.output = output
+        self.report = report
+        self.held: dict[Register, Register] = {}
+        # Registers whose value differs from the one in its memory cell
+        self.dirty: set[Register] = set()
+
+    def find(self, value: Register) -> Register | None:
+        for register, held in self.held.items():
+            if held is value:
+                return register
+
+        return None
+
+    def load(self, value: Register, pinned: set[Register], live: set[Register], source_pos: int) -> Register:
+        register = self.find(value)
+        if register is None:
+            register = self._take([register for register in self.scratch if register not in pinned], live, source_pos)
+            self.output.append(Instruction(OpcodeKind.mov, [register, self.cells[value]], False, source_pos))
+            self.report.loads += 1
+            self.held[register] = value
+
+        return register
+
+    def define(self, value: Register, live: set[Register], source_pos: int) -> Register:
+        register = self.find(value)
+        if register is None:
+            register = self._take(self.scratch, live, source_pos)
+            self.held[register] = value
+        self.dirty.add(register)
+        return register
+
+    def forget(self, value: Register):
+        # The memory cell was written directly, the register's copy is stale
+        register = self.find(value)
+        if register is not None:
+            del self.held[register]
+            self.dirty.discard(register)
+
+    def flush(self, live: set[Register], source_pos: int):
+        for register in list(self.held):
+            self._evict(register, live, source_pos)
+
+    def _take(self, candidates: list[Register], live: set[Register], source_pos: int) -> Register:
+        # A free register or one holding a dead value first, then one whose value is still in memory
+        def cost(register: Register) -> int:
+            value = self.held.get(register)
+            if value is None or value not in live:
+                return 0
+            return 2 if register in self.dirty else 1
+
+        register = min(candidates, key=cost)
+        self._evict(register, live, source_pos)
+        return register
+
+    def _evict(self, register: Register, live: set[Register], source_pos: int):
+        value = self.held.pop(register, None)
+        if register in self.dirty:
+            self.dirty.discard(register)
+            if value in live:
+                self.output.append(Instruction(OpcodeKind.mov, [self.cells[value], register], False, source_pos))
+                self.report.stores += 1
+
+
+class RegisterAllocator:
+    # Linear scan over live intervals of virtual registers, intervals are flattened over the
+    # opcode order and stretched over every block where the value is live.
+    def __init__(self, register_count: int = REGISTER_COUNT, rematerialize: bool = True):
+        self.register_count = register_count
+        self.rematerialize = rematerialize
+
+    def allocate(self, opcodes: list[Instruction]) -> tuple[list[Instruction], AllocationReport]:
+        report = AllocationReport()
+        cfg = ControlFlowGraph(opcodes)
+        liveness = Liveness(cfg)
+
+        constants = self._rematerializable(opcodes, cfg, liveness) if self.rematerialize else {}
+        intervals = [
+            interval for interval in self._intervals(cfg, liveness) if interval.register not in constants
+        ]
+        report.virtual = len(intervals) + len(constants)
+        report.rematerialized = len(constants)
+
+        registers = RegisterStack(self.register_count).available
+        spilled = self._scan(intervals, registers, liveness)
+        scratch = []
+        if spilled:
+            scratch = registers[-SCRATCH_REGISTERS:]
+            spilled = self._scan(intervals, registers[:-SCRATCH_REGISTERS], liveness)
+
+        memory = MemoryStack()
+        cells = {interval.register: memory.pop() for interval in spilled}
+        assigned = {interval.register: interval.assigned for interval in intervals if interval.assigned}
+        report.spilled = len(cells)
+
+        opcodes = self._rewrite(opcodes, liveness, assigned, constants, cells, scratch, report)
+        report.physical = len({arg for opcode in opcodes for arg in opcode.args if isinstance(arg, Register)})
+        return opcodes, report
+
+    @staticmethod
+    def _intervals(cfg: ControlFlowGraph, liveness: Liveness) -> list[LiveInterval]:
+        intervals: dict[Register, LiveInterval] = {}
+        depths = cfg.loop_depths()
+
+        def extend(register: Register, position: int, weight: int = 0):
+            interval = intervals.get(register)
+            if interval is None:
+                interval = intervals[register] = LiveInterval(register, position)
+            interval.start = min(interval.start, position)
+            interval.end = max(interval.end, position)
+            interval.weight += weight
+
+        for block in cfg.blocks:
+            for register in liveness.live_in[block.index]:
+                extend(register, block.start)
+            for position in range(block.start, block.end):
+                weight = 10 ** min(depths[position], 6)
+                for register in liveness.defs[position] + liveness.uses[position]:
+                    extend(register, position, weight)
+            for register in liveness.live_out[block.index]:
+                extend(register, block.end - 1)
+
+        return sorted(intervals.values(), key=lambda interval: (interval.start, interval.register.idx))
+
+    @staticmethod
+    def _rematerializable(opcodes: list[Instruction], cfg: ControlFlowGraph,
+                          liveness: Liveness) -> dict[Register, Const]:
+        # A value written once by a constant move and read only where constants are accepted
+        # is replaced by the constant itself, unless some read can happen before that move
+        definitions: dict[Register, list[int]] = {}
+        for position, defs in enumerate(liveness.defs):
+            for register in defs:
+                definitions.setdefault(register, []).append(position)
+
+        entry_live = liveness.live_in[0] if cfg.blocks else set()
+        candidates = {}
+        for register, positions in definitions.items():
+            opcode = opcodes[positions[0]]
+            if len(positions) == 1 and opcode.kind == OpcodeKind.mov and isinstance(opcode.args[-1], Const) \
+                    and register not in entry_live:
+                candidates[register] = opcode.args[-1]
+
+        for position, uses in enumerate(liveness.uses):
+            opcode = opcodes[position]
+            for index, arg in enumerate(opcode.args):
+                if arg in candidates and arg in uses and \
+                        OpcodeArgType.C not in opcode.kind.value.arg_at(index, len(opcode.args)).types:
+                    del candidates[arg]
+
+        return candidates
+
+    @staticmethod
+    def _scan(intervals: list[LiveInterval], registers: list[Register],
+              liveness: Liveness) -> list[LiveInterval]:
+        free = list(registers)
+        active: list[LiveInterval] = []
+        spilled: list[LiveInterval] = []
+        by_register = {interval.register: interval for interval in intervals}
+
+        for interval in intervals:
+            interval.assigned = None
+            for other in list(active):
+                # A value read for the last time can hand its register to the value written by the same opcode
+                if other.end < interval.start or (
+                    other.end == interval.start
+                    and other.register not in liveness.defs[other.end]
+                    and interval.register in liveness.defs[interval.start]
+                    and interval.register not in liveness.uses[interval.start]
+                ):
+                    active.remove(other)
+                    free.append(other.assigned)
+
+            if free:
+                interval.assigned = RegisterAllocator._pick(interval, free, by_register, liveness)
+                free.remove(interval.assigned)
+                active.append(interval)
+                continue
+
+            victim = min(active + [interval], key=lambda candidate: (candidate.weight, -candidate.end))
+            if victim is not interval:
+                interval.assigned = victim.assigned
+                victim.assigned = None
+                active.remove(victim)
+                active.append(interval)
+            spilled.append(victim)
+
+        return spilled
+
+    @staticmethod
+    def _pick(interval: LiveInterval, free: list[Register], by_register: dict[Register, LiveInterval],
+              liveness: Liveness) -> Register:
+        # Prefer the register of a value copied into this one, turning the copy into a self move
+        opcode = liveness.cfg.opcodes[interval.start]
+        if opcode.kind == OpcodeKind.mov and opcode.args[-1] in by_register:
+            hint = by_register[opcode.args[-1]].assigned
+            if hint in free:
+                return hint
+
+        return min(free, key=lambda register: register.idx)
+
+    @staticmethod
+    def _rewrite(opcodes: list[Instruction], liveness: Liveness, assigned: dict[Register, Register],
+                 constants: dict[Register, Const], cells: dict[Register, MemoryCell], scratch: list[Register],
+                 report: AllocationReport) -> list[Instruction]:
+        output = []
+        for block in liveness.cfg.blocks:
+            cache = SpillCache(scratch, cells, output, report)
+            live_after = liveness.live_after(block)
+            for position in range(block.start, block.end):
+                opcode = opcodes[position]
+                live = live_after[position - block.start]
+                if isinstance(opcode, Label) or not opcode.args:
+                    output.append(opcode)
+                    continue
+
+                if opcode.kind == OpcodeKind.mov:
+                    value = opcode.args[-1]
+                    value = constants.get(value) or cache.find(value) or cells.get(value) or assigned.get(value, value)
+                    destinations = []
+                    for arg in opcode.args[:-1]:
+                        if arg in cells:
+                            cache.forget(arg)
+                        if arg not in constants:
+                            destinations.append(cells.get(arg) or assigned.get(arg, arg))
+                    if destinations:
+                        output.append(Instruction(OpcodeKind.mov, destinations + [value], False, opcode.source_pos))
+                    continue
+
+                # Reads happen before the write, so the destination may take a register that was just read
+                live_before = live.difference(liveness.defs[position]).union(liveness.uses[position])
+                reads, pinned = {}, set()
+                for arg in liveness.uses[position]:
+                    if arg in cells:
+                        reads[arg] = cache.load(arg, pinned, live_before, opcode.source_pos)
+                        pinned.add(reads[arg])
+
+                rule = opcode.kind.value
+                args = []
+                for index, arg in enumerate(opcode.args):
+                    if not isinstance(arg, Register):
+                        args.append(arg)
+                    elif arg in constants:
+                        args.append(constants[arg])
+                    elif arg not in cells:
+                        args.append(assigned.get(arg, arg))
+                    elif rule.arg_at(index, len(opcode.args)).name == "dst":
+                        args.append(cache.define(arg, live, opcode.source_pos))
+                    else:
+                        args.append(reads[arg])
+
+                if opcode.kind == OpcodeKind.jmp or opcode.kind in BRANCH_KINDS or opcode.kind in TEST_KINDS:
+                    cache.flush(live, opcode.source_pos)
+                output.append(Instruction(opcode.kind, args, False, opcode.source_pos))
+
+            cache.flush(live_after[-1], opcodes[block.end - 1].source_pos)
+
+        return output
@@ -0,0 +1,285 @@
+import operator
+
+from code_generation.costs import CostTable, FCPU_COSTS
+from code_generation.opcodes import Instruction, Label, OpcodeKind
+from code_generation.stacks import Register, Const, TypeSignal, OutputCell, MemoryCell
+
+INT32_MIN = -2 ** 31
+INT32_MAX = 2 ** 31 - 1
+
+(
+    NOP, CLR, MOV, MOV_TYPE, ADD, SUB, MUL, DIV, MOD, POW, INC, DEC, JMP, JMP_REG, BRANCH, TEST, FIND
+) = range(17)
+
+COMPARISONS = {
+    OpcodeKind.beq: operator.eq, OpcodeKind.teq: operator.eq,
+    OpcodeKind.bne: operator.ne, OpcodeKind.tne: operator.ne,
+    OpcodeKind.blt: operator.lt, OpcodeKind.tlt: operator.lt,
+    OpcodeKind.ble: operator.le, OpcodeKind.tle: operator.le,
+    OpcodeKind.bgt: operator.gt, OpcodeKind.tgt: operator.gt,
+    OpcodeKind.bge: operator.ge, OpcodeKind.tge: operator.ge,
+}
+
+ARITHMETIC = {
+    OpcodeKind.add: ADD,
+    OpcodeKind.sub: SUB,
+    OpcodeKind.mul: MUL,
+    OpcodeKind.div: DIV,
+    OpcodeKind.mod: MOD,
+    OpcodeKind.pow: POW,
+}
+
+
+def wrap_int32(value: int) -> int:
+    return ((value - INT32_MIN) & 0xFFFFFFFF) + INT32_MIN
+
+
+def fcpu_div(a: int, b: int) -> int:
+    # Combinators divide with truncation toward zero and output 0 on division by zero
+    if b == 0:
+        return 0
+    quotient = abs(a) // abs(b)
+    return wrap_int32(quotient if (a < 0) == (b < 0) else -quotient)
+
+
+def fcpu_mod(a: int, b: int) -> int:
+    if b == 0:
+        return 0
+    remainder = abs(a) % abs(b)
+    return remainder if a >= 0 else -remainder
+
+
+def fcpu_pow(a: int, b: int) -> int:
+    if b < 0:
+        return 0
+    return wrap_int32(pow(a, b, 2 ** 32))
+
+
+ARITHMETIC_FUNCTIONS = {
+    OpcodeKind.add: lambda a, b: wrap_int32(a + b),
+    OpcodeKind.sub: lambda a, b: wrap_int32(a - b),
+    OpcodeKind.mul: lambda a, b: wrap_int32(a * b),
+    OpcodeKind.div: fcpu_div,
+    OpcodeKind.mod: fcpu_mod,
+    OpcodeKind.pow: fcpu_pow,
+}
+
+
+class SimulationResult:
+    def __init__(self, simulator: 'FcpuSimulator', ticks: int, executions: list[int], halted: bool,
+                 registers: list[tuple[str | None, int]], outputs: dict[int, tuple[str | None, int]]):
+        self.simulator = simulator
+        self.ticks = ticks
+        self.executions = executions
+        self.halted = halted
+        self.registers = registers
+        self.outputs = outputs
+
+    @property
+    def instruction_ticks(self) -> list[int]:
+        return [count * cost for count, cost in zip(self.executions, self.simulator.costs)]
+
+    @property
+    def block_ticks(self) -> dict[str, int]:
+        blocks = {}
+        for (name, start, end) in self.simulator.blocks:
+            blocks[name] = sum(self.instruction_ticks[start:end])
+
+        return blocks
+
+    def output_values(self) -> dict[int, int]:
+        return {index: value for index, (_, value) in sorted(self.outputs.items())}
+
+
+class FcpuSimulator:
+    # Labels and comments are not program lines: constant/register jump offsets are relative to the
+    # jumping instruction and count executable instructions only, integer addresses are absolute 1-based lines.
+    def __init__(self, opcodes: list[Instruction], cost_table: CostTable = FCPU_COSTS, register_count: int = 8):
+        self.opcodes = opcodes
+        self.register_count = register_count
+        self.instructions: list[Instruction] = []
+        self.label_positions: dict[str, int] = {}
+        self.blocks: list[tuple[str, int, int]] = []
+
+        block_name, block_start = "<entry>", 0
+        for opcode in opcodes:
+            if isinstance(opcode, Label):
+                if len(self.instructions) > block_start or block_name != "<entry>":
+                    self.blocks.append((block_name, block_start, len(self.instructions)))
+                block_name, block_start = opcode.name, len(self.instructions)
+                self.label_positions[opcode.name] = len(self.instructions)
+            elif opcode.kind != OpcodeKind.n_comment:
+                self.instructions.append(opcode)
+        self.blocks.append((block_name, block_start, len(self.instructions)))
+
+        self.costs = [cost_table.cost(instruction.kind) for instruction in self.instructions]
+        # Registers come first in the value table, then memory cells and constants
+        self._slots: dict[object, int] = {}
+        self._initial_values: list[int] = [0] * register_count
+        self.program = [self._decode(pc, instruction) for pc, instruction in enumerate(self.instructions)]
+
+    def _slot(self, arg) -> int:
+        if isinstance(arg, Register):
+            if arg.idx >= self.register_count:
+                raise ValueError(f"Register {arg} does not exist on a {self.register_count}-register fCPU.")
+            return arg.idx
+
+        key = ("mem", arg.idx) if isinstance(arg, MemoryCell) else ("const", arg.value)
+        if key not in self._slots:
+            self._slots[key] = len(self._initial_values)
+            self._initial_values.append(0 if isinstance(arg, MemoryCell) else arg.value)
+
+        return self._slots[key]
+
+    def _target(self, pc: int, arg) -> int:
+        if isinstance(arg, Label):
+            return self.label_positions[arg.name]
+        if isinstance(arg, Const):
+            return pc + arg.value
+        if isinstance(arg, int):
+            return arg - 1
+
+        raise ValueError(f"Unsupported jump address {arg!r}.")
+
+    def _decode(self, pc: int, instruction: Instruction) -> tuple:
+        kind, args = instruction.kind, instruction.args
+        if kind in ARITHMETIC:
+            return ARITHMETIC[kind], self._slot(args[0]), self._slot(args[1]), self._slot(args[2])
+
+        if kind in COMPARISONS:
+            target = self._target(pc, args[2]) if len(args) > 2 else None
+            return BRANCH if target is not None else TEST, COMPARISONS[kind], \
+                self._slot(args[0]), self._slot(args[1]), target
+
+        if kind == OpcodeKind.mov:
+            value = args[-1]
+            destinations = tuple(
+                (True, arg.idx) if isinstance(arg, OutputCell) else (False, self._slot(arg))
+                for arg in args[:-1]
+            )
+            if isinstance(value, TypeSignal):
+                return MOV_TYPE, destinations, str(value)
+            return MOV, destinations, self._slot(value)
+
+        if kind in [OpcodeKind.fir, OpcodeKind.fig]:
+            destination = args[0]
+            destination = (True, destination.idx) if isinstance(destination, OutputCell) \
+                else (False, self._slot(destination))
+            signal = args[1]
+            signal = (False, self._slot(signal)) if isinstance(signal, Register) else (True, str(signal))
+            return FIND, kind == OpcodeKind.fig, destination, signal
+
+        if kind == OpcodeKind.jmp:
+            if isinstance(args[0], Register):
+                return JMP_REG, self._slot(args[0])
+            return JMP, self._target(pc, args[0])
+
+        if kind == OpcodeKind.inc:
+            return INC, self._slot(args[0])
+        if kind == OpcodeKind.dec:
+            return DEC, self._slot(args[0])
+        if kind == OpcodeKind.clr:
+            return CLR,
+        if kind == OpcodeKind.nop:
+            return NOP,
+
+        raise NotImplementedError(f"Simulating '{kind.name}' is not supported.")
+
+    def run(self, red: dict[str, int] = None, green: dict[str, int] = None,
+            max_ticks: int = 1_000_000, loop: bool = False) -> SimulationResult:
+        return self._run(red or {}, green or {}, max_ticks, loop)
+
+    def _run(self, red, green, max_ticks, loop, _add=ADD, _sub=SUB, _mul=MUL, _div=DIV, _mod=MOD, _pow=POW,
+             _branch=BRANCH, _jmp=JMP, _mov=MOV, _inc=INC, _dec=DEC, _find=FIND, _test=TEST, _mov_type=MOV_TYPE,
+             _jmp_reg=JMP_REG, _clr=CLR, _int32_min=INT32_MIN, _int32_max=INT32_MAX) -> SimulationResult:
+        program = self.program
+        costs = self.costs
+        size = len(program)
+        values = list(self._initial_values)
+        types: list[str | None] = [None] * len(values)
+        outputs: dict[int, tuple[str | None, int]] = {}
+        executions = [0] * size
+        register_count = self.register_count
+        ticks = 0
+        pc = 0
+        halted = False
+
+        while ticks < max_ticks:
+            if pc >= size or pc < 0:
+                if not loop or not size:
+                    halted = True
+                    break
+                pc = 0
+
+            instr = program[pc]
+            executions[pc] += 1
+            ticks += costs[pc]
+            op = instr[0]
+            pc += 1
+
+            if _add <= op <= _mod:
+                a, b = values[instr[2]], values[instr[3]]
+                if op == _add:
+                    value = a + b
+                elif op == _sub:
+                    value = a - b
+                elif op == _mul:
+                    value = a * b
+                elif op == _div:
+                    value = fcpu_div(a, b)
+                else:
+                    value = fcpu_mod(a, b)
+                if value < _int32_min or value > _int32_max:
+                    value = wrap_int32(value)
+                values[instr[1]] = value
+                types[instr[1]] = types[instr[2]] or types[instr[3]]
+            elif op == _branch:
+                if instr[1](values[instr[2]], values[instr[3]]):
+                    pc = instr[4]
+            elif op == _jmp:
+                pc = instr[1]
+            elif op == _mov:
+                source = instr[2]
+                for is_output, destination in instr[1]:
+                    if is_output:
+                        outputs[destination] = (types[source], values[source])
+                    else:
+                        values[destination] = values[source]
+                        types[destination] = types[source]
+            elif op == _inc:
+                value = values[instr[1]] + 1
+                values[instr[1]] = value if value <= _int32_max else _int32_min
+            elif op == _dec:
+                value = values[instr[1]] - 1
+                values[instr[1]] = value if value >= _int32_min else _int32_max
+            elif op == _find:
+                _, is_green, (is_output, destination), (is_name, signal) = instr
+                name = signal if is_name else types[signal]
+                value = (green if is_green else red).get(name, 0)
+                if is_output:
+                    outputs[destination] = (name, value)
+                else:
+                    values[destination] = value
+                    types[destination] = name
+            elif op == _test:
+                if not instr[1](values[instr[2]], values[instr[3]]):
+                    pc += 1
+            elif op == _pow:
+                values[instr[1]] = fcpu_pow(values[instr[2]], values[instr[3]])
+                types[instr[1]] = types[instr[2]] or types[instr[3]]
+            elif op == _mov_type:
+                for is_output, destination in instr[1]:
+                    if is_output:
+                        outputs[destination] = (instr[2], outputs.get(destination, (None, 0))[1])
+                    else:
+                        types[destination] = instr[2]
+            elif op == _jmp_reg:
+                pc = pc - 1 + values[instr[1]]
+            elif op == _clr:
+                for i in range(register_count):
+                    values[i] = 0
+                    types[i] = None
+                outputs.clear()
+
+        registers = [(types[i], values[i]) for i in range(register_count)]
+        return SimulationResult(self, ticks, executions, halted, registers, dict(outputs))
@@ -0,0 +1,53 @@
+import json
+
+from code_generation.opcodes import Instruction, Label
+
+SOURCE_MAP_SUFFIX = ".map"
+
+
+def pack_source_pos(token) -> int:
+    # Line and column of an rply token in one int, 0 when the token was not produced by the lexer
+    source_pos = getattr(token, "source_pos", None)
+    return source_pos.lineno << 32 | source_pos.colno if source_pos else 0
+
+
+def unpack_source_pos(packed: int) -> tuple[int, int]:
+    return packed >> 32, packed & 0xFFFFFFFF
+
+
+class SourceMap:
+    # One entry per listing line, the listing being one opcode per line as written by to_string()
+    def __init__(self, source: str, positions: list[tuple[int, int] | None]):
+        self.source = source
+        self.positions = positions
+
+    @staticmethod
+    def from_opcodes(source: str, opcodes: list[Instruction]) -> 'SourceMap':
+        return SourceMap(source, [
+            None if isinstance(opcode, Label) or not opcode.source_pos else unpack_source_pos(opcode.source_pos)
+            for opcode in opcodes
+        ])
+
+    def line_of(self, listing_line: int) -> int | None:
+        position = self.positions[listing_line - 1]
+        return position[0] if position else None
+
+    def to_json(self) -> dict:
+        return {
+            "version": 1,
+            "source": self.source,
+            "mappings": [list(position) if position else None for position in self.positions],
+        }
+
+    @staticmethod
+    def from_json(data: dict) -> 'SourceMap':
+        return SourceMap(data["source"], [tuple(position) if position else None for position in data["mappings"]])
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f)
+
+    @staticmethod
+    def read(path: str) -> 'SourceMap':
+        with open(path) as f:
+            return SourceMap.from_json(json.load(f))
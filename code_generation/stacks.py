@@ -1,34 +1,78 @@
 from enum import Enum
 from string import ascii_uppercase, digits
+from typing import Optional
+from weakref import WeakValueDictionary
 
 
 class BaseStack:
-    def __init__(self, items):
-        self._items = items
-        self._available = list(self._items)
+    # Free items are the set bits of one integer, bit i standing for the i-th item, so pop, dispose and
+    # membership checks touch a single bit instead of scanning a list. The lowest free item is popped first.
+    def __init__(self, items, item_type: type = object):
+        self._items = tuple(items)
+        self._item_type = item_type
+        for i, item in enumerate(self._items):
+            item._pool_index = i
+        self._all = (1 << len(self._items)) - 1
+        self._free = self._all
 
     @property
     def available(self):
-        return list(self._available)
+        return [self._items[i] for i in _bits(self._free)]
 
     @property
     def reserved(self):
-        return list(filter(lambda a: a.reserved, self._items))
+        return [self._items[i] for i in _bits(self._all & ~self._free)]
+
+    @property
+    def available_count(self) -> int:
+        return self._free.bit_count()
+
+    def is_available(self, item) -> bool:
+        return self.owns(item) and bool(self._free >> item._pool_index & 1)
+
+    def owns(self, item) -> bool:
+        index = getattr(item, "_pool_index", None)
+        return index is not None and index < len(self._items) and self._items[index] is item
 
     def pop(self, index: int = 0):
-        return self._available.pop(index)
+        free = self._free
+        for _ in range(index):
+            free &= free - 1
+        if not free:
+            raise IndexError("pop from empty stack")
+
+        return self.take(self._items[(free & -free).bit_length() - 1])
+
+    def take(self, item):
+        if not self.is_available(item):
+            raise ValueError(f"Item {item} is already reserved.")
+
+        self._free &= ~(1 << item._pool_index)
+        return item
 
     def dispose(self, item):
-        if not isinstance(item, TypeSignal):
+        if not isinstance(item, self._item_type):
             raise TypeError(f"Arg1 must be item class, got {type(item)}")
 
-        if item not in self._items:
+        if not self.owns(item):
             raise ValueError("Can't dispose item to not it's own stack.")
 
-        self._available.append(item)
+        self._free |= 1 << item._pool_index
+
+    def dispose_all(self):
+        self._free = self._all
+
+
+def _bits(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
 
 
 class BaseStackItem:
+    __slots__ = ("_idx", "_stack", "_pool_index")
+
     def __init__(self, index: int, stack: BaseStack):
         self._idx = index
         self._stack = stack
@@ -39,13 +83,13 @@ class BaseStackItem:
 
     @property
     def reserved(self):
-        return self not in self._stack.available
+        return not self._stack.is_available(self)
 
     def dispose(self):
         self._stack.dispose(self)
 
 
-class SignalStack:
+class SignalStack(BaseStack):
     def __init__(self, signals: dict['TypeSignalKind', list[str]]):
         self._signals = []
         i = 0
@@ -54,27 +98,19 @@ class SignalStack:
                 self._signals.append(TypeSignal(i, self, kind, sig_name))
                 i += 1
 
-        self._available = list(self._signals)
-
-    @property
-    def available(self):
-        return list(self._available)
-
-    @property
-    def reserved(self):
-        return list(filter(lambda a: a.reserved, self._signals))
+        super().__init__(self._signals, TypeSignal)
+        self._by_name = {str(sig): sig for sig in self._signals}
 
     def pop(self, index: int = 0) -> 'TypeSignal':
-        return self._available.pop(index)
-
-    def dispose(self, sig: 'TypeSignal'):
-        if not isinstance(sig, TypeSignal):
-            raise TypeError(f"Arg1 must be item class, got {type(sig)}")
+        return super().pop(index)
 
-        if sig not in self._signals:
-            raise ValueError("Can't dispose item to not it's own stack.")
+    def pop_named(self, name: str) -> Optional['TypeSignal']:
+        # Takes the signal written as `[kind=name]` if it is still free
+        sig = self._by_name.get(name)
+        return self.take(sig) if sig is not None and self.is_available(sig) else None
 
-        self._available.append(sig)
+    def get(self, name: str) -> Optional['TypeSignal']:
+        return self._by_name.get(name)
 
 
 class TypeSignalKind(Enum):
@@ -83,6 +119,8 @@ class TypeSignalKind(Enum):
 
 
 class TypeSignal:
+    __slots__ = ("_idx", "_stack", "_pool_index", "sig_type", "sig_name")
+
     def __init__(self, index: int, stack: SignalStack, sig_type: TypeSignalKind, sig_name: str):
         self._idx = index
         self._stack = stack
@@ -98,7 +136,7 @@ class TypeSignal:
 
     @property
     def reserved(self):
-        return self not in self._stack.available
+        return not self._stack.is_available(self)
 
     def dispose(self):
         self._stack.dispose(self)
@@ -110,39 +148,20 @@ class Signal:
 
 
 class MemoryChannel(BaseStackItem):
+    __slots__ = ()
+
     def __init__(self, index: int, stack: BaseStack):
         super().__init__(index, stack)
-        self._idx = index
-        self._stack = stack
-
-    @property
-    def idx(self):
-        return self._idx
-
-    @property
-    def reserved(self):
-        return self not in self._stack.available
-
-    def dispose(self):
-        self._stack.dispose(self)
 
 
 class MemoryCell(BaseStackItem):
+    __slots__ = ()
+
     def __init__(self, index: int, stack: BaseStack):
         super().__init__(index, stack)
-        self._idx = index
-        self._stack = stack
-
-    @property
-    def idx(self):
-        return self._idx
 
-    @property
-    def reserved(self):
-        return self not in self._stack.available
-
-    def dispose(self):
-        self._stack.dispose(self)
+    def __repr__(self):
+        return f"mem{self._idx}"
 
 
 class InputSelector:
@@ -151,8 +170,23 @@ class InputSelector:
 
 
 class Const:
-    def __init__(self, value):
-        self.value = value
+    # Constants are immutable and interned, every use of the same value shares one object. The table only
+    # holds constants still in use, a long-running compile server would otherwise keep every value it saw.
+    __slots__ = ("value", "__weakref__")
+    _interned: WeakValueDictionary = WeakValueDictionary()
+
+    def __new__(cls, value):
+        key = (type(value), value)
+        const = cls._interned.get(key)
+        if const is None:
+            const = super().__new__(cls)
+            const.value = value
+            cls._interned[key] = const
+
+        return const
+
+    def __reduce__(self):
+        return Const, (self.value,)
 
     def __repr__(self):
         return str(self.value)
@@ -161,28 +195,24 @@ class Const:
 class OutputStack(BaseStack):
     def __init__(self):
         items = tuple(OutputCell(i + 1, self) for i in range(256))
-        super().__init__(items)
-
-    def dispose_all(self):
-        for item in self.reserved:
-            item: OutputCell = item
-            if item.reserved:
-                self.dispose(item)
+        super().__init__(items, OutputCell)
 
     def pop(self, index: int = 0) -> 'OutputCell':
         return super().pop(index)
 
-    def dispose(self, item: 'OutputCell'):
-        if not isinstance(item, OutputCell):
-            raise TypeError(f"Arg1 must be item class, got {type(item)}")
 
-        if item not in self._items:
-            raise ValueError("Can't dispose item to not it's own stack.")
+class MemoryStack(BaseStack):
+    def __init__(self, size=256):
+        items = tuple(MemoryCell(i + 1, self) for i in range(size))
+        super().__init__(items, MemoryCell)
 
-        self._available.append(item)
+    def pop(self, index: int = 0) -> 'MemoryCell':
+        return super().pop(index)
 
 
 class OutputCell(BaseStackItem):
+    __slots__ = ()
+
     def __init__(self, index: int, stack: BaseStack):
         super().__init__(index, stack)
 
@@ -190,47 +220,44 @@ class OutputCell(BaseStackItem):
         return f"out{self._idx}"
 
 
-class RegisterStack:
+class RegisterStack(BaseStack):
     def __init__(self, size=8):
         self._registers = tuple(Register(i, self) for i in range(size))
-        self._available = list(self._registers)
-
-    @property
-    def available(self):
-        return list(self._available)
-
-    @property
-    def reserved(self):
-        return list(filter(lambda a: a.reserved, self._registers))
+        super().__init__(self._registers, Register)
 
     def pop(self, index: int = 0) -> 'Register':
-        return self._available.pop(index)
-
-    def dispose(self, register: 'Register'):
-        if not isinstance(register, Register):
-            raise TypeError(f"Arg1 must be item class, got {type(register)}")
-
-        if register not in self._registers:
-            raise ValueError("Can't dispose item to not it's own stack.")
+        return super().pop(index)
 
-        self._available.insert(0, register)
 
+class Register(BaseStackItem):
+    __slots__ = ()
 
-class Register:
     def __init__(self, index: int, stack: RegisterStack):
-        self._idx = index
-        self._stack = stack
+        super().__init__(index, stack)
 
     def __repr__(self):
         return f"r{self._idx + 1}"
 
+
+class VirtualRegisterStack(RegisterStack):
+    # Hands out a fresh register for every value, the register allocator maps them onto the real ones
+    def __init__(self):
+        super().__init__(0)
+        self._registers = []
+
     @property
-    def idx(self):
-        return self._idx
+    def available(self):
+        return [Register(len(self._registers), self)]
 
     @property
     def reserved(self):
-        return self not in self._stack.available
+        return list(self._registers)
 
-    def dispose(self):
-        self._stack.dispose(self)
+    def pop(self, index: int = 0) -> 'Register':
+        register = Register(len(self._registers), self)
+        self._registers.append(register)
+        return register
+
+    def dispose(self, register: 'Register'):
+        if register.idx >= len(self._registers) or self._registers[register.idx] is not register:
+            raise ValueError("Can't dispose item to not it's own stack.")
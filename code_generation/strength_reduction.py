@@ -0,0 +1,113 @@
+from collections import Counter
+from typing import Callable
+
+from code_generation.costs import CostTable, FCPU_COSTS
+from code_generation.opcodes import Instruction, OpcodeKind
+from code_generation.stacks import Register, Const
+
+MAX_CHAIN_EXPONENT = 64
+
+
+class StrengthReductionReport:
+    def __init__(self):
+        self.rewritten: Counter[str] = Counter()
+        self.ticks = 0
+
+    def __repr__(self):
+        rewrites = ", ".join(f"{name}: {count}x" for name, count in self.rewritten.items())
+        return f"StrengthReductionReport({rewrites or 'no rewrites'}, -{self.ticks} ticks)"
+
+
+class StrengthReduction:
+    # Each opcode gets a few equivalent sequences and the cost table picks one. On a tie the rewrite is
+    # only taken when it is not longer, so targets where everything costs the same never grow code.
+    def __init__(self, cost_table: CostTable = FCPU_COSTS, new_register: Callable[[], Register] = None):
+        self.cost_table = cost_table
+        self.new_register = new_register
+
+    def reduce(self, opcodes: list[Instruction]) -> tuple[list[Instruction], StrengthReductionReport]:
+        report = StrengthReductionReport()
+        output = []
+        for opcode in opcodes:
+            best = [opcode]
+            best_cost = self.cost_table.cost(opcode.kind)
+            for candidate in self._candidates(opcode):
+                cost = self.cost_table.total(candidate)
+                if cost < best_cost or cost == best_cost and len(candidate) <= len(best) and best[0] is opcode:
+                    best, best_cost = candidate, cost
+
+            if best[0] is not opcode:
+                for rewrite in best:
+                    rewrite.source_pos = opcode.source_pos
+                report.rewritten[f"{opcode.kind.name}->{'+'.join(rewrite.kind.name for rewrite in best)}"] += 1
+                report.ticks += self.cost_table.cost(opcode.kind) - best_cost
+            output.extend(best)
+
+        return output, report
+
+    def _candidates(self, opcode: Instruction) -> list[list[Instruction]]:
+        kind = opcode.kind
+        if kind not in [OpcodeKind.add, OpcodeKind.sub, OpcodeKind.mul, OpcodeKind.div, OpcodeKind.mod,
+                        OpcodeKind.pow]:
+            return []
+
+        dst, src, val = opcode.args
+        if kind in [OpcodeKind.add, OpcodeKind.mul] and isinstance(src, Const):
+            src, val = val, src
+        if not isinstance(val, Const) or not isinstance(src, Register) or not isinstance(val.value, int):
+            return []
+
+        n = val.value
+        candidates = []
+        # Zero results are computed from the operand so that the signal type survives
+        zero = [Instruction(OpcodeKind.sub, [dst, src, src])]
+        if kind in [OpcodeKind.add, OpcodeKind.sub]:
+            if n == 0:
+                candidates.append([Instruction(OpcodeKind.mov, [dst, src])])
+            if n in [1, -1] and dst is src:
+                increments = (n == 1) == (kind == OpcodeKind.add)
+                candidates.append([Instruction(OpcodeKind.inc if increments else OpcodeKind.dec, [dst])])
+
+        elif kind == OpcodeKind.mul:
+            if n == 0:
+                candidates.append(zero)
+            elif n == 1:
+                candidates.append([Instruction(OpcodeKind.mov, [dst, src])])
+            elif n == -1:
+                candidates.append([Instruction(OpcodeKind.sub, [dst, Const(0), src])])
+            elif n == 2:
+                candidates.append([Instruction(OpcodeKind.add, [dst, src, src])])
+
+        elif kind == OpcodeKind.div:
+            if n == 1:
+                candidates.append([Instruction(OpcodeKind.mov, [dst, src])])
+            elif n == -1:
+                candidates.append([Instruction(OpcodeKind.sub, [dst, Const(0), src])])
+
+        elif kind == OpcodeKind.mod:
+            if n in [1, -1]:
+                candidates.append(zero)
+
+        elif kind == OpcodeKind.pow:
+            if n == 1:
+                candidates.append([Instruction(OpcodeKind.mov, [dst, src])])
+            elif n == 2:
+                candidates.append([Instruction(OpcodeKind.mul, [dst, src, src])])
+            elif 2 < n <= MAX_CHAIN_EXPONENT and self.new_register:
+                candidates.append(self._multiply_chain(dst, src, n))
+
+        return candidates
+
+    def _multiply_chain(self, dst: Register, src: Register, exponent: int) -> list[Instruction]:
+        # Left-to-right binary exponentiation, every step writes a fresh register and the last one writes dst
+        chain = []
+        current = src
+        for bit in bin(exponent)[3:]:
+            chain.append(Instruction(OpcodeKind.mul, [self.new_register(), current, current]))
+            current = chain[-1].args[0]
+            if bit == "1":
+                chain.append(Instruction(OpcodeKind.mul, [self.new_register(), current, src]))
+                current = chain[-1].args[0]
+
+        chain[-1] = Instruction(OpcodeKind.mul, [dst] + chain[-1].args[1:])
+        return chain
@@ -0,0 +1,189 @@
+from rply import Token
+from rply.token import SourcePosition
+
+from analyzers import Lexer, Parser, TokenStream
+from code_generation.code_generator import CodeGenerator
+from code_generation.opcodes import Instruction, Label
+from code_generation.source_map import unpack_source_pos
+from settings import CompilerSettings
+from terminal.function import Function
+from terminal.program import Program
+from tokens import TokenKind
+from visitor import copy_tree, walk
+
+
+class SourceBlock:
+    def __init__(self, start: int, end: int, tokens: list[Token]):
+        # [start, end) covers the text after the previous block up to and including this block's closing brace
+        self.start = start
+        self.end = end
+        self.tokens = tokens
+        self.function: Function | None = None
+        self.opcodes: list[Instruction] | None = None
+
+    def shifted(self, delta: int, line_delta: int, first_line: int, col_delta: int) -> 'SourceBlock':
+        # A moved copy, so the session's blocks stay valid until an update is known to succeed
+        tokens = []
+        for token in self.tokens:
+            pos = token.source_pos
+            colno = pos.colno + col_delta if pos.lineno == first_line else pos.colno
+            position = SourcePosition(pos.idx + delta, pos.lineno + line_delta, colno)
+            tokens.append(Token(token.name, token.value, position))
+
+        block = SourceBlock(self.start + delta, self.end + delta, tokens)
+        block.function = self.function
+        block.opcodes = self.opcodes
+        if not line_delta and not col_delta:
+            return block
+
+        # The parsed function and its opcodes carry packed positions of their own, they move with the tokens
+        # instead of being parsed and compiled again
+        if self.function is not None:
+            block.function = copy_tree(self.function)
+            for node in walk(block.function):
+                if getattr(node, "n_source_pos", 0):
+                    node.n_source_pos = _shift_source_pos(node.n_source_pos, line_delta, first_line, col_delta)
+        if self.opcodes is not None:
+            block.opcodes = _shift_opcodes(self.opcodes, line_delta, first_line, col_delta)
+        return block
+
+
+class CompilationSession:
+    def __init__(self, lexer: Lexer = None, parser: Parser = None, entry_point_name="Main",
+                 settings: CompilerSettings = None):
+        self.lexer = lexer or Lexer()
+        self.settings = settings
+        self.parser = parser or Parser(start=Function.name)
+        self.entry_point_name = entry_point_name
+        self.source = ""
+        self.blocks: list[SourceBlock] = []
+        self.functions: dict[str, SourceBlock] = {}
+        self.reparsed_blocks = 0
+
+    def update(self, source: str) -> list[Instruction]:
+        # A block comment may swallow text across blocks, so such sources are always rebuilt from scratch
+        if not self.blocks or "/*" in source or "/*" in self.source:
+            blocks = self._build_blocks(source, 0, len(source))
+        else:
+            blocks = self._splice(source)
+
+        # Nothing above touched the session, it only changes once the whole program checks out
+        blocks_with_functions = [block for block in blocks if block.function is not None]
+        Program.link([block.function for block in blocks_with_functions], self.entry_point_name)
+        functions = {block.function.a_name: block for block in blocks_with_functions}
+
+        self.source = source
+        self.blocks = blocks
+        self.functions = functions
+        return self.function_opcodes(self.entry_point_name)
+
+    def function_opcodes(self, name: str) -> list[Instruction]:
+        block = self.functions[name]
+        if block.opcodes is None:
+            block.opcodes = CodeGenerator.generate_function_code(block.function, self.settings)
+
+        return block.opcodes
+
+    def _splice(self, source: str) -> list[SourceBlock]:
+        old = self.source
+        prefix = _common_prefix(old, source)
+        suffix = _common_prefix(old[::-1], source[::-1], min(len(old), len(source)) - prefix)
+
+        head = []
+        for block in self.blocks:
+            if block.end > prefix:
+                break
+            head.append(block)
+
+        delta = len(source) - len(old)
+        tail = []
+        for block in reversed(self.blocks[len(head):]):
+            if block.start < len(old) - suffix:
+                break
+            tail.append(block)
+        tail.reverse()
+
+        # The re-lexed text must end on a closing brace, otherwise its last token could run into the tail
+        while tail and source[tail[0].start + delta - 1] != "}":
+            tail.pop(0)
+
+        old_start = head[-1].end if head else 0
+        old_end = tail[0].start if tail else len(old)
+        new_end = old_end + delta
+        middle = self._build_blocks(source, old_start, new_end)
+
+        if tail:
+            line_delta = source.count("\n", old_start, new_end) - old.count("\n", old_start, old_end)
+            first_line = old.count("\n", 0, old_end) + 1
+            col_delta = (new_end - source.rfind("\n", 0, new_end)) - (old_end - old.rfind("\n", 0, old_end))
+            if delta or line_delta or col_delta:
+                tail = [block.shifted(delta, line_delta, first_line, col_delta) for block in tail]
+
+        return head + middle + tail
+
+    def _build_blocks(self, source: str, start: int, end: int) -> list[SourceBlock]:
+        blocks = []
+        tokens = []
+        depth = 0
+        block_start = start
+
+        for token in self.lexer.lex(source, start, end):
+            tokens.append(token)
+            if token.name == TokenKind.LBRACE.name:
+                depth += 1
+
+            elif token.name == TokenKind.RBRACE.name:
+                depth -= 1
+                if depth == 0:
+                    block_end = token.source_pos.idx + 1
+                    blocks.append(SourceBlock(block_start, block_end, tokens))
+                    block_start = block_end
+                    tokens = []
+
+        if tokens or block_start != end:
+            blocks.append(SourceBlock(block_start, end, tokens))
+
+        for block in blocks:
+            if block.tokens:
+                block.function = self.parser.parse(TokenStream(source, iter(block.tokens)))
+                self.reparsed_blocks += 1
+
+        return blocks
+
+
+def _shift_source_pos(packed: int, line_delta: int, first_line: int, col_delta: int) -> int:
+    lineno, colno = unpack_source_pos(packed)
+    if lineno == first_line:
+        colno += col_delta
+    return (lineno + line_delta) << 32 | colno
+
+
+def _shift_opcodes(opcodes: list[Instruction], line_delta: int, first_line: int, col_delta: int) -> list[Instruction]:
+    # Labels are copied too, jumps are pointed at the copies
+    labels = {}
+    for opcode in opcodes:
+        if isinstance(opcode, Label):
+            labels[opcode] = Label(opcode.name)
+
+    shifted = []
+    for opcode in opcodes:
+        copy = labels.get(opcode) if isinstance(opcode, Label) else Instruction(
+            opcode.kind, [labels.get(arg, arg) if isinstance(arg, Label) else arg for arg in opcode.args], False
+        )
+        if opcode.source_pos:
+            copy.source_pos = _shift_source_pos(opcode.source_pos, line_delta, first_line, col_delta)
+        shifted.append(copy)
+
+    return shifted
+
+
+def _common_prefix(a: str, b: str, limit: int = None) -> int:
+    low, high = 0, min(len(a), len(b)) if limit is None else limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+
+    return low
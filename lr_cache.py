@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+
+from rply import ParserGenerator
+from rply.grammar import Grammar
+from rply.parser import LRParser
+from rply.parsergenerator import LRTable
+
+
+def default_cache_dir() -> str:
+    # Read on every call, so FCPU_CACHE_DIR set after import still applies
+    return os.environ.get("FCPU_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "pyfactoriocompiler")
+
+
+# Passed as Parser(cache=NO_CACHE) to always build the tables
+NO_CACHE = object()
+
+
+class LRTableCache:
+    VERSION = 1
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir or default_cache_dir()
+
+    @classmethod
+    def grammar_hash(cls, gen: ParserGenerator) -> str:
+        hasher = hashlib.sha1()
+        hasher.update(str(cls.VERSION).encode())
+        hasher.update(json.dumps(list(gen.tokens)).encode())
+        hasher.update(json.dumps(gen.precedence).encode())
+        for prod_name, syms, _, precedence in gen.productions:
+            hasher.update(json.dumps([prod_name, syms, precedence]).encode())
+
+        return hasher.hexdigest()
+
+    def path(self, gen: ParserGenerator) -> str:
+        return os.path.join(self.cache_dir, f"lr_table-{self.grammar_hash(gen)}.json")
+
+    def build(self, gen: ParserGenerator) -> LRParser:
+        path = self.path(gen)
+        parser = self.load(gen, path)
+        if parser is None:
+            parser = gen.build()
+            self.store(gen, parser.lr_table, path)
+
+        return parser
+
+    @staticmethod
+    def load(gen: ParserGenerator, path: str) -> LRParser | None:
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        grammar = Grammar(gen.tokens)
+        for level, (assoc, terms) in enumerate(gen.precedence, 1):
+            for term in terms:
+                grammar.set_precedence(term, assoc, level)
+
+        # Productions are only rebound to their callbacks here, the LALR automaton itself comes from the cache
+        for prod_name, syms, func, precedence in gen.productions:
+            grammar.add_production(prod_name, syms, func, precedence)
+
+        grammar.set_start()
+        if not gen.data_is_valid(grammar, data):
+            return None
+
+        return LRParser(LRTable.from_cache(grammar, data), gen.error_handler)
+
+    def store(self, gen: ParserGenerator, table: LRTable, path: str):
+        import tempfile
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=self.cache_dir, delete=False) as f:
+                json.dump(gen.serialize_table(table), f)
+
+            os.replace(f.name, path)
+        except OSError:
+            pass
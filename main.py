@@ -1,44 +1,107 @@
-from analyzers import Parser, Lexer
-from ast_evaluator import AstEvaluator
-from code_generation.code_generator import CodeGenerator
-from stopwatch import Stopwatch
-from terminal.program import Program
-from utils import TerminalUtil
+import argparse
+import os
+import sys
+from typing import TYPE_CHECKING
 
+from settings import CompilerSettings, CompilationTarget
+from tracing import Tracer, TRACE_SUFFIX
 
-def compile_file(path: str):
-    lexer = Lexer()
-    parser = Parser()
+if TYPE_CHECKING:
+    from terminal.program import Program
+
+
+def compile_file(path: str, eval_mode: str = "tree", settings: CompilerSettings = None, report: bool = False,
+                 profile_inputs: str = None, trace: bool = False, trace_memory: bool = False):
+    tracer = Tracer(memory=trace_memory)
+    with tracer.activate(), tracer.span("compile_file", path=path):
+        _compile_file(tracer, path, eval_mode, settings, report, profile_inputs)
+    tracer.close()
+
+    print()
+    print(tracer.summary())
+    if trace:
+        tracer.write_chrome_trace(os.path.splitext(path)[0] + TRACE_SUFFIX)
+
+
+def _compile_file(tracer: Tracer, path: str, eval_mode: str, settings: CompilerSettings, report: bool,
+                  profile_inputs: str):
+    # Backends are imported here so that argument errors and --help do not pay for the whole compiler
+    with tracer.span("import"):
+        from analyzers import Parser, Lexer, TokenStream
+        from ast_evaluator import AstEvaluator
+        from code_generation.code_generator import CodeGenerator
+
+        lexer = Lexer()
+        parser = Parser()
 
     with open(path) as f:
         code = f.read()
 
-    watch = Stopwatch("Lexing code to tokens").start()
-    tokens = lexer.lex(code)
-    watch.stop()
+    # The lexer is lazy, its tokens are collected here so that parsing is timed on its own
+    with tracer.span("lex", characters=len(code)):
+        tokens = list(lexer.lex(code))
 
-    watch = Stopwatch("Parsing tokens to AST").start()
-    term: Program = parser.parse(tokens)
-    watch.stop()
+    with tracer.span("parse", tokens=len(tokens)):
+        term: 'Program' = parser.parse(TokenStream(code, iter(tokens)))
+
+    with tracer.span("codegen", function=term.entry_point.a_name):
+        env = CodeGenerator.generate_function_data(term.entry_point, settings)
+        opcodes = env.opcodes
+    if report:
+        for name, pass_report in env.reports.items():
+            print(f"{name}: {pass_report}")
 
-    watch = Stopwatch("Generating opcodes from AST").start()
-    opcodes = CodeGenerator.generate_code(term)
-    watch.stop()
     print("Opcodes:")
-    [print(opcode.to_string()) for opcode in opcodes]
+    print("\n".join(opcode.to_string() for opcode in opcodes))
+
+    if profile_inputs:
+        from profiler import load_inputs, profile_program, PROFILE_SUFFIX
+
+        with tracer.span("profile", inputs=profile_inputs):
+            profile = profile_program(term, opcodes, path, code, load_inputs(profile_inputs), settings)
+        print()
+        print(profile.annotated())
+        profile.write(os.path.splitext(path)[0] + PROFILE_SUFFIX)
 
     print()
-    watch = Stopwatch("Evaluating").start()
-    evaluator = AstEvaluator()
-    result = evaluator.evaluate(term)
-    print(f"result({result}) ", end="")
-    watch.stop()
+    with tracer.span("evaluate", mode=eval_mode):
+        evaluator = AstEvaluator(eval_mode)
+        result = evaluator.evaluate(term)
+    print(f"result({result})")
     # TODO: Implement comparison in expressions
 
 
-def main():
-    compile_file("ex1.fcpu")
+def main(argv: list[str] = None):
+    arg_parser = argparse.ArgumentParser(description="Compile .fcpu programs to fCPU opcodes.")
+    arg_parser.add_argument("paths", nargs="*", default=["ex1.fcpu"], help="source files or directories")
+    arg_parser.add_argument("-o", "--out-dir", help="compile in batch mode, writing one listing per source here")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None, help="batch worker processes")
+    arg_parser.add_argument("--eval-mode", choices=["tree", "bytecode"], default="tree", help="AST evaluator backend")
+    arg_parser.add_argument("-O0", "--no-optimize", action="store_true", help="skip optimization passes")
+    arg_parser.add_argument("--report", action="store_true", help="print what each compiler pass did")
+    arg_parser.add_argument("--profile", metavar="INPUTS",
+                            help="run the program on recorded input signals (JSON) and report ticks per source line")
+    arg_parser.add_argument("--trace", action="store_true",
+                            help=f"write a Chrome trace of the compiler phases next to each source ({TRACE_SUFFIX})")
+    arg_parser.add_argument("--trace-memory", action="store_true",
+                            help="trace memory peaks and allocated blocks per phase, slows compilation down")
+    args = arg_parser.parse_args(argv)
+    settings = CompilerSettings(CompilationTarget.raw_fcpu, optimize=not args.no_optimize)
+
+    if not args.out_dir:
+        for path in args.paths:
+            compile_file(path, args.eval_mode, settings, args.report, args.profile, args.trace, args.trace_memory)
+        return 0
+
+    from batch import compile_batch
+
+    report = compile_batch(args.paths, args.out_dir, args.jobs, settings)
+    for result in report.failed:
+        print(f"{result.source}: {result.error}", file=sys.stderr)
+
+    print(report.summary())
+    return 1 if report.failed else 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
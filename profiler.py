@@ -0,0 +1,150 @@
+import json
+
+from code_generation.opcodes import Instruction
+from code_generation.costs import TARGET_COSTS
+from code_generation.simulator import FcpuSimulator
+from code_generation.source_map import unpack_source_pos
+from settings import CompilerSettings, CompilationTarget
+from terminal.program import Program
+
+PROFILE_SUFFIX = ".profile.json"
+
+
+class LineProfile:
+    # executions counts how often the line was reached, i.e. the most executed of its instructions
+    def __init__(self, line: int):
+        self.line = line
+        self.ticks = 0
+        self.executions = 0
+        self.instructions: list[int] = []
+
+    def to_json(self) -> dict:
+        return {"line": self.line, "ticks": self.ticks, "executions": self.executions,
+                "instructions": self.instructions}
+
+
+class FunctionProfile:
+    def __init__(self, name: str, first_line: int, last_line: int | None):
+        self.name = name
+        self.first_line = first_line
+        self.last_line = last_line
+        self.ticks = 0
+        self.executions = 0
+
+    def to_json(self) -> dict:
+        return {"name": self.name, "first_line": self.first_line, "last_line": self.last_line,
+                "ticks": self.ticks, "executions": self.executions}
+
+
+class ProfileReport:
+    def __init__(self, source: str, source_lines: list[str], listing: list[str], runs: int):
+        self.source = source
+        self.source_lines = source_lines
+        self.listing = listing
+        self.runs = runs
+        self.ticks = 0
+        self.halted = 0
+        self.lines: dict[int, LineProfile] = {}
+        self.functions: list[FunctionProfile] = []
+        # Ticks of instructions without a source position, e.g. the register allocator's spill code
+        self.unmapped_ticks = 0
+
+    def annotated(self) -> str:
+        width = max(len(str(self.ticks)), 5)
+        text = [f"{'ticks':>{width}} {'execs':>{width}} | {'line':>4} | {self.source}"]
+        for number, source_line in enumerate(self.source_lines, 1):
+            profile = self.lines.get(number)
+            ticks, executions = (profile.ticks, profile.executions) if profile else ("", "")
+            text.append(f"{ticks:>{width}} {executions:>{width}} | {number:>4} | {source_line}")
+
+        text.append("")
+        text.append(f"{self.ticks} ticks over {self.runs} runs, {self.halted} halted, "
+                    f"{self.unmapped_ticks} ticks without a source line")
+        for function in sorted(self.functions, key=lambda f: -f.ticks):
+            share = function.ticks / self.ticks * 100 if self.ticks else 0
+            text.append(f"{function.name:>20}: {function.ticks} ticks ({share:.1f}%), "
+                        f"{function.executions} executions")
+
+        return "\n".join(text)
+
+    def to_json(self) -> dict:
+        return {
+            "source": self.source,
+            "runs": self.runs,
+            "ticks": self.ticks,
+            "halted": self.halted,
+            "unmapped_ticks": self.unmapped_ticks,
+            "lines": [self.lines[line].to_json() for line in sorted(self.lines)],
+            "functions": [function.to_json() for function in self.functions],
+            "listing": self.listing,
+        }
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f, indent=1)
+
+
+def load_inputs(path: str) -> list[tuple[dict[str, int], dict[str, int]]]:
+    # A recording is one {"red": {...}, "green": {...}} object or a list of them, one per run
+    with open(path) as f:
+        recording = json.load(f)
+
+    if isinstance(recording, dict):
+        recording = [recording]
+
+    return [(sample.get("red", {}), sample.get("green", {})) for sample in recording]
+
+
+def profile_program(program: Program, opcodes: list[Instruction], source: str, code: str,
+                    inputs: list[tuple[dict, dict]], settings: CompilerSettings = None,
+                    max_ticks: int = 1_000_000) -> ProfileReport:
+    # Runs the listing the caller already compiled from program's entry point, so the report matches it line
+    # for line
+    settings = settings or CompilerSettings(CompilationTarget.raw_fcpu)
+    simulator = FcpuSimulator(opcodes, TARGET_COSTS[settings.compilation_target])
+    report = ProfileReport(source, code.splitlines(), [opcode.to_string() for opcode in opcodes], len(inputs))
+
+    ticks = [0] * len(simulator.instructions)
+    executions = [0] * len(simulator.instructions)
+    for red, green in inputs:
+        result = simulator.run(red, green, max_ticks)
+        report.ticks += result.ticks
+        report.halted += result.halted
+        for index, count in enumerate(result.executions):
+            executions[index] += count
+            ticks[index] += count * simulator.costs[index]
+
+    listing_lines = {id(opcode): number for number, opcode in enumerate(opcodes, 1)}
+    for index, instruction in enumerate(simulator.instructions):
+        line = unpack_source_pos(instruction.source_pos)[0]
+        if not line:
+            report.unmapped_ticks += ticks[index]
+            continue
+
+        profile = report.lines.get(line)
+        if profile is None:
+            profile = report.lines[line] = LineProfile(line)
+        profile.ticks += ticks[index]
+        profile.executions = max(profile.executions, executions[index])
+        profile.instructions.append(listing_lines[id(instruction)])
+
+    # A function spans from its own line to the line before the next function
+    starts = sorted((unpack_source_pos(function.n_source_pos)[0], function.a_name) for function in program.functions)
+    ends = [start - 1 for start, _ in starts[1:]] + [None]
+    report.functions = [FunctionProfile(name, start, end) for (start, name), end in zip(starts, ends)]
+    for line in sorted(report.lines):
+        function = _function_at(report.functions, line)
+        if function:
+            function.ticks += report.lines[line].ticks
+            # The first line of a function runs once per call
+            function.executions = function.executions or report.lines[line].executions
+
+    return report
+
+
+def _function_at(functions: list[FunctionProfile], line: int) -> FunctionProfile | None:
+    for function in functions:
+        if function.first_line <= line and (function.last_line is None or line <= function.last_line):
+            return function
+
+    return None
@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from analyzers import Lexer, Parser
+from ast_evaluator import AstEvaluator
+from code_generation.code_generator import CodeGenerator
+from code_generation.source_map import SourceMap
+from settings import CompilerSettings, CompilationTarget
+
+DEFAULT_SOCKET = os.environ.get("FCPU_SERVER_SOCKET") or os.path.join(
+    os.path.expanduser("~"), ".cache", "pyfactoriocompiler", "server.sock"
+)
+# Longest accepted request line, a source file bigger than this is better compiled in batch mode
+MAX_REQUEST_SIZE = 16 * 2 ** 20
+
+
+class RequestError(Exception):
+    pass
+
+
+class WorkerError(Exception):
+    pass
+
+
+class CompileWorker:
+    # A warm child process that runs one request at a time. Unlike a thread it can be stopped: a request that
+    # runs past its timeout kills the process, and the next request starts a fresh one before its own timeout
+    # starts counting.
+    def __init__(self):
+        self._context = multiprocessing.get_context("spawn")
+        self._process: multiprocessing.Process | None = None
+        self._connection = None
+        self.restarts = 0
+
+    def start(self):
+        connection, child_connection = self._context.Pipe()
+        self._process = self._context.Process(target=_worker_main, args=(child_connection,), daemon=True,
+                                              name="compile-worker")
+        self._process.start()
+        child_connection.close()
+        self._connection = connection
+        try:
+            # The worker reports once its lexer and parser are built
+            self._connection.recv()
+        except EOFError:
+            self.stop()
+            raise WorkerError("compile worker failed to start")
+
+    def run(self, request: dict, timeout: float) -> dict:
+        if self._process is None:
+            self.start()
+
+        try:
+            self._connection.send(request)
+            finished = self._connection.poll(timeout)
+            ok, result = self._connection.recv() if finished else (None, None)
+        except (EOFError, BrokenPipeError):
+            self._replace()
+            raise WorkerError("compile worker exited")
+
+        if not finished:
+            self._replace()
+            raise TimeoutError("request did not finish in time")
+        if not ok:
+            raise WorkerError(result)
+        return result
+
+    def stop(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._connection.close()
+            self._process = self._connection = None
+
+    def _replace(self):
+        self.stop()
+        self.restarts += 1
+
+
+def _worker_main(connection):
+    lexer, parser = Lexer(), Parser()
+    connection.send(None)
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+
+        try:
+            connection.send((True, _run(lexer, parser, request)))
+        except Exception as e:
+            connection.send((False, f"{e.__class__.__name__}: {e}"))
+
+
+def _run(lexer: Lexer, parser: Parser, request: dict) -> dict:
+    program = parser.parse(lexer.lex(request["source"]))
+    if request["op"] == "evaluate":
+        return {"ok": True, "result": AstEvaluator(request.get("eval_mode", "tree")).evaluate(program)}
+
+    settings = CompilerSettings(CompilationTarget.raw_fcpu, optimize=bool(request.get("optimize", True)))
+    env = CodeGenerator.generate_function_data(program.entry_point, settings)
+    return {
+        "ok": True,
+        "opcodes": [opcode.to_string() for opcode in env.opcodes],
+        "source_map": SourceMap.from_opcodes(request.get("path", "<request>"), env.opcodes).to_json(),
+        "reports": {name: repr(report) for name, report in env.reports.items()},
+    }
+
+
+class CompileServer:
+    # One JSON object per line in both directions. Compile and evaluate requests run one at a time in a worker
+    # process that owns the warm lexer and parser, a request's timeout only counts its own run time. Once
+    # max_pending requests are queued, connections stop being read, which pushes back on clients through the
+    # socket buffers.
+    def __init__(self, path: str = DEFAULT_SOCKET, max_pending: int = 32, timeout: float = 10.,
+                 cache_size: int = 256):
+        self.path = path
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.stats = {"requests": 0, "cache_hits": 0, "errors": 0, "timeouts": 0}
+        self._cache: OrderedDict[tuple, dict] = OrderedDict()
+        self._pending = asyncio.Semaphore(max_pending)
+        self._worker = CompileWorker()
+        # Waits on the worker without blocking the event loop, one thread keeps requests in order
+        self._waiter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="compile")
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        self._server = await asyncio.start_unix_server(self._serve, self.path, limit=MAX_REQUEST_SIZE)
+        await asyncio.get_running_loop().run_in_executor(self._waiter, self._worker.start)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._waiter.shutdown(wait=False, cancel_futures=True)
+        self._worker.stop()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(_encode({"ok": False, "error": "RequestError: request line too long"}))
+                    break
+                if not line:
+                    break
+
+                async with self._pending:
+                    response = await self.handle(line)
+                writer.write(_encode(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, line: bytes) -> dict:
+        self.stats["requests"] += 1
+        start = time.perf_counter()
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+
+            request_id = request.get("id")
+            op = request.get("op")
+            if op == "ping":
+                response = {"ok": True}
+            elif op == "stats":
+                stats = dict(self.stats, cached_sources=len(self._cache), worker_restarts=self._worker.restarts)
+                response = {"ok": True, "stats": stats}
+            elif op not in ["compile", "evaluate"]:
+                raise RequestError(f"unknown op {op!r}, expected compile, evaluate, ping or stats")
+            else:
+                response = await self._compile(request)
+
+        except TimeoutError:
+            self.stats["timeouts"] += 1
+            response = {"ok": False, "error": "TimeoutError: request did not finish in time"}
+        except WorkerError as e:
+            self.stats["errors"] += 1
+            response = {"ok": False, "error": str(e)}
+        except Exception as e:
+            self.stats["errors"] += 1
+            response = {"ok": False, "error": f"{e.__class__.__name__}: {e}"}
+
+        response["id"] = request_id
+        response["seconds"] = time.perf_counter() - start
+        return response
+
+    async def _compile(self, request: dict) -> dict:
+        key = self._cache_key(request)
+        response = self._cache.get(key)
+        if response is not None:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            response = dict(response, cached=True)
+            # Cached results do not depend on the path, only the source map names it
+            if "source_map" in response:
+                response["source_map"] = dict(response["source_map"], source=request.get("path", "<request>"))
+            return response
+
+        loop = asyncio.get_running_loop()
+        timeout = min(float(request.get("timeout", self.timeout)), self.timeout)
+        response = await loop.run_in_executor(self._waiter, self._worker.run, request, timeout)
+        self._remember(key, response)
+        return dict(response, cached=False)
+
+    @staticmethod
+    def _cache_key(request: dict) -> tuple:
+        source = request.get("source")
+        if not isinstance(source, str):
+            raise RequestError("'source' must be a string")
+
+        digest = hashlib.sha1(source.encode()).hexdigest()
+        return request["op"], digest, bool(request.get("optimize", True)), request.get("eval_mode", "tree")
+
+    def _remember(self, key: tuple, response: dict):
+        # Failed compilations are not worth keeping, the next edit changes the source anyway
+        if not response.get("ok"):
+            return
+
+        self._cache[key] = response
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+def _encode(response: dict) -> bytes:
+    return json.dumps(response).encode() + b"\n"
+
+
+class CompileClient:
+    # Blocking client for build tools, one connection reused for many requests
+    def __init__(self, path: str = DEFAULT_SOCKET, timeout: float = 30.):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(path)
+        self._file = self._socket.makefile("rb")
+        self._next_id = 0
+
+    def request(self, op: str, **fields) -> dict:
+        self._next_id += 1
+        self._socket.sendall(_encode({"id": self._next_id, "op": op, **fields}))
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Compile server closed the connection.")
+
+        return json.loads(line)
+
+    def compile(self, source: str, optimize: bool = True, path: str = None) -> dict:
+        return self.request("compile", source=source, optimize=optimize, path=path or "<request>")
+
+    def evaluate(self, source: str, eval_mode: str = "tree") -> dict:
+        return self.request("evaluate", source=source, eval_mode=eval_mode)
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def main(argv: list[str] = None):
+    arg_parser = argparse.ArgumentParser(description="Serve compile requests on a Unix socket.")
+    arg_parser.add_argument("--socket", default=DEFAULT_SOCKET, help="socket path")
+    arg_parser.add_argument("--max-pending", type=int, default=32, help="requests queued before reading stops")
+    arg_parser.add_argument("--timeout", type=float, default=10., help="seconds per request")
+    arg_parser.add_argument("--cache-size", type=int, default=256, help="responses kept for unchanged sources")
+    args = arg_parser.parse_args(argv)
+
+    async def run():
+        server = CompileServer(args.socket, args.max_pending, args.timeout, args.cache_size)
+        await server.start()
+        print(f"Listening on {args.socket}", file=sys.stderr)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,8 +2,24 @@ from enum import Enum
 
 
 class CompilerSettings:
-    def __init__(self, target: 'CompilationTarget'):
+    def __init__(self, target: 'CompilationTarget', optimize: bool = True, peephole_rules: list[str] = None,
+                 constant_folding: bool = True, dead_code_elimination: bool = True, strength_reduction: bool = True,
+                 loop_optimization: bool = True, unroll_budget: int = 64, hoist_input_reads: bool = False,
+                 dispatch_tables: bool = True):
         self.compilation_target = target
+        self.optimize = optimize
+        self.constant_folding = constant_folding
+        self.dead_code_elimination = dead_code_elimination
+        self.strength_reduction = strength_reduction
+        self.loop_optimization = loop_optimization
+        # Roughly how many statements a loop may grow to when unrolled
+        self.unroll_budget = unroll_budget
+        # Input signals can change between ticks, so reads inside loops stay put unless inputs are known to be stable
+        self.hoist_input_reads = hoist_input_reads
+        # Long `x == <int>` else-if chains become a computed jump into a table of branches
+        self.dispatch_tables = dispatch_tables
+        # None enables every peephole rule, an empty list disables the pass
+        self.peephole_rules = peephole_rules
 
 
 class CompilationTarget(Enum):
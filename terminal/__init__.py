@@ -1,8 +1,12 @@
+import hashlib
+import importlib
 import os
 
 from terminal import *
 from terminal.base import *
 
+REGISTRY_PATH = os.path.join(os.path.dirname(__file__), "_registry.py")
+
 
 def collect_terminals():
     terminals = {}
@@ -42,8 +46,60 @@ def _init_terminals(terminals) -> dict[str, Type['Terminal']]:
     return {key: named_terminals[key] for key in reversed(named_terminals)}
 
 
-raw_terminals = collect_terminals()
-all_terminals = _init_terminals(raw_terminals)
+def sources_hash() -> str:
+    hasher = hashlib.sha1()
+    directory = os.path.dirname(__file__)
+    for filename in sorted(os.listdir(directory)):
+        if not filename.startswith("_") and filename.endswith(".py"):
+            hasher.update(filename.encode())
+            with open(os.path.join(directory, filename), "rb") as f:
+                hasher.update(f.read())
+
+    return hasher.hexdigest()
+
+
+def load_registry() -> dict[str, Type['Terminal']] | None:
+    # The checked-in registry skips scanning every module, it is ignored once any terminal source changed
+    try:
+        from terminal._registry import SOURCE_HASH, TERMINALS
+    except ImportError:
+        return None
+
+    if SOURCE_HASH != sources_hash():
+        return None
+
+    terminals = {}
+    for name, module_name, class_name in TERMINALS:
+        term = getattr(importlib.import_module("terminal." + module_name), class_name)
+        term.name = name
+        terminals[name] = term
+
+    return terminals
+
+
+def write_registry(terminals: dict[str, Type['Terminal']], path: str = REGISTRY_PATH):
+    lines = [
+        "# Generated by `python -m terminal`, regenerate after changing any terminal module.",
+        "# Terminals in grammar order as (name, module, class name).",
+        f'SOURCE_HASH = "{sources_hash()}"',
+        "TERMINALS = [",
+    ]
+    for name, term in terminals.items():
+        lines.append(f'    ("{name}", "{term.__module__.split(".")[-1]}", "{term.__name__}"),')
+    lines.append("]")
+
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+all_terminals = load_registry()
+if all_terminals is None:
+    raw_terminals = collect_terminals()
+    all_terminals = _init_terminals(raw_terminals)
+else:
+    raw_terminals = {"Terminal": Terminal, "Example": Example, **{
+        term.__name__: term for term in all_terminals.values()
+    }}
 
 __all__ = {
     "all_terminals": all_terminals,
@@ -0,0 +1,5 @@
+from terminal import collect_terminals, _init_terminals, write_registry, REGISTRY_PATH
+
+if __name__ == '__main__':
+    write_registry(_init_terminals(collect_terminals()))
+    print(f"Wrote {REGISTRY_PATH}")
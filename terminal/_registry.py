@@ -0,0 +1,22 @@
+# Generated by `python -m terminal`, regenerate after changing any terminal module.
+# Terminals in grammar order as (name, module, class name).
+SOURCE_HASH = "cd895ad5e00324760dedd4d8b74345b88a790441"
+TERMINALS = [
+    ("program", "program", "Program"),
+    ("function", "function", "Function"),
+    ("sep_collector_def_args", "arguments", "SepCollectorDefArgs"),
+    ("def_argument", "arguments", "DefArgument"),
+    ("def_args", "arguments", "DefArgs"),
+    ("statement", "bodies", "Statement"),
+    ("body", "bodies", "Body"),
+    ("assign", "assign", "Assign"),
+    ("unary_expr", "expressoin", "UnaryExpr"),
+    ("yield", "returns", "Yield"),
+    ("return", "returns", "Return"),
+    ("expression", "expressoin", "Expression"),
+    ("variable", "base", "Variable"),
+    ("number_literal", "base", "NumberLiteral"),
+    ("if_statement", "compounds", "IfStatement"),
+    ("for_statement", "compounds", "ForStatement"),
+    ("condition", "compounds", "Condition"),
+]
@@ -4,10 +4,12 @@ from rply import ParserGenerator, Token
 
 from ast_evaluator import ExecutionFrame
 from code_generation.code_generator import CodeGenFrame
-from terminal.base import Terminal
+from terminal.base import Terminal, list_productions
 
 
 class DefArgument(Terminal):
+    __slots__ = ("arg_name", "wire", "signal")
+
     def __init__(self, name, wire="red", signal=None):
         self.arg_name = name
         self.wire = wire
@@ -35,6 +37,8 @@ class DefArgument(Terminal):
 
 
 class DefArgs(Terminal):
+    __slots__ = ("items",)
+
     def __init__(self, items: list[DefArgument]):
         self.items = items
 
@@ -46,13 +50,7 @@ class DefArgs(Terminal):
 
         @gen.production(f"{this.name} : {DefArgument.name} {SepCollectorDefArgs.name}")
         def part_def(p: list[DefArgs | DefArgument]):
-            items = []
-            if p[0]:
-                items.append(p[0])
-                if p[1]:
-                    items += p[1].items
-
-            return DefArgs(items)
+            return DefArgs([p[0], *p[1].items])
 
     def evaluate(self, frame: 'ExecutionFrame'):
         super().evaluate(frame)
@@ -62,20 +60,18 @@ class DefArgs(Terminal):
 
 
 class SepCollectorDefArgs(Terminal):
-    def __init__(self, item: DefArgument, previous: 'SepCollectorDefArgs'):
-        self.items = None
-        self.items = previous.items if previous else []
-        self.items.append(item)
+    __slots__ = ("items",)
+
+    def __init__(self, items: list[DefArgument]):
+        self.items = items
 
     @staticmethod
     def gen_productions(this: Type[Terminal], gen: ParserGenerator):
-        @gen.production(f"{this.name} :")
-        def empty_def(_):
-            return
+        @gen.production(f"{this.name} : {this.name}_items")
+        def part_def(p: list[list[DefArgument]]):
+            return SepCollectorDefArgs(p[0])
 
-        @gen.production(f"{this.name} : {this.name} COMMA {DefArgument.name}")
-        def part_def(p: list[SepCollectorDefArgs | DefArgument]):
-            return SepCollectorDefArgs(p[2], p[0])
+        list_productions(gen, f"{this.name}_items", DefArgument.name, "COMMA")
 
     def evaluate(self, frame: 'ExecutionFrame'):
         super().evaluate(frame)
@@ -5,16 +5,29 @@ from rply import Token, ParserGenerator
 from ast_evaluator import ExecutionFrame
 from code_generation.code_generator import CodeGenFrame
 from code_generation.opcodes import Instruction, OpcodeKind
-from code_generation.stacks import Const
-from terminal.expressoin import Expression
+from code_generation.source_map import pack_source_pos
+from code_generation.stacks import Register
+from terminal.expressoin import Expression, BINARY_OPCODES
 from terminal.base import Terminal, Variable
 from tokens import TokenKind
 
 
+COMPOUND_OPERATORS = {
+    TokenKind.ASSIGN_SUM.name: (TokenKind.OP_SUM.name, "+"),
+    TokenKind.ASSIGN_SUB.name: (TokenKind.OP_SUB.name, "-"),
+    TokenKind.ASSIGN_MUL.name: (TokenKind.OP_MUL.name, "*"),
+    TokenKind.ASSIGN_DIV.name: (TokenKind.OP_DIV.name, "/"),
+    TokenKind.ASSIGN_POW.name: (TokenKind.OP_POW.name, "**"),
+}
+
+
 class Assign(Terminal):
+    __slots__ = ("a_name", "value", "n_source_pos")
+
     def __init__(self, name: Token, value: 'Expression'):
         self.a_name = name.value
         self.value = value
+        self.n_source_pos = pack_source_pos(name)
 
     @staticmethod
     def gen_productions(this: Type[Terminal], gen: ParserGenerator):
@@ -28,34 +41,37 @@ class Assign(Terminal):
         @gen.production(f"{this.name} : IDENTIFIER ASSIGN_DIV {Expression.name}")
         @gen.production(f"{this.name} : IDENTIFIER ASSIGN_POW {Expression.name}")
         def example_def(p: tuple[Token, Token, Expression]):
-            operator = {
-                TokenKind.ASSIGN_SUM.name: Token(TokenKind.OP_SUM.name, "+", p[1].source_pos),
-                TokenKind.ASSIGN_SUB.name: Token(TokenKind.OP_SUB.name, "-", p[1].source_pos),
-                TokenKind.ASSIGN_MUL.name: Token(TokenKind.OP_MUL.name, "*", p[1].source_pos),
-                TokenKind.ASSIGN_DIV.name: Token(TokenKind.OP_DIV.name, "/", p[1].source_pos),
-                TokenKind.ASSIGN_POW.name: Token(TokenKind.OP_POW.name, "**", p[1].source_pos),
-            }[p[1].name]
+            operator = Token(*COMPOUND_OPERATORS[p[1].name], p[1].source_pos)
             expression = Expression(Variable(p[0].value, None), operator, p[2])
             return Assign(p[0], expression)
 
     def evaluate(self, frame: 'ExecutionFrame'):
-        value = self.value.evaluate(frame)
+        value = yield self.value
         frame.set_local(self.a_name, value)
 
     def generate_opcodes(self, frame: CodeGenFrame):
-        self.value.generate_opcodes(frame.open_frame())
-        value_frame = frame.close_frame()
+        value = yield self.value
+        temporary = isinstance(value, Register) and value not in frame.data.registers_in_locals
         if self.a_name in frame.data.locals:
             reg = frame.get(self.a_name).n_storage
-
+        elif temporary:
+            reg = value
         else:
             reg = frame.reg_stack.pop()
 
-        if isinstance(reg, Const):
-            reg = frame.reg_stack.pop()
+        last_opcode = frame.data.opcodes[-1] if frame.data.opcodes else None
+        if (
+            temporary and reg is not value and last_opcode is not None and
+            last_opcode.kind in BINARY_OPCODES.values() and last_opcode.args[0] is value
+        ):
+            # Write the result straight into the variable instead of copying the temporary
+            frame.data.opcodes[-1] = Instruction(
+                last_opcode.kind, [reg] + last_opcode.args[1:], source_pos=last_opcode.source_pos
+            )
+        elif reg is not value:
             frame.push_opcode(Instruction(
                 OpcodeKind.mov,
-                [reg, value_frame.return_storage]
+                [reg, value]
             ))
 
         # SemanticAnalyzer must check if assign expression returns value, right?
@@ -8,8 +8,36 @@ if TYPE_CHECKING:
 
 from code_generation.stacks import Const
 
+_shared_tokens: dict[tuple[str, str], Token] = {}
+
+
+def shared_token(token: Token) -> Token:
+    # Operator tokens are kept without their position, so every node with the same operator shares one
+    key = (token.name, token.value)
+    shared = _shared_tokens.get(key)
+    if shared is None:
+        shared = _shared_tokens[key] = Token(token.name, token.value)
+
+    return shared
+
+
+def list_productions(gen: ParserGenerator, name: str, item: str, separator: str = None):
+    # `name : | name [separator] item`, reduced into one Python list that every reduction appends to. Only the
+    # list's own reduction holds it, so growing it in place is safe and a list of n items costs n appends; the
+    # node owning the items is built once from the finished list.
+    @gen.production(f"{name} :")
+    def empty_list(_):
+        return []
+
+    @gen.production(f"{name} : {name} {separator} {item}" if separator else f"{name} : {name} {item}")
+    def append_item(p: list):
+        p[0].append(p[-1])
+        return p[0]
+
 
 class Terminal:
+    # Nodes use __slots__, large generated programs build hundreds of thousands of them
+    __slots__ = ()
     name = None
 
     @staticmethod
@@ -24,6 +52,8 @@ class Terminal:
 
 
 class Example(Terminal):
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -41,6 +71,8 @@ class Example(Terminal):
 
 
 class NumberLiteral(Terminal):
+    __slots__ = ("value",)
+
     def __init__(self, value: int | float):
         self.value = value
 
@@ -63,14 +95,17 @@ class NumberLiteral(Terminal):
 
 
 class Variable(Terminal):
+    __slots__ = ("a_name", "n_storage_", "n_on_get_storage")
+
     def __init__(self, name, storage):
         self.a_name = name
         self.n_storage_ = storage
-        self.n_on_get_storage = lambda this: this.n_storage_
+        # Optional hook producing the storage on first use, set for function arguments
+        self.n_on_get_storage = None
 
     @property
     def n_storage(self):
-        return self.n_on_get_storage(self)
+        return self.n_on_get_storage(self) if self.n_on_get_storage else self.n_storage_
 
     def evaluate(self, frame: 'ExecutionFrame'):
         return frame.locals[self.a_name]
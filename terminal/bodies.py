@@ -1,10 +1,10 @@
-from typing import Optional, Type, TYPE_CHECKING
+from typing import Type, TYPE_CHECKING
 
 from rply import ParserGenerator, Token
 
 from ast_evaluator import ExecutionFrame
 from terminal.returns import Yield, Return
-from terminal.base import Terminal
+from terminal.base import Terminal, list_productions
 from terminal.expressoin import Expression
 from code_generation.code_generator import CodeGenFrame
 from terminal.assign import Assign
@@ -12,36 +12,37 @@ from terminal.compounds import ForStatement, IfStatement
 
 
 class Body(Terminal):
-    def __init__(self, item: Optional['Statement'], previous: Optional['Body'] = None):
-        self.items: list['Statement'] = []
-        self.items = previous.items if previous else []
-        if item:
-            self.items.append(item)
+    __slots__ = ("items",)
+
+    def __init__(self, items: list['Statement']):
+        self.items = items
 
     @staticmethod
     def gen_productions(this: Type[Terminal], gen: ParserGenerator):
-        @gen.production(f"{this.name} :")
-        def empty_def(_):
-            return Body(None)
+        @gen.production(f"{this.name} : {this.name}_items")
+        def part_def(p: list[list['Statement']]):
+            return Body(p[0])
 
-        @gen.production(f"{this.name} : {this.name} {Statement.name}")
-        def part_def(p):
-            return Body(p[1], p[0])
+        list_productions(gen, f"{this.name}_items", Statement.name)
 
     def evaluate(self, frame: 'ExecutionFrame'):
         for item in self.items:
-            output = item.evaluate(frame)
+            output = yield item
             if item.name in [Yield.name, Return.name]:
                 return output
 
     def generate_opcodes(self, frame: 'CodeGenFrame'):
+        # Code after the body, like the jump closing a loop, belongs to the statement owning the body
+        outer_source_pos = frame.data.source_pos
         for item in self.items:
-            frame.open_frame()
-            item.generate_opcodes(frame.current_frame)
-            frame.close_frame()
+            frame.mark_source(item)
+            yield item
+        frame.data.source_pos = outer_source_pos
 
 
 class Statement(Terminal):
+    __slots__ = ("value",)
+
     def __init__(self, value: Terminal):
         self.value = value
 
@@ -57,7 +58,7 @@ class Statement(Terminal):
             return p[0]
 
     def evaluate(self, frame: 'ExecutionFrame'):
-        self.value.evaluate(frame)
+        yield self.value
         return 0
 
     def generate_opcodes(self, frame: 'CodeGenFrame'):
@@ -1,9 +1,11 @@
-from typing import Type, Union, TYPE_CHECKING
+from typing import Optional, Type, Union, TYPE_CHECKING
 
 from rply import ParserGenerator, Token
 
-from terminal.base import Terminal
+from terminal.base import Terminal, Variable, NumberLiteral
+from code_generation.branch_layout import BranchLayoutReport, LIKELY_PROBABILITY
 from code_generation.opcodes import Label, OpcodeKind, Instruction
+from code_generation.source_map import pack_source_pos
 from code_generation.stacks import Const
 
 if TYPE_CHECKING:
@@ -14,7 +16,34 @@ if TYPE_CHECKING:
     from terminal.assign import Assign
 
 
+MIN_DISPATCH_CASES = 4
+# A dispatch table may span at most this many entries per case, the rest jump to the default branch
+MAX_DISPATCH_HOLES_RATIO = 2
+# Two bounds checks, the offset, the computed jump and the table jump
+DISPATCH_TICKS = 5
+
+JUMP_IF_FALSE = {
+    "==": OpcodeKind.bne,
+    "!=": OpcodeKind.beq,
+    "<=": OpcodeKind.bgt,
+    ">=": OpcodeKind.blt,
+    "<": OpcodeKind.bge,
+    ">": OpcodeKind.ble,
+}
+
+JUMP_IF_TRUE = {
+    "==": OpcodeKind.beq,
+    "!=": OpcodeKind.bne,
+    "<=": OpcodeKind.ble,
+    ">=": OpcodeKind.bge,
+    "<": OpcodeKind.blt,
+    ">": OpcodeKind.bgt,
+}
+
+
 class Condition(Terminal):
+    __slots__ = ("expr",)
+
     def __init__(self, expr: 'Expression'):
         self.expr = expr
 
@@ -25,120 +54,261 @@ class Condition(Terminal):
             return Condition(p[0])
 
     def evaluate(self, frame: 'ExecutionFrame'):
-        return self.expr.evaluate(frame)
+        return (yield self.expr)
 
-    def generate_opcodes(self, frame: 'CodeGenFrame', goto_label=Label("unassigned")):
+    def generate_opcodes(self, frame: 'CodeGenFrame', goto_label=Label("unassigned"), jump_if: bool = False):
+        # Jumps to goto_label when the condition is false, or when it is true with jump_if
+        frame.mark_source(self.expr)
         if self.expr.operator.value in ["==", "!=", "<", ">", "<=", ">="]:
-            frame.open_frame()
-            self.expr.left.generate_opcodes(frame.current_frame)
-            left_storage = frame.close_frame().return_storage
-            frame.open_frame()
-            self.expr.right.generate_opcodes(frame.current_frame)
-            right_storage = frame.close_frame().return_storage
-            operator = {
-                "==": OpcodeKind.bne,
-                "!=": OpcodeKind.beq,
-                "<=": OpcodeKind.bgt,
-                ">=": OpcodeKind.blt,
-                "<": OpcodeKind.bge,
-                ">": OpcodeKind.ble,
-            }[self.expr.operator.value]
+            left_storage = yield self.expr.left
+            right_storage = yield self.expr.right
+            operator = (JUMP_IF_TRUE if jump_if else JUMP_IF_FALSE)[self.expr.operator.value]
             frame.push_opcode(Instruction(
                 operator,
                 [left_storage, right_storage, goto_label]
             ))
 
         else:
-            frame.open_frame()
-            self.expr.generate_opcodes(frame.current_frame)
-            condition_storage = frame.close_frame().return_storage
+            condition_storage = yield self.expr
             frame.push_opcode(Instruction(
-                OpcodeKind.beq,
+                OpcodeKind.bne if jump_if else OpcodeKind.beq,
                 [condition_storage, Const(0), goto_label]
             ))
 
 
 class IfStatement(Terminal):
-    def __init__(self, condition: 'Condition', body: 'Body', else_st: Union['Body', 'IfStatement'] = None):
+    __slots__ = ("condition", "body", "else_statement", "n_source_pos")
+
+    def __init__(self, condition: 'Condition', body: 'Body', else_st: Union['Body', 'IfStatement'] = None,
+                 source_pos: int = 0):
         self.condition = condition
         self.body = body
         self.else_statement = else_st
+        self.n_source_pos = source_pos
 
     @staticmethod
     def gen_productions(this: Type[Terminal], gen: ParserGenerator):
         @gen.production(f"{this.name} : ST_IF LPAREN condition RPAREN LBRACE body RBRACE")
         def if_def(p: tuple[Token, Token, 'Condition', Token, Token, 'Body', Token]):
-            return IfStatement(p[2], p[5])
+            return IfStatement(p[2], p[5], source_pos=pack_source_pos(p[0]))
 
         @gen.production(
             f"{this.name} : ST_IF LPAREN condition RPAREN "
             f"LBRACE body RBRACE ELSE "
             f"LBRACE body RBRACE")
         def if_else_def(p: tuple[Token, Token, 'Condition', Token, Token, 'Body', Token, Token, Token, 'Body', Token]):
-            return IfStatement(p[2], p[5], p[9])
+            return IfStatement(p[2], p[5], p[9], pack_source_pos(p[0]))
 
         @gen.production(
             f"{this.name} : ST_IF LPAREN condition RPAREN "
             f"LBRACE body RBRACE "
             f"ELSE if_statement")
         def if_else_if_def(p: tuple[Token, Token, 'Condition', Token, Token, 'Body', Token, Token, 'IfStatement']):
-            return IfStatement(p[2], p[5], p[8])
+            return IfStatement(p[2], p[5], p[8], pack_source_pos(p[0]))
 
     def evaluate(self, frame: 'ExecutionFrame'):
-        if self.condition.evaluate(frame):
-            self.body.evaluate(frame)
-        elif self.else_statement:
-            self.else_statement.evaluate(frame)
+        node = self
+        while isinstance(node, IfStatement):
+            if (yield node.condition):
+                yield node.body
+                return
+            node = node.else_statement
 
-    def generate_opcodes(self, frame: 'CodeGenFrame', if_end_label_: Label = None):
-        if self.else_statement:
-            if_else_label = Label(f"if_{frame.data.label_counter['if']}_else")
-            if_end_label = if_end_label_ or Label(f"if_{frame.data.label_counter['if']}_end")
+        if node:
+            yield node
 
-        else:
-            if_else_label = Label(f"if_{frame.data.label_counter['if']}")
-            if_end_label = if_end_label_
+    def generate_opcodes(self, frame: 'CodeGenFrame'):
+        from ast_optimizer import statement_size
+
+        # The whole else-if chain is laid out here and shares a single end label
+        branches: list[IfStatement] = []
+        node = self
+        while isinstance(node, IfStatement):
+            branches.append(node)
+            node = node.else_statement
+        else_body: Optional['Body'] = node
 
+        number = frame.data.label_counter['if']
         frame.data.label_counter['if'] += 1
+        end_label = Label(f"if_{number}_end" if else_body or len(branches) > 1 else f"if_{number}")
+        settings = frame.data.settings
+        report = frame.data.reports.setdefault("branch_layout", BranchLayoutReport())
+        report.chains += 1
+
+        condition_sizes = [statement_size(branch.condition) for branch in branches]
+        body_sizes = [statement_size(branch.body) for branch in branches]
+        else_size = statement_size(else_body) if else_body else 0
+        likely = self._then_is_likely() if len(branches) == 1 and else_body else None
+
+        dispatch = self._dispatch_cases(branches) if settings.optimize and settings.dispatch_tables else None
+        if dispatch:
+            before = self._paths(condition_sizes, body_sizes, else_size, [True] * len(branches), likely)
+            after = [(DISPATCH_TICKS + size + 1, p) for size, (_, p) in zip(body_sizes, before)]
+            after.append((DISPATCH_TICKS + else_size + 1, before[-1][1]))
+            # Short chains reach their first cases faster with plain tests
+            if sum(ticks * p for ticks, p in after) < sum(ticks * p for ticks, p in before):
+                yield from self._generate_dispatch(frame, number, *dispatch, else_body, end_label)
+                report.record("dispatch_table", before, after)
+                return
+
+        if settings.optimize and likely:
+            # The likely branch goes last so that it runs into the end label without a jump
+            then_label = Label(f"if_{number}_then")
+            yield self.condition, then_label, True
+            yield else_body
+            else_jumps = not self._ends_in_jump(frame)
+            if else_jumps:
+                frame.push_opcode(Instruction(OpcodeKind.jmp, [end_label]))
+            frame.push_opcode(then_label)
+            yield self.body
+            frame.push_opcode(end_label)
+
+            naive = self._paths(condition_sizes, body_sizes, else_size, [True], likely)
+            after = [
+                (condition_sizes[0] + body_sizes[0], naive[0][1]),
+                (condition_sizes[0] + else_size + else_jumps, naive[1][1]),
+            ]
+            report.record("likely_fallthrough", naive, after)
+            return
+
+        jumps = []
+        for index, branch in enumerate(branches):
+            last = index == len(branches) - 1 and not else_body
+            skip_label = end_label if last else Label(f"if_{number}_else" + (f"_{index}" if index else ""))
+            yield branch.condition, skip_label
+            yield branch.body
+            if last:
+                break
+
+            # A branch that already left, e.g. through return, needs no jump over the rest of the chain
+            jumps.append(not self._ends_in_jump(frame))
+            if jumps[-1]:
+                frame.push_opcode(Instruction(OpcodeKind.jmp, [end_label]))
+            frame.push_opcode(skip_label)
+
+        if else_body:
+            yield else_body
+        frame.push_opcode(end_label)
 
-        self.condition.generate_opcodes(frame.open_frame(), goto_label=if_else_label)
-        frame.close_frame()
+        report.record(
+            "return_jump",
+            self._paths(condition_sizes, body_sizes, else_size, [True] * len(jumps), likely),
+            self._paths(condition_sizes, body_sizes, else_size, jumps, likely),
+        )
 
-        self.body.generate_opcodes(frame.open_frame())
-        frame.close_frame()
+    @staticmethod
+    def _dispatch_cases(branches: list['IfStatement']) -> tuple[Variable, dict[int, 'Body']] | None:
+        # Chains of `x == <int>` tests on one variable over a dense range of distinct values
+        variable = None
+        cases = {}
+        for branch in branches:
+            expr = branch.condition.expr
+            if getattr(getattr(expr, "operator", None), "value", None) != "==":
+                return None
+
+            left, right = expr.left, expr.right
+            if isinstance(left, NumberLiteral):
+                left, right = right, left
+            if not isinstance(left, Variable) or not isinstance(right, NumberLiteral) or \
+                    not isinstance(right.value, int) or right.value in cases:
+                return None
+            if variable is not None and left.a_name != variable.a_name:
+                return None
+
+            variable = left
+            cases[right.value] = branch.body
+
+        if len(cases) < MIN_DISPATCH_CASES or max(cases) - min(cases) + 1 > MAX_DISPATCH_HOLES_RATIO * len(cases):
+            return None
+
+        return variable, cases
 
-        if if_end_label:
-            frame.push_opcode(Instruction(
-                OpcodeKind.jmp,
-                [if_end_label]
-            ))
+    @staticmethod
+    def _generate_dispatch(frame: 'CodeGenFrame', number: int, variable: Variable, cases: dict[int, 'Body'],
+                           else_body: Optional['Body'], end_label: Label):
+        # Register jumps are relative to the jump itself, so `jmp (x - low + 1)` lands on the table entry of x.
+        # Nothing may be placed between the jump and the table, and the table never targets the label after it.
+        storage = yield variable
+
+        low, high = min(cases), max(cases)
+        default_label = Label(f"if_{number}_default")
+        case_labels = {value: Label(f"if_{number}_case_{index}") for index, value in enumerate(cases)}
+        offset = frame.reg_stack.pop()
+
+        frame.push_opcode(Instruction(OpcodeKind.blt, [storage, Const(low), default_label]))
+        frame.push_opcode(Instruction(OpcodeKind.bgt, [storage, Const(high), default_label]))
+        frame.push_opcode(Instruction(OpcodeKind.sub, [offset, storage, Const(low - 1)]))
+        frame.push_opcode(Instruction(OpcodeKind.jmp, [offset]))
+        for value in range(low, high + 1):
+            frame.push_opcode(Instruction(OpcodeKind.jmp, [case_labels.get(value, default_label)]))
+
+        frame.push_opcode(default_label)
+        if else_body:
+            yield else_body
+        if not IfStatement._ends_in_jump(frame):
+            frame.push_opcode(Instruction(OpcodeKind.jmp, [end_label]))
+
+        for index, (value, body) in enumerate(cases.items()):
+            frame.push_opcode(case_labels[value])
+            yield body
+            if index < len(cases) - 1 and not IfStatement._ends_in_jump(frame):
+                frame.push_opcode(Instruction(OpcodeKind.jmp, [end_label]))
+
+        frame.push_opcode(end_label)
+
+    def _then_is_likely(self) -> bool | None:
+        # Branch prediction heuristics: leaving through return is rare, and so is an exact match
+        then_returns, else_returns = _ends_in_return(self.body), _ends_in_return(self.else_statement)
+        if then_returns != else_returns:
+            return else_returns
 
-        frame.push_opcode(if_else_label)
+        operator = self.condition.expr.operator.value if hasattr(self.condition.expr, "operator") else None
+        if operator in ["==", "!="]:
+            return operator == "!="
 
-        if self.else_statement:
-            if isinstance(self.else_statement, Body):
-                self.else_statement.generate_opcodes(frame.open_frame())
-                frame.close_frame()
+        return None
 
-            elif isinstance(self.else_statement, IfStatement):
-                self.else_statement.generate_opcodes(frame.open_frame(), if_end_label_=if_end_label)
-                frame.close_frame()
+    @staticmethod
+    def _ends_in_jump(frame: 'CodeGenFrame') -> bool:
+        opcodes = frame.data.opcodes
+        return bool(opcodes) and not isinstance(opcodes[-1], Label) and opcodes[-1].kind == OpcodeKind.jmp
+
+    @staticmethod
+    def _paths(condition_sizes: list[int], body_sizes: list[int], else_size: int, jumps: list[bool],
+               likely: bool | None) -> list[tuple[int, float]]:
+        # One path per branch taken plus the one where no condition holds
+        count = len(body_sizes) + 1
+        if count == 2 and likely is not None:
+            probabilities = [LIKELY_PROBABILITY, 1 - LIKELY_PROBABILITY] if likely \
+                else [1 - LIKELY_PROBABILITY, LIKELY_PROBABILITY]
+        else:
+            probabilities = [1 / count] * count
+
+        paths = []
+        for index, body_size in enumerate(body_sizes):
+            jump = jumps[index] if index < len(jumps) else False
+            paths.append((sum(condition_sizes[:index + 1]) + body_size + jump, probabilities[index]))
+        paths.append((sum(condition_sizes) + else_size, probabilities[-1]))
+        return paths
 
-            else:
-                raise AssertionError(
-                    f"Field else_statement of {self.__class__} must be {Body} or {IfStatement}, "
-                    f"got {type(self.else_statement)}.")
 
-            if not if_end_label_:
-                frame.push_opcode(if_end_label)
+def _ends_in_return(body: Optional['Body']) -> bool:
+    from terminal.returns import Return
+
+    items = getattr(body, "items", None)
+    return bool(items) and isinstance(items[-1], Return)
 
 
 class ForStatement(Terminal):
-    def __init__(self, startup: 'Assign', condition: 'Expression', increment: 'Expression', body: 'Body'):
+    __slots__ = ("startup", "condition", "increment", "body", "n_source_pos")
+
+    def __init__(self, startup: 'Assign', condition: 'Expression', increment: 'Expression', body: 'Body',
+                 source_pos: int = 0):
         self.startup = startup
         self.condition = condition
         self.increment = increment
         self.body = body
+        self.n_source_pos = source_pos
 
     @staticmethod
     def gen_productions(this: Type[Terminal], gen: ParserGenerator):
@@ -150,38 +320,42 @@ class ForStatement(Terminal):
             'Assign', Token, 'Expression', Token, 'Expression',
             Token, Token, 'Body', Token
         ]):
-            return ForStatement(p[2], p[4], p[6], p[9])
+            return ForStatement(p[2], p[4], p[6], p[9], pack_source_pos(p[0]))
 
     def evaluate(self, frame: 'ExecutionFrame'):
-        self.startup.evaluate(frame)
-        while self.condition.evaluate(frame):
-            self.body.evaluate(frame)
-            self.increment.evaluate(frame)
+        yield self.startup
+        while (yield self.condition):
+            yield self.body
+            yield self.increment
 
     def generate_opcodes(self, frame: 'CodeGenFrame'):
-        frame.open_frame()
-        self.startup.generate_opcodes(frame.current_frame)
-        frame.close_frame()
+        yield self.startup
 
         loop_label = Label(f"loop_for_{frame.data.label_counter['loop_for']}")
         end_label = Label(loop_label.name + "_end")
 
-        frame.push_opcode(loop_label)
         frame.data.label_counter['loop_for'] += 1
+        settings = frame.data.settings
+        rotate = settings.optimize and settings.loop_optimization
+
+        # A rotated loop tests the condition once before entering and then only at the bottom
+        if rotate:
+            yield Condition(self.condition), end_label
+
+        frame.push_opcode(loop_label)
+
+        if not rotate:
+            yield Condition(self.condition), end_label
+
+        yield self.body
+        yield self.increment
+
+        if rotate:
+            yield Condition(self.condition), loop_label, True
+        else:
+            frame.push_opcode(Instruction(
+                OpcodeKind.jmp,
+                [loop_label]
+            ))
 
-        frame.open_frame()
-        Condition(self.condition).generate_opcodes(frame.current_frame, end_label)
-        frame.close_frame()
-
-        frame.open_frame()
-        self.body.generate_opcodes(frame.current_frame)
-        frame.close_frame()
-        frame.open_frame()
-        self.increment.generate_opcodes(frame.current_frame)
-        frame.close_frame()
-
-        frame.push_opcode(Instruction(
-            OpcodeKind.jmp,
-            [loop_label]
-        ))
         frame.push_opcode(end_label)
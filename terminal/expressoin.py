@@ -1,3 +1,4 @@
+import operator
 from typing import Type, Union
 
 from rply import Token, ParserGenerator
@@ -6,15 +7,42 @@ from ast_evaluator import ExecutionFrame
 from code_generation.code_generator import CodeGenFrame
 from code_generation.opcodes import OpcodeKind, Instruction
 from code_generation.stacks import Register, MemoryCell
-from terminal.base import Terminal, NumberLiteral, Variable
+from code_generation.source_map import pack_source_pos
+from terminal.base import Terminal, NumberLiteral, Variable, shared_token
 from tokens import TokenKind
 
 
+BINARY_OPCODES = {
+    TokenKind.OP_SUM.name: OpcodeKind.add,
+    TokenKind.OP_SUB.name: OpcodeKind.sub,
+    TokenKind.OP_MUL.name: OpcodeKind.mul,
+    TokenKind.OP_DIV.name: OpcodeKind.div,
+    TokenKind.OP_MOD.name: OpcodeKind.mod,
+    TokenKind.OP_POW.name: OpcodeKind.pow,
+}
+
+EVALUATED_OPERATORS = {
+    TokenKind.OP_SUM.name: operator.add,
+    TokenKind.OP_SUB.name: operator.sub,
+    TokenKind.OP_MUL.name: operator.mul,
+    TokenKind.OP_DIV.name: operator.truediv,
+    TokenKind.OP_CMP_EQ.name: operator.eq,
+    TokenKind.OP_CMP_NE.name: operator.ne,
+    TokenKind.OP_CMP_GE.name: operator.ge,
+    TokenKind.OP_CMP_LE.name: operator.le,
+    TokenKind.OP_CMP_GT.name: operator.gt,
+    TokenKind.OP_CMP_LT.name: operator.lt,
+}
+
+
 class UnaryExpr(Terminal):
+    __slots__ = ("operator", "identifier", "mode", "n_source_pos")
+
     def __init__(self, operator: Token, identifier: 'str', mode=0):
-        self.operator = operator
+        self.operator = shared_token(operator)
         self.identifier = identifier
         self.mode = mode
+        self.n_source_pos = pack_source_pos(operator)
 
     @staticmethod
     def gen_productions(this: Type[Terminal], gen: ParserGenerator):
@@ -43,17 +71,22 @@ class UnaryExpr(Terminal):
 
     def generate_opcodes(self, frame: CodeGenFrame):
         operator = OpcodeKind.inc if self.operator.name == TokenKind.INCREMENT.name else OpcodeKind.dec
+        storage = frame.get(self.identifier).n_storage
         frame.push_opcode(Instruction(
             operator,
-            [frame.get(self.identifier).n_storage]
+            [storage]
         ))
+        frame.return_storage = storage
 
 
 class Expression(Terminal):
+    __slots__ = ("left", "operator", "right", "n_source_pos")
+
     def __init__(self, left: Union['Expression', 'Terminal'], operator: Token, right: Union['Expression', 'Terminal']):
         self.left = left
-        self.operator = operator
+        self.operator = shared_token(operator)
         self.right = right
+        self.n_source_pos = pack_source_pos(operator)
 
     @staticmethod
     def gen_productions(this: Type[Terminal], gen: ParserGenerator):
@@ -86,25 +119,17 @@ class Expression(Terminal):
             return p[1]
 
     def evaluate(self, frame: 'ExecutionFrame'):
-        operations = {
-            "OP_SUM": lambda a, b: a + b,
-            "OP_SUB": lambda a, b: a - b,
-            "OP_MUL": lambda a, b: a * b,
-            "OP_DIV": lambda a, b: a / b,
-            "OP_CMP_EQ": lambda a, b: a == b,
-            "OP_CMP_NE": lambda a, b: a != b,
-            "OP_CMP_GE": lambda a, b: a >= b,
-            "OP_CMP_LE": lambda a, b: a <= b,
-            "OP_CMP_GT": lambda a, b: a > b,
-            "OP_CMP_LT": lambda a, b: a < b,
-
-        }
-
-        operator = operations.get(self.operator.name)
-        if not operator:
+        function = EVALUATED_OPERATORS.get(self.operator.name)
+        if not function:
             raise ValueError(f"Evaluating invalid operator token: '{self.operator}'")
 
-        return operator(self.left.evaluate(frame), self.right.evaluate(frame))
+        # Variables and literals are read in place, only subtrees go through the visitor
+        left, right = self.left, self.right
+        left = frame.locals[left.a_name] if type(left) is Variable else \
+            left.value if type(left) is NumberLiteral else (yield left)
+        right = frame.locals[right.a_name] if type(right) is Variable else \
+            right.value if type(right) is NumberLiteral else (yield right)
+        return function(left, right)
 
     def generate_opcodes(self, frame: CodeGenFrame):
         if isinstance(self.left, Variable) and self.left.a_name in frame.data.locals:
@@ -113,46 +138,27 @@ class Expression(Terminal):
         if isinstance(self.right, Variable) and self.right.a_name in frame.data.locals:
             self.right = frame.get(self.right.a_name)
 
-        frame.open_frame()
-        self.left.generate_opcodes(frame.current_frame)
-        left_reg_or_val = frame.close_frame().return_storage
+        left_reg_or_val = yield self.left
+        right_reg_or_val = yield self.right
 
-        frame.open_frame()
-        self.right.generate_opcodes(frame.current_frame)
-        right_reg_or_val = frame.close_frame().return_storage
-
-        if (
-            (isinstance(left_reg_or_val, Register) or isinstance(left_reg_or_val, MemoryCell)) and
-            left_reg_or_val not in frame.data.registers_in_locals
-        ):
+        registers_in_locals = frame.data.registers_in_locals
+        if isinstance(left_reg_or_val, (Register, MemoryCell)) and left_reg_or_val not in registers_in_locals:
             output_register = left_reg_or_val
-            if isinstance(right_reg_or_val, Register) and right_reg_or_val not in frame.data.registers_in_locals:
+            if isinstance(right_reg_or_val, Register) and right_reg_or_val not in registers_in_locals:
                 right_reg_or_val.dispose()
 
-        elif (
-            (isinstance(right_reg_or_val, Register) or isinstance(right_reg_or_val, MemoryCell)) and
-            right_reg_or_val not in frame.data.registers_in_locals
-        ):
+        elif isinstance(right_reg_or_val, (Register, MemoryCell)) and right_reg_or_val not in registers_in_locals:
             output_register = right_reg_or_val
 
         else:
             output_register = frame.reg_stack.pop()
 
-        opcode = Instruction(
-            {
-                "OP_SUM": OpcodeKind.add,
-                "OP_SUB": OpcodeKind.sub,
-                "OP_MUL": OpcodeKind.mul,
-                "OP_DIV": OpcodeKind.div,
-                "OP_MOD": OpcodeKind.mod,
-                "OP_POW": OpcodeKind.pow,
-            }[self.operator.name],
+        frame.push_opcode(Instruction(
+            BINARY_OPCODES[self.operator.name],
             [
                 output_register,
                 left_reg_or_val,
                 right_reg_or_val,
             ]
-        )
-
-        frame.return_storage = output_register
-        frame.push_opcode(opcode)
+        ))
+        return output_register
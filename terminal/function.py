@@ -2,7 +2,8 @@ from typing import Type, TYPE_CHECKING
 
 from rply import Token, ParserGenerator
 from terminal.base import Terminal, Variable
-from code_generation.opcodes import Instruction, OpcodeKind
+from code_generation.opcodes import Instruction, OpcodeKind, Label
+from code_generation.source_map import pack_source_pos
 
 if TYPE_CHECKING:
     from ast_evaluator import ExecutionFrame
@@ -12,11 +13,14 @@ if TYPE_CHECKING:
 
 
 class Function(Terminal):
+    __slots__ = ("a_name", "args", "body", "n_is_entry_point", "n_source_pos")
+
     def __init__(self, name: Token, args: 'DefArgs', body: 'Body'):
         self.a_name: str = name.value
         self.args = args
         self.body = body
         self.n_is_entry_point = False
+        self.n_source_pos = pack_source_pos(name)
 
     @staticmethod
     def gen_productions(this: Type[Terminal], gen: ParserGenerator):
@@ -28,9 +32,10 @@ class Function(Terminal):
         frame.new_frame()
         for arg in self.args.items:
             frame.set_local(arg.arg_name.value, 0)
-        return self.body.evaluate(frame)
+        return (yield self.body)
 
     def generate_opcodes(self, frame: 'CodeGenFrame'):
+        frame.mark_source(self)
         if self.n_is_entry_point:
             frame.push_opcode(Instruction(OpcodeKind.clr, []))
 
@@ -40,14 +45,7 @@ class Function(Terminal):
             if not variable.n_storage_:
                 var_frame = frame.open_frame()
                 reg = frame.reg_stack.pop()
-                sig = None
-                for sig_ in frame.sig_stack.available:
-                    if args[variable.a_name].signal == str(sig_):
-                        sig = frame.sig_stack.pop(sig_.idx)
-                        break
-
-                if not sig:
-                    sig = frame.sig_stack.pop()
+                sig = frame.sig_stack.pop_named(args[variable.a_name].signal) or frame.sig_stack.pop()
 
                 var_frame.push_opcode(Instruction(
                     OpcodeKind.fig if args[variable.a_name].wire == "green" else OpcodeKind.fir,
@@ -64,5 +62,6 @@ class Function(Terminal):
             var.n_on_get_storage(var)
             frame.set_local(arg.arg_name.value, var)
 
-        self.body.generate_opcodes(frame.open_frame())
-        frame.close_frame()
+        frame.data.return_label = Label(f"{self.a_name}_return")
+        yield self.body
+        frame.push_opcode(frame.data.return_label)
@@ -1,50 +1,54 @@
-from typing import Type, TYPE_CHECKING, Optional
+from typing import Type, TYPE_CHECKING
 
 from rply import ParserGenerator
 
 from ast_evaluator import ExecutionFrame
 from code_generation.code_generator import CodeGenFrame
 from exceptions import IdentifierError
-from terminal.base import Terminal
+from terminal.base import Terminal, list_productions
 
 if TYPE_CHECKING:
     from terminal.function import Function
 
 
 class Program(Terminal):
-    def __init__(self, function: 'Function', previous: Optional['Program']):
-        self.n_functions: dict[str, 'Function'] = {}
-        if previous:
-            self.n_functions = previous.n_functions
+    __slots__ = ("n_functions", "n_entry_point_name", "functions")
 
-        if function.a_name in self.n_functions:
-            raise IdentifierError(f"Function '{function.a_name}' already exists!")
+    def __init__(self, functions: list['Function'], entry_point_name: str = "Main"):
+        self.functions = functions
+        self.n_entry_point_name = entry_point_name
+        self.n_functions = Program.link(functions, entry_point_name)
 
-        self.n_functions[function.a_name] = function
-        self.n_entry_point_name = "Main"
-        self.functions = list(self.n_functions.values())
+    @staticmethod
+    def link(functions: list['Function'], entry_point_name: str) -> dict[str, 'Function']:
+        # Checks that need every function, run once the whole list is known, so Main may come anywhere
+        by_name: dict[str, 'Function'] = {}
+        for function in functions:
+            if function.a_name in by_name:
+                raise IdentifierError(f"Function '{function.a_name}' already exists!")
+
+            by_name[function.a_name] = function
+            function.n_is_entry_point = function.a_name == entry_point_name
 
-        if self.n_entry_point_name not in self.n_functions:
-            raise NotImplementedError(f"No entry_point (function called '{self.n_entry_point_name}').")
+        if entry_point_name not in by_name:
+            raise NotImplementedError(f"No entry_point (function called '{entry_point_name}').")
 
-        self.n_functions[self.n_entry_point_name].n_is_entry_point = True
+        return by_name
 
     @staticmethod
     def gen_productions(this: Type[Terminal], gen: ParserGenerator):
-        @gen.production(f"{this.name} : ")
-        def example_def(_):
-            return
+        @gen.production(f"{this.name} : {this.name}_items")
+        def example_def(p: list[list['Function']]):
+            return Program(p[0])
 
-        @gen.production(f"{this.name} : {this.name} function")
-        def example_def(p: tuple['Program', 'Function']):
-            return Program(p[1], p[0])
+        list_productions(gen, f"{this.name}_items", "function")
 
     @property
     def entry_point(self):
         return self.n_functions[self.n_entry_point_name]
 
     def evaluate(self, frame: 'ExecutionFrame'):
-        return self.entry_point.evaluate(frame)
+        return (yield self.entry_point)
 
     def generate_opcodes(self, frame: CodeGenFrame):
         super().generate_opcodes(frame)
@@ -5,29 +5,31 @@ from rply import ParserGenerator, Token
 from ast_evaluator import ExecutionFrame
 from code_generation.code_generator import CodeGenFrame
 from code_generation.opcodes import Instruction, OpcodeKind
+from code_generation.source_map import pack_source_pos
 from terminal.expressoin import Expression
 from terminal.base import Terminal
 
 
 class Yield(Terminal):
-    def __init__(self, value: 'Expression'):
+    __slots__ = ("value", "n_source_pos")
+
+    def __init__(self, value: 'Expression', source_pos: int = 0):
         self.value = value
+        self.n_source_pos = source_pos
 
     @staticmethod
     def gen_productions(this: Type[Terminal], gen: ParserGenerator):
         @gen.production(f"{this.name} : YIELD {Expression.name}")
         def example_def(p: tuple[Token, Expression]):
-            return Yield(p[1])
+            return Yield(p[1], pack_source_pos(p[0]))
 
     def evaluate(self, frame: 'ExecutionFrame'):
-        output = self.value.evaluate(frame)
+        output = yield self.value
         frame.close_frame()
         return output
 
     def generate_opcodes(self, frame: CodeGenFrame):
-        frame.open_frame()
-        self.value.generate_opcodes(frame.current_frame)
-        out_storage = frame.close_frame().return_storage
+        out_storage = yield self.value
 
         frame.data.out_stack.dispose_all()
         if out_storage:
@@ -41,25 +43,25 @@ class Yield(Terminal):
 
 
 class Return(Terminal):
-    def __init__(self, value: 'Expression'):
+    __slots__ = ("value", "n_source_pos")
+
+    def __init__(self, value: 'Expression', source_pos: int = 0):
         self.value = value
+        self.n_source_pos = source_pos
 
     @staticmethod
     def gen_productions(this: Type[Terminal], gen: ParserGenerator):
         @gen.production(f"{this.name} : RETURN {Expression.name}")
         def example_def(p: tuple[Token, Expression]):
-            return Return(p[1])
+            return Return(p[1], pack_source_pos(p[0]))
 
     def evaluate(self, frame: 'ExecutionFrame'):
-        output = self.value.evaluate(frame)
+        output = yield self.value
         frame.close_frame()
         return output
 
     def generate_opcodes(self, frame: CodeGenFrame):
-        # TODO: stop function execution and return value
-        frame.open_frame()
-        self.value.generate_opcodes(frame.current_frame)
-        out_storage = frame.close_frame().return_storage
+        out_storage = yield self.value
 
         frame.data.out_stack.dispose_all()
         if out_storage:
@@ -70,3 +72,9 @@ class Return(Terminal):
                     out_storage
                 ]
             ))
+
+        if frame.data.return_label:
+            frame.push_opcode(Instruction(
+                OpcodeKind.jmp,
+                [frame.data.return_label]
+            ))
@@ -0,0 +1,186 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+TRACE_SUFFIX = ".trace.json"
+
+
+class Span:
+    # Times are perf_counter_ns() readings. With memory tracing on, memory_peak is the highest traced memory
+    # above the span's starting point, including nested spans, and blocks the net change of allocated blocks.
+    __slots__ = ("tracer", "name", "category", "args", "parent", "depth", "start_ns", "end_ns",
+                 "memory_start", "memory_peak", "blocks")
+
+    def __init__(self, tracer: 'Tracer', name: str, category: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.parent: Span | None = None
+        self.depth = 0
+        self.start_ns = 0
+        self.end_ns = 0
+        self.memory_start = 0
+        self.memory_peak = 0
+        self.blocks = 0
+
+    @property
+    def duration_ns(self) -> int:
+        return self.end_ns - self.start_ns
+
+    def __enter__(self):
+        self.tracer._open(self)
+        return self
+
+    def __exit__(self, *_):
+        self.tracer._close(self)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    # Spans nest by the order they are entered, so one tracer belongs to one thread. A disabled tracer hands
+    # out a shared span that does nothing, costing a method call per span.
+    def __init__(self, enabled: bool = True, memory: bool = False):
+        self.enabled = enabled
+        self.memory = memory and enabled
+        self.spans: list[Span] = []
+        self.origin_ns = time.perf_counter_ns()
+        self._stack: list[Span] = []
+        self._owns_tracemalloc = False
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+
+    def span(self, name: str, category: str = "compiler", **args) -> Span | _NullSpan:
+        if not self.enabled:
+            return NULL_SPAN
+
+        return Span(self, name, category, args)
+
+    @contextmanager
+    def activate(self):
+        # Makes this tracer the one current_tracer() returns, for code that is not handed a tracer
+        global _current
+        previous, _current = _current, self
+        try:
+            yield self
+        finally:
+            _current = previous
+
+    def close(self):
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def _open(self, span: Span):
+        span.parent = self._stack[-1] if self._stack else None
+        span.depth = len(self._stack)
+        self._stack.append(span)
+        self.spans.append(span)
+
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if span.parent:
+                span.parent.memory_peak = max(span.parent.memory_peak, peak)
+            # Absolute until the span closes, the peak is reset so it only covers this span from here on
+            span.memory_start = span.memory_peak = current
+            span.blocks = sys.getallocatedblocks()
+            tracemalloc.reset_peak()
+
+        span.start_ns = time.perf_counter_ns()
+
+    def _close(self, span: Span):
+        span.end_ns = time.perf_counter_ns()
+        self._stack.pop()
+
+        if self.memory:
+            peak = max(span.memory_peak, tracemalloc.get_traced_memory()[1])
+            if span.parent:
+                span.parent.memory_peak = max(span.parent.memory_peak, peak)
+            span.memory_peak = peak - span.memory_start
+            span.blocks = sys.getallocatedblocks() - span.blocks
+            tracemalloc.reset_peak()
+
+    def to_chrome_trace(self) -> dict:
+        # Complete ("X") events of the Trace Event Format, timestamps in microseconds since the tracer started
+        pid, tid = os.getpid(), threading.get_native_id()
+        events = []
+        for span in self.spans:
+            args = dict(span.args)
+            if self.memory:
+                args.update(memory_peak=span.memory_peak, blocks=span.blocks)
+
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": (span.start_ns - self.origin_ns) / 1000,
+                "dur": span.duration_ns / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            })
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+    def summary(self) -> str:
+        # Spans with the same path of names are merged, e.g. every codegen/peephole of a batch becomes one row
+        rows: dict[tuple[str, ...], list] = {}
+        paths: dict[int, tuple[str, ...]] = {}
+        children_ns: dict[int, int] = {}
+        for span in self.spans:
+            path = paths[id(span)] = (paths[id(span.parent)] if span.parent else ()) + (span.name,)
+            if span.parent:
+                children_ns[id(span.parent)] = children_ns.get(id(span.parent), 0) + span.duration_ns
+
+        for span in self.spans:
+            row = rows.setdefault(paths[id(span)], [0, 0, 0, 0, 0])
+            row[0] += 1
+            row[1] += span.duration_ns
+            row[2] += span.duration_ns - children_ns.get(id(span), 0)
+            row[3] = max(row[3], span.memory_peak)
+            row[4] += span.blocks
+
+        width = max([len(path[-1]) + 2 * (len(path) - 1) for path in rows] + [4])
+        header = f"{'span':<{width}} {'calls':>6} {'total':>10} {'self':>10}"
+        if self.memory:
+            header += f" {'peak':>10} {'blocks':>9}"
+
+        text = [header]
+        for path, (calls, total, own, peak, blocks) in rows.items():
+            line = f"{'  ' * (len(path) - 1) + path[-1]:<{width}} {calls:>6} {total / 1e6:8.2f}ms {own / 1e6:8.2f}ms"
+            if self.memory:
+                line += f" {peak / 1024:7.1f}KiB {blocks:>9}"
+            text.append(line)
+
+        return "\n".join(text)
+
+
+NULL_TRACER = Tracer(enabled=False)
+_current = NULL_TRACER
+
+
+def current_tracer() -> Tracer:
+    return _current
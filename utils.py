@@ -6,50 +6,41 @@ from terminal.base import Terminal
 class TerminalUtil:
     @staticmethod
     def get_pretty(term: Terminal, prename="", tab="   ", is_last=True):
-        if isinstance(term, Iterable) and not isinstance(term, str):
-            text = ('└──' if is_last else '├──') + prename + str(type(term))
-            items = [item for item in term]
-
-            for i in range(len(items)):
-                item = items[i]
-                is_next_last = (i == len(items) - 1)
-                pretty_child = TerminalUtil.get_pretty(
-                    item,
-                    prename=str(i) + ':',
-                    tab=tab + ('│  ' if not (is_last and is_next_last) and is_last else '   '),
-                    is_last=is_next_last
-                )
-                text += f"\n{tab}{pretty_child}"
-
-            return text
-
-        if not isinstance(term, Terminal):
-            return ('└──' if is_last else '├──') + prename + str(term)
-
-        values = {
-            name: getattr(term, name)
-            for name in dir(term)
-            if not (
-                callable(getattr(term, name)) or
-                (name in dir(term.__class__) and isinstance(getattr(term.__class__, name), property)) or
-                name.startswith("_") or
-                name.startswith("n_") or
-                name in ["name"]
-            )
-        }
-
-        text = f"{'└──' if is_last else '├──'}{prename}{term.name}"
-        if len(values) == 0:
-            raise AssertionError(f"Values of terminal '{term.name}' not found")
-
-        for key in values:
-            is_next_last = (key == list(values.keys())[-1])
-            pretty_child = TerminalUtil.get_pretty(
-                values[key],
-                prename=key + ':',
-                tab=tab + ('│  ' if not(is_last and is_next_last) and is_last else '   '),
-                is_last=is_next_last
-            )
-            text += f"\n{tab}{pretty_child}"
-
-        return text
+        # Lines are written parents first from an explicit stack, so the depth of the tree is not limited by
+        # the recursion limit. Every entry carries the prefix of its own line and the tab of its children's.
+        lines = []
+        stack = [(term, prename, "", tab, is_last)]
+        while stack:
+            term, prename, prefix, tab, is_last = stack.pop()
+            marker = '└──' if is_last else '├──'
+
+            if isinstance(term, Iterable) and not isinstance(term, str):
+                lines.append(prefix + marker + prename + str(type(term)))
+                children = [(str(i) + ':', item) for i, item in enumerate(term)]
+            elif not isinstance(term, Terminal):
+                lines.append(prefix + marker + prename + str(term))
+                continue
+            else:
+                values = {
+                    name: getattr(term, name)
+                    for name in dir(term)
+                    if not (
+                        callable(getattr(term, name)) or
+                        (name in dir(term.__class__) and isinstance(getattr(term.__class__, name), property)) or
+                        name.startswith("_") or
+                        name.startswith("n_") or
+                        name in ["name"]
+                    )
+                }
+
+                lines.append(f"{prefix}{marker}{prename}{term.name}")
+                if len(values) == 0:
+                    raise AssertionError(f"Values of terminal '{term.name}' not found")
+                children = [(key + ':', value) for key, value in values.items()]
+
+            for i in reversed(range(len(children))):
+                is_next_last = (i == len(children) - 1)
+                child_tab = tab + ('│  ' if not (is_last and is_next_last) and is_last else '   ')
+                stack.append((children[i][1], children[i][0], tab, child_tab, is_next_last))
+
+        return "\n".join(lines)
@@ -0,0 +1,138 @@
+from types import GeneratorType
+from typing import Callable, Iterator
+
+
+class Visitor:
+    # Walks a tree with an explicit stack instead of recursion, so any depth fits in bounded Python stack space.
+    # visit_<terminal name>, or generic_visit for nodes without one, either returns the node's result or is a
+    # generator: every node it yields is visited and the result sent back, `yield node, *args` passes extra
+    # arguments along, and the generator's return value is the node's result. An exception raised by a child
+    # is thrown into its parent's generator, as if the parent had called the child.
+    _methods: dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._methods = {}
+
+    def visit(self, node, *args):
+        routine = self._method(node)(self, node, *args)
+        if type(routine) is not GeneratorType:
+            return routine
+
+        methods = self._methods
+        stack = []
+        value = error = None
+        while True:
+            try:
+                child = routine.send(value) if error is None else routine.throw(error)
+            except StopIteration as stop:
+                if not stack:
+                    return stop.value
+                routine, value, error = stack.pop(), stop.value, None
+                continue
+            except BaseException as exception:
+                if not stack:
+                    raise
+                routine, error = stack.pop(), exception
+                continue
+
+            error = None
+            try:
+                if type(child) is tuple:
+                    value = (methods.get(type(child[0])) or self._method(child[0]))(self, *child)
+                else:
+                    value = (methods.get(type(child)) or self._method(child))(self, child)
+            except BaseException as exception:
+                error = exception
+                continue
+
+            if type(value) is GeneratorType:
+                stack.append(routine)
+                routine, value = value, None
+
+    def _method(self, node) -> Callable:
+        cls = type(self)
+        method = cls._methods.get(type(node))
+        if method is None:
+            # Terminal classes carry their grammar name, anything else (tokens, lists, values) is generic
+            name = getattr(type(node), "name", None)
+            method = getattr(cls, f"visit_{name}", None) if isinstance(name, str) else None
+            method = cls._methods[type(node)] = method or cls.generic_visit
+
+        return method
+
+    def generic_visit(self, node, *args):
+        raise NotImplementedError(f"{self.__class__.__name__} cannot visit {node.__class__.__name__}.")
+
+
+_slots: dict[type, tuple[str, ...]] = {}
+_fields: dict[type, tuple[str, ...]] = {}
+
+
+def _all_slots(cls: type) -> tuple[str, ...]:
+    slots = _slots.get(cls)
+    if slots is None:
+        slots = _slots[cls] = tuple(slot for klass in reversed(cls.__mro__) for slot in getattr(klass, "__slots__", ()))
+
+    return slots
+
+
+def _child_fields(cls: type) -> tuple[str, ...]:
+    # Slots starting with n_ hold compiler state, e.g. the storage of a variable or the function table of a
+    # program, and never hold children
+    fields = _fields.get(cls)
+    if fields is None:
+        fields = _fields[cls] = tuple(slot for slot in _all_slots(cls) if not slot.startswith("n_"))
+
+    return fields
+
+
+def child_nodes(node) -> list:
+    # Terminals held in a node's child fields, directly or in a list
+    from terminal.base import Terminal
+
+    children = []
+    for field in _child_fields(type(node)):
+        value = getattr(node, field, None)
+        if isinstance(value, Terminal):
+            children.append(value)
+        elif isinstance(value, list):
+            children.extend(item for item in value if isinstance(item, Terminal))
+
+    return children
+
+
+def walk(node) -> Iterator:
+    # Every node of the tree, parents before their children, in source order
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(child_nodes(node)))
+
+
+def copy_tree(node):
+    # A copy of every terminal reachable through child fields, without recursion. Tokens, values and the n_
+    # compiler state are shared with the original, so passes that rewrite a tree can work on the copy.
+    from terminal.base import Terminal
+
+    def copy_node(original):
+        copy = object.__new__(type(original))
+        for slot in _all_slots(type(original)):
+            if hasattr(original, slot):
+                setattr(copy, slot, getattr(original, slot))
+        stack.append(copy)
+        return copy
+
+    stack = []
+    root = copy_node(node)
+    while stack:
+        copy = stack.pop()
+        for field in _child_fields(type(copy)):
+            value = getattr(copy, field, None)
+            if isinstance(value, Terminal):
+                setattr(copy, field, copy_node(value))
+            elif isinstance(value, list):
+                setattr(copy, field, [copy_node(item) if isinstance(item, Terminal) else item for item in value])
+
+    return root